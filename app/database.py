@@ -1,13 +1,24 @@
 import sqlite3
 import json
 from datetime import datetime
-import pandas as pd
+
+from app.utils.db_pool import connect as db_connect
+from app.utils.lazy import lazy_import
+from app.utils.transcript_store import (
+    init_transcript_table, store_transcript, load_transcript, start_migration,
+)
 
 DB_NAME = "meetings.db"
 
+# pandas 只有 get_all_meetings 使用，第一次呼叫時才載入
+pd = lazy_import("pandas")
+
+# Streamlit 每次互動都會重新執行 init_db()，背景搬移只需啟動一次
+_migration_started = False
+
 def init_db():
     """初始化資料庫，建立 meetings 表格，並確保所有新欄位都存在"""
-    conn = sqlite3.connect(DB_NAME)
+    conn = db_connect(DB_NAME)
     c = conn.cursor()
     
     # 建立基本表格
@@ -36,12 +47,20 @@ def init_db():
     except sqlite3.OperationalError:
         pass # 欄位已存在
 
+    # 逐字稿壓縮後另存於 meeting_transcripts
+    init_transcript_table(conn)
+
     conn.commit()
     conn.close()
 
+    global _migration_started
+    if not _migration_started:
+        _migration_started = True
+        start_migration(lambda: db_connect(DB_NAME))
+
 def save_meeting(filename, transcription, structured_data):
     """儲存會議記錄"""
-    conn = sqlite3.connect(DB_NAME)
+    conn = db_connect(DB_NAME)
     c = conn.cursor()
     
     def to_json(data):
@@ -49,13 +68,12 @@ def save_meeting(filename, transcription, structured_data):
 
     c.execute('''
         INSERT INTO meetings (
-            filename, transcription, participants, key_points, 
+            filename, participants, key_points,
             discussion_topics, next_steps, summary, meeting_topics
         )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
     ''', (
-        filename, 
-        transcription,
+        filename,
         to_json(structured_data.get('participants', [])),
         to_json(structured_data.get('key_points', [])),
         to_json(structured_data.get('discussion_topics', [])), # 保留舊欄位相容
@@ -63,27 +81,39 @@ def save_meeting(filename, transcription, structured_data):
         structured_data.get('summary', ''),
         to_json(structured_data.get('meeting_topics', []))
     ))
-    conn.commit()
     meeting_id = c.lastrowid
+    # 逐字稿只以壓縮後的形式寫入 (meetings.transcription 保持 NULL，同一個交易)
+    store_transcript(conn, meeting_id, transcription)
+    conn.commit()
     conn.close()
     return meeting_id
 
 def get_all_meetings():
     """取得所有會議記錄列表"""
-    conn = sqlite3.connect(DB_NAME)
+    conn = db_connect(DB_NAME)
     df = pd.read_sql_query("SELECT id, filename, created_at FROM meetings ORDER BY created_at DESC", conn)
     conn.close()
     return df
 
 def get_meeting_details(meeting_id):
-    """取得單一會議詳細資料"""
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
+    """取得單一會議詳細資料 (不含逐字稿，需要時以 get_meeting_transcript 讀取)"""
+    conn = db_connect(DB_NAME, row_factory=sqlite3.Row)
     c = conn.cursor()
-    c.execute("SELECT * FROM meetings WHERE id = ?", (meeting_id,))
+    c.execute('''
+        SELECT id, filename, participants, key_points, discussion_topics,
+               next_steps, summary, meeting_topics, created_at
+        FROM meetings WHERE id = ?
+    ''', (meeting_id,))
     row = c.fetchone()
     conn.close()
     
     if row:
         return dict(row)
     return None
+
+def get_meeting_transcript(meeting_id):
+    """取得單一會議逐字稿 (解壓縮)"""
+    conn = db_connect(DB_NAME)
+    transcription = load_transcript(conn, meeting_id)
+    conn.close()
+    return transcription
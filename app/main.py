@@ -8,13 +8,19 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import tempfile
 import json
 import pandas as pd
-from app.database import init_db, save_meeting, get_all_meetings, get_meeting_details
+from app.database import init_db, save_meeting, get_all_meetings, get_meeting_details, get_meeting_transcript
 from app.utils.transcriber import transcribe_audio, structure_meeting_notes
 from app.utils.doc_gen import generate_meeting_minutes
+from app.utils.model_registry import registry
+from app.utils import metrics
+from app.utils.metrics import stage, add_bytes
 
 # 初始化資料庫
 init_db()
 
+# 預先載入 Whisper 模型 (依 WHISPER_PRELOAD 設定；已載入時不會重複載入)
+registry.warm_up()
+
 st.set_page_config(page_title="AI 智慧會議記錄助手", layout="wide")
 
 st.title("🎙️ AI 智慧會議記錄助手 (Gemini Edition)")
@@ -47,18 +53,28 @@ with tab1:
             
             progress_bar = st.progress(0)
             status_text = st.empty()
+            # 記錄本次處理各階段的耗時
+            trace = metrics.Trace()
+            trace_token = metrics.start_trace(trace)
             
             try:
                 # 1. 儲存暫存檔
                 status_text.text("正在處理檔案...")
-                with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(uploaded_file.name)[1]) as tmp_file:
+                with stage("temp_write"), tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(uploaded_file.name)[1]) as tmp_file:
                     tmp_file.write(uploaded_file.getvalue())
                     tmp_file_path = tmp_file.name
+                add_bytes("temp_write", uploaded_file.size)
                 
                 # 2. 轉錄
                 status_text.text("⏳ 正在進行語音轉錄 (Whisper)...")
                 progress_bar.progress(30)
-                transcription = transcribe_audio(tmp_file_path)
+                audio_trim = {}
+                transcription = transcribe_audio(
+                    tmp_file_path,
+                    on_event=lambda event, data: audio_trim.update(data) if event == "silence_trimmed" else None,
+                )
+                if audio_trim:
+                    status_text.text(f"✂️ 已移除 {audio_trim['trimmed_seconds']:.0f} 秒靜音 (預估加速 {audio_trim['speedup']}x)")
                 
                 # 3. 結構化分析
                 status_text.text("🤖 正在透過 Google Gemini 進行分析...")
@@ -69,11 +85,12 @@ with tab1:
                 status_text.text("💾 正在儲存資料...")
                 progress_bar.progress(90)
                 
-                meeting_id = save_meeting(
-                    filename=uploaded_file.name,
-                    transcription=transcription,
-                    structured_data=structured_data
-                )
+                with stage("db_insert"):
+                    meeting_id = save_meeting(
+                        filename=uploaded_file.name,
+                        transcription=transcription,
+                        structured_data=structured_data
+                    )
                 
                 os.unlink(tmp_file_path)
                 
@@ -132,11 +149,12 @@ with tab1:
                     st.text_area("逐字稿", transcription, height=200)
                 
                 # 產生 Word 下載
-                doc_file = generate_meeting_minutes({
-                    "filename": uploaded_file.name,
-                    "transcription": transcription,
-                    **structured_data
-                })
+                with stage("doc_gen"):
+                    doc_file = generate_meeting_minutes({
+                        "filename": uploaded_file.name,
+                        "transcription": transcription,
+                        **structured_data
+                    })
                 
                 st.download_button(
                     label="📥 下載 Word 會議記錄 (自訂格式)",
@@ -145,10 +163,22 @@ with tab1:
                     mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
                 )
 
+                with st.expander("⏱️ 各階段耗時 (毫秒)"):
+                    if audio_trim:
+                        st.write(
+                            f"靜音裁切：{audio_trim['original_seconds']:.0f} 秒 → {audio_trim['kept_seconds']:.0f} 秒 "
+                            f"(移除 {audio_trim['trimmed_seconds']:.0f} 秒，預估加速 {audio_trim['speedup']}x)"
+                        )
+                    st.json(trace.as_dict())
+
             except Exception as e:
                 st.error(f"發生錯誤: {str(e)}")
                 if os.path.exists(tmp_file_path):
                     os.unlink(tmp_file_path)
+            finally:
+                metrics.end_trace(trace_token)
+                if metrics.METRICS_TEXTFILE:
+                    metrics.write_textfile(metrics.METRICS_TEXTFILE)
 
 with tab2:
     st.subheader("歷史會議記錄")
@@ -194,6 +224,11 @@ with tab2:
                         st.dataframe(pd.DataFrame(next_steps), hide_index=True)
                     else:
                         st.write(next_steps)
+
+                # 逐字稿壓縮儲存，勾選後才讀取並解壓縮
+                with st.expander("查看完整逐字稿"):
+                    if st.checkbox("載入逐字稿", key=f"load_transcript_{selected_id}"):
+                        st.text_area("逐字稿", get_meeting_transcript(selected_id) or "", height=200, key=f"hist_transcript_{selected_id}")
                 
                 # 下載按鈕
                 doc_file_hist = generate_meeting_minutes({
@@ -204,7 +239,6 @@ with tab2:
                     "next_steps": next_steps,
                     "summary": summary,
                     "meeting_topics": meeting_topics,
-                    "transcription": details['transcription']
                 })
                 
                 st.download_button(
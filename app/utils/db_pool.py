@@ -0,0 +1,134 @@
+import os
+import sqlite3
+import threading
+
+# 每個資料庫檔最多保留幾條閒置連線
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+
+# 遇到寫入鎖時最多等待多久 (毫秒)，而不是立即回報 database is locked
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+
+# 以 mmap 讀取資料庫檔的大小上限
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_MB", "256")) * 1024 * 1024
+
+# 每條連線快取的 prepared statement 數量 (sqlite3 模組以 SQL 字串為 key 重用)
+DB_CACHED_STATEMENTS = 256
+
+
+# 新連線建立時要執行的函式 (例如註冊自訂 SQL 函式)
+_connect_hooks = []
+
+
+def register_connect_hook(fn):
+    """fn(conn) 會在每條新連線建立時呼叫"""
+    if fn not in _connect_hooks:
+        _connect_hooks.append(fn)
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    close() 時歸還連線池而不是真的關閉
+    沿用原本「connect → 使用 → close()」的寫法即可重用連線與其 prepared statement
+    """
+
+    _pool = None
+    _checked_out = False
+
+    def close(self):
+        if self._pool is not None and self._checked_out:
+            self._checked_out = False
+            self._pool.release(self)
+        elif self._pool is None:
+            super().close()
+
+    def really_close(self):
+        self._pool = None
+        super().close()
+
+
+class ConnectionPool:
+    """
+    SQLite 連線池
+    新連線開啟 WAL (讀寫可同時進行)、synchronous=NORMAL、busy_timeout 與 mmap；
+    取出的連線可跨執行緒使用，但同一時間只屬於一個呼叫端。
+    """
+
+    def __init__(self, db_path, size=DB_POOL_SIZE, row_factory=None):
+        self.db_path = db_path
+        self.size = size
+        self.row_factory = row_factory
+        self._idle = []
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=DB_BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            cached_statements=DB_CACHED_STATEMENTS,
+            factory=PooledConnection,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        for hook in _connect_hooks:
+            hook(conn)
+        conn._pool = self
+        self.created += 1
+        return conn
+
+    def connect(self):
+        """取出一條連線；用完呼叫 conn.close() 歸還"""
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+            if conn is not None:
+                self.reused += 1
+        if conn is None:
+            conn = self._open()
+        conn.row_factory = self.row_factory
+        conn._checked_out = True
+        return conn
+
+    def release(self, conn):
+        # 未提交的交易視同放棄 (與關閉連線的行為一致)
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.really_close()
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.really_close()
+
+    def stats(self):
+        with self._lock:
+            idle = len(self._idle)
+        return {"created": self.created, "reused": self.reused, "idle": idle, "size": self.size}
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path, row_factory=None):
+    """同一個資料庫檔 (與 row_factory) 共用一個連線池"""
+    key = (os.path.abspath(db_path), row_factory)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(db_path, row_factory=row_factory)
+        return pool
+
+
+def connect(db_path, row_factory=None):
+    """取代 sqlite3.connect(db_path)：回傳池中的連線，close() 時歸還"""
+    return get_pool(db_path, row_factory).connect()
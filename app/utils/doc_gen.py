@@ -1,8 +1,19 @@
-from docx import Document
-from docx.shared import Pt, Inches
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.oxml.ns import qn
+import copy
 import io
+import threading
+import zipfile
+
+from app.utils.lazy import lazy_import
+
+# python-docx / lxml 在第一次生成 Word 時才載入 (只查詢會議的請求不需要)
+docx = lazy_import("docx")
+docx_shared = lazy_import("docx.shared")
+docx_text = lazy_import("docx.enum.text")
+docx_ns = lazy_import("docx.oxml.ns")
+etree = lazy_import("lxml.etree")
+
+def _heading_text(data):
+    return f"{data.get('filename', '會議記錄')}".replace(".mp3", "").replace(".wav", "") + " 會議記錄整理"
 
 def set_cell_border(cell, **kwargs):
     """
@@ -11,23 +22,23 @@ def set_cell_border(cell, **kwargs):
     """
     pass
 
-def generate_meeting_minutes(data):
+def generate_meeting_minutes_docx(data):
     """
-    生成會議記錄 Word 檔案 (依照使用者指定格式)
+    以 python-docx 物件層逐段建立會議記錄 (原始實作)
+    格式的唯一依據：範本引擎的片段由此產生，benchmark 也以此作為比較基準
     data: 包含 filename, created_at, participants, key_points, next_steps, summary, meeting_topics
     回傳: BytesIO 物件
     """
-    doc = Document()
+    doc = docx.Document()
     
     # 設定中文字型 (雖然 python-docx 對中文字型支援有限，但盡量設定)
     style = doc.styles['Normal']
     style.font.name = 'Times New Roman'
-    style.element.rPr.rFonts.set(qn('w:eastAsia'), '標楷體')
+    style.element.rPr.rFonts.set(docx_ns.qn('w:eastAsia'), '標楷體')
 
     # --- 標題 ---
-    heading_text = f"{data.get('filename', '會議記錄')}".replace(".mp3", "").replace(".wav", "") + " 會議記錄整理"
-    heading = doc.add_heading(heading_text, 0)
-    heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    heading = doc.add_heading(_heading_text(data), 0)
+    heading.alignment = docx_text.WD_ALIGN_PARAGRAPH.CENTER
 
     # --- 一、會議主題 ---
     doc.add_heading("一、會議主題", level=1)
@@ -81,7 +92,7 @@ def generate_meeting_minutes(data):
                 # 內容段落 (縮排)
                 if content:
                     p_content = doc.add_paragraph(content)
-                    p_content.paragraph_format.left_indent = Inches(0.25)
+                    p_content.paragraph_format.left_indent = docx_shared.Inches(0.25)
             else:
                 # 舊格式相容 (純字串)
                 doc.add_paragraph(str(kp), style='List Bullet')
@@ -129,3 +140,165 @@ def generate_meeting_minutes(data):
     file_stream.seek(0)
     
     return file_stream
+
+
+# --- 預先編譯的範本引擎 ---
+# python-docx 物件層逐格建立表格的成本會隨列數增加 (每次 add_row / cells 都要重新走訪表格)，
+# 而且每次都要從空白文件重新設定樣式。這裡改為：
+#   1. 只建立一次「原型文件」，每種段落 / 表格列各放一個，並預先套好樣式
+#   2. 快取原型文件的 zip 內容 (styles、numbering 等) 與解析後的 XML 片段
+#   3. 每次生成時只複製 (deepcopy) 需要的片段、填入文字，再序列化 document.xml 打包
+
+_DOCUMENT_PART = "word/document.xml"
+
+
+class _Template:
+    def __init__(self):
+        doc = docx.Document()
+        style = doc.styles['Normal']
+        style.font.name = 'Times New Roman'
+        style.element.rPr.rFonts.set(docx_ns.qn('w:eastAsia'), '標楷體')
+
+        title = doc.add_heading("title", 0)
+        title.alignment = docx_text.WD_ALIGN_PARAGRAPH.CENTER
+        doc.add_heading("heading", level=1)
+        doc.add_paragraph("bullet", style='List Bullet')
+        doc.add_paragraph("number", style='List Number')
+        indented = doc.add_paragraph("indented")
+        indented.paragraph_format.left_indent = docx_shared.Inches(0.25)
+        doc.add_paragraph("plain")
+        table = doc.add_table(rows=2, cols=2)
+        table.style = 'Table Grid'
+        for row in table.rows:
+            for cell in row.cells:
+                cell.text = ""
+
+        body = doc.element.body
+        elements = list(body)
+        (self.title, self.heading, self.bullet, self.numbered,
+         self.indented, self.plain, table_el, self.sect_pr) = elements
+
+        # 表格：保留表頭列，資料列另存為片段
+        rows = table_el.tr_lst
+        self.row = rows[1]
+        table_el.remove(rows[1])
+        self.table = table_el
+
+        for el in elements:
+            body.remove(el)
+        self.root = doc.element
+
+        # 快取 zip 內除了 document.xml 以外的所有 part (樣式、編號、主題...)
+        buffer = io.BytesIO()
+        doc.save(buffer)
+        with zipfile.ZipFile(buffer) as zf:
+            self.parts = [(name, zf.read(name)) for name in zf.namelist()]
+
+    # --- 片段 ---
+    def paragraph(self, proto, text):
+        p = copy.deepcopy(proto)
+        p.r_lst[0].text = text
+        return p
+
+    def table_with_rows(self, header, rows):
+        table = copy.deepcopy(self.table)
+        self._fill_row(table.tr_lst[0], header)
+        for values in rows:
+            tr = copy.deepcopy(self.row)
+            self._fill_row(tr, values)
+            table.append(tr)
+        return table
+
+    def _fill_row(self, tr, values):
+        for tc, value in zip(tr.tc_lst, values):
+            tc.p_lst[0].r_lst[0].text = value
+
+    # --- 輸出 ---
+    def render(self, elements):
+        root = copy.deepcopy(self.root)
+        body = root.body
+        for el in elements:
+            body.append(el)
+        body.append(copy.deepcopy(self.sect_pr))
+
+        xml = etree.tostring(root, encoding="UTF-8", standalone=True)
+        stream = io.BytesIO()
+        with zipfile.ZipFile(stream, "w", zipfile.ZIP_DEFLATED) as zf:
+            for name, data in self.parts:
+                zf.writestr(name, xml if name == _DOCUMENT_PART else data)
+        stream.seek(0)
+        return stream
+
+
+_template = None
+_template_lock = threading.Lock()
+
+def _get_template():
+    global _template
+    if _template is None:
+        with _template_lock:
+            if _template is None:
+                _template = _Template()
+    return _template
+
+def _participant_row(p_data):
+    # 處理舊格式 (如果是字串列表) 或新格式 (字典列表)
+    if isinstance(p_data, dict):
+        return str(p_data.get('name', '')), str(p_data.get('role', ''))
+    return str(p_data), ""
+
+def _next_step_row(step):
+    if isinstance(step, dict):
+        return str(step.get('action', '')), str(step.get('owner', ''))
+    return str(step), ""
+
+def generate_meeting_minutes(data):
+    """
+    生成會議記錄 Word 檔案 (依照使用者指定格式)
+    輸出內容與 generate_meeting_minutes_docx 相同，但以預先編譯的範本片段組裝
+    data: 包含 filename, created_at, participants, key_points, next_steps, summary, meeting_topics
+    回傳: BytesIO 物件
+    """
+    t = _get_template()
+    out = [t.paragraph(t.title, _heading_text(data))]
+
+    # --- 一、會議主題 ---
+    out.append(t.paragraph(t.heading, "一、會議主題"))
+    topics = data.get('meeting_topics', [])
+    if topics:
+        out.extend(t.paragraph(t.bullet, str(topic)) for topic in topics)
+    else:
+        out.append(t.paragraph(t.plain, "(無特定主題)"))
+
+    # --- 二、參與人物 (表格) ---
+    out.append(t.paragraph(t.heading, "二、參與人物"))
+    participants = data.get('participants', [])
+    rows = [_participant_row(p) for p in participants] if participants else [("(無資料)", "")]
+    out.append(t.table_with_rows(('姓名 / 角色', '身份或貢獻說明'), rows))
+
+    # --- 三、重點內容摘要 ---
+    out.append(t.paragraph(t.heading, "三、重點內容摘要"))
+    key_points = data.get('key_points', [])
+    if key_points:
+        for idx, kp in enumerate(key_points, 1):
+            if isinstance(kp, dict):
+                out.append(t.paragraph(t.numbered, f"{idx}. {kp.get('title', '')}"))
+                content = kp.get('content', '')
+                if content:
+                    out.append(t.paragraph(t.indented, content))
+            else:
+                out.append(t.paragraph(t.bullet, str(kp)))
+    else:
+        out.append(t.paragraph(t.plain, "(無重點摘要)"))
+
+    # --- 四、會議結論與行動項目 (表格) ---
+    out.append(t.paragraph(t.heading, "四、會議結論與行動項目"))
+    next_steps = data.get('next_steps', [])
+    rows = [_next_step_row(s) for s in next_steps] if next_steps else [("(無待辦事項)", "")]
+    out.append(t.table_with_rows(('行動項目', '負責人 / 協調人'), rows))
+
+    # --- 五、總結摘要 ---
+    out.append(t.paragraph(t.heading, "五、總結摘要"))
+    out.append(t.paragraph(t.plain, data.get('summary', '') or "(無總結)"))
+
+    return t.render(out)
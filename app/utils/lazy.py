@@ -0,0 +1,48 @@
+import importlib
+import sys
+import threading
+import time
+
+# 已載入的延遲模組與 import 耗時 (秒)，供啟動時間報告使用
+_load_times = {}
+
+
+class LazyModule:
+    """
+    模組的替身：第一次存取屬性時才真正 import
+    讓只需要列出會議等輕量請求的程序不必在啟動時載入 google.genai / docx / pandas 等大型套件
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        module = self._module
+        if module is None:
+            with self._lock:
+                module = self._module
+                if module is None:
+                    started = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    _load_times.setdefault(self._name, time.perf_counter() - started)
+                    self._module = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name):
+    """回傳 name 的延遲模組；已 import 過時直接回傳該模組"""
+    return sys.modules.get(name) or LazyModule(name)
+
+
+def load_times():
+    """已透過延遲 import 載入的模組與耗時 (毫秒)"""
+    return {name: round(seconds * 1000, 1) for name, seconds in _load_times.items()}
@@ -0,0 +1,175 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+from difflib import SequenceMatcher
+
+# 結構化欄位：list 欄位需要合併去重，summary 另外處理
+LIST_FIELDS = ("meeting_topics", "participants", "key_points", "next_steps")
+
+
+# --- Split ---
+def split_transcript(text, window_chars=30000, overlap_chars=1000):
+    """
+    將逐字稿切成重疊的視窗，盡量在句號或換行處斷開
+    回傳: [chunk_text, ...]
+    """
+    if not text:
+        return [""]
+    if len(text) <= window_chars:
+        return [text]
+    if overlap_chars >= window_chars:
+        raise ValueError("overlap_chars must be smaller than window_chars")
+
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + window_chars, len(text))
+        if end < len(text):
+            # 在視窗後段尋找自然斷點，避免把句子切半
+            cut = max(text.rfind(sep, start + window_chars // 2, end) for sep in ("\n", "。", "！", "？", ". "))
+            if cut > start:
+                end = cut + 1
+        chunks.append(text[start:end])
+        if end >= len(text):
+            break
+        start = end - overlap_chars
+    return chunks
+
+
+# --- Map ---
+def map_chunks(chunks, analyze_fn, max_parallel=4):
+    """
+    以最多 max_parallel 個執行緒並行分析各片段，回傳結果順序與輸入相同
+    analyze_fn(chunk, index, total) -> dict
+    """
+    total = len(chunks)
+    if total == 1:
+        return [analyze_fn(chunks[0], 0, 1)]
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, total))) as pool:
+        futures = [pool.submit(analyze_fn, chunk, idx, total) for idx, chunk in enumerate(chunks)]
+        return [f.result() for f in futures]
+
+
+# --- Reduce ---
+def _norm(value):
+    """比對用的正規化：去除空白與標點、轉小寫"""
+    return re.sub(r"[\s\W_]+", "", str(value or "")).lower()
+
+
+def _merge_participants(items):
+    merged = {}
+    for p in items:
+        if isinstance(p, dict):
+            name, role = p.get("name", ""), p.get("role", "")
+        else:
+            name, role = str(p), ""
+        key = _norm(name)
+        if not key:
+            continue
+        if key not in merged:
+            merged[key] = {"name": name, "role": role}
+        elif role and _norm(role) not in _norm(merged[key]["role"]):
+            # 不同片段對同一人的描述互補時合併
+            merged[key]["role"] = f"{merged[key]['role']}；{role}" if merged[key]["role"] else role
+    return list(merged.values())
+
+
+def _merge_key_points(items):
+    merged = {}
+    for kp in items:
+        if isinstance(kp, dict):
+            title, content = kp.get("title", ""), kp.get("content", "")
+        else:
+            title, content = str(kp), ""
+        key = _norm(title) or _norm(content)
+        if not key:
+            continue
+        if key not in merged:
+            merged[key] = {"title": title, "content": content}
+        elif content and _norm(content) not in _norm(merged[key]["content"]):
+            merged[key]["content"] = f"{merged[key]['content']}\n{content}".strip()
+    return list(merged.values())
+
+
+def _merge_next_steps(items):
+    merged = {}
+    for step in items:
+        if isinstance(step, dict):
+            action, owner = step.get("action", ""), step.get("owner", "")
+        else:
+            action, owner = str(step), ""
+        key = _norm(action)
+        if not key:
+            continue
+        if key not in merged:
+            merged[key] = {"action": action, "owner": owner}
+        elif owner and not merged[key]["owner"]:
+            merged[key]["owner"] = owner
+    return list(merged.values())
+
+
+def _merge_topics(items):
+    seen = {}
+    for topic in items:
+        key = _norm(topic)
+        if key and key not in seen:
+            seen[key] = topic
+    return list(seen.values())
+
+
+def merge_structured(results, summarize_fn=None):
+    """
+    合併各片段的結構化資料並去重
+    summarize_fn(summaries) -> str：可選，將各段摘要整合成單一摘要；未提供或失敗時直接串接
+    """
+    collected = {field: [] for field in LIST_FIELDS}
+    summaries = []
+    for result in results:
+        for field in LIST_FIELDS:
+            collected[field].extend(result.get(field) or [])
+        if result.get("summary"):
+            summaries.append(result["summary"])
+
+    merged = {
+        "meeting_topics": _merge_topics(collected["meeting_topics"]),
+        "participants": _merge_participants(collected["participants"]),
+        "key_points": _merge_key_points(collected["key_points"]),
+        "next_steps": _merge_next_steps(collected["next_steps"]),
+    }
+
+    if len(summaries) > 1 and summarize_fn:
+        try:
+            merged["summary"] = summarize_fn(summaries)
+        except Exception as e:
+            print(f"摘要整合失敗，改為直接串接: {e}")
+            merged["summary"] = "\n".join(summaries)
+    else:
+        merged["summary"] = "\n".join(summaries)
+    return merged
+
+
+def merge_transcripts(texts, max_overlap=2000, min_match=6, min_ratio=0.6):
+    """
+    串接各片段逐字稿，並移除相鄰片段重疊區造成的重複文字
+    重疊區由兩次轉錄產生，標點或個別字詞可能不同，因此以 SequenceMatcher 在交界視窗
+    (前段結尾 / 後段開頭各 max_overlap 字) 找最長的共同片段作為對齊點，
+    並確認對齊點推算出的整個重疊區相似度達 min_ratio (排除偶然重複的短句)：
+    對齊點之前保留前段，之後接上後段；對不齊時視為沒有重疊，以換行串接
+    """
+    merged = ""
+    for text in texts:
+        text = text or ""
+        if not merged:
+            merged = text
+            continue
+        tail = merged[-max_overlap:]
+        head = text[:max_overlap]
+        match = SequenceMatcher(None, tail, head, autojunk=False).find_longest_match(0, len(tail), 0, len(head))
+        overlap = len(tail) - match.a + match.b
+        if match.size >= min_match and SequenceMatcher(
+            None, tail[-overlap:], head[:overlap], autojunk=False
+        ).ratio() >= min_ratio:
+            merged = merged[:len(merged) - len(tail) + match.a + match.size] + text[match.b + match.size:]
+        else:
+            merged += "\n" + text
+    return merged
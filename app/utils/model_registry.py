@@ -0,0 +1,152 @@
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from app.utils.metrics import stage
+
+# 各模型大小的約略記憶體用量 (MB)，無法實際量測參數大小時使用
+MODEL_MEMORY_MB = {
+    "tiny": 150,
+    "base": 290,
+    "small": 970,
+    "medium": 3000,
+    "large": 6200,
+    "turbo": 3200,
+}
+
+# 整個 process 可用於 Whisper 模型的記憶體上限 (MB)
+MEMORY_BUDGET_MB = int(os.getenv("WHISPER_MEMORY_BUDGET_MB", "4096"))
+
+# 啟動時預先載入的模型 (逗號分隔，例如 "base,medium")
+PRELOAD_MODELS = os.getenv("WHISPER_PRELOAD", "")
+
+
+def _load_whisper(name):
+    import whisper
+    return whisper.load_model(name)
+
+
+def _estimate_mb(name, model):
+    """優先以實際參數大小估算，否則查表"""
+    try:
+        total = sum(p.numel() * p.element_size() for p in model.parameters())
+        return total / (1024 * 1024)
+    except Exception:
+        return MODEL_MEMORY_MB.get(name.split(".")[0], 1000)
+
+
+class _Entry:
+    def __init__(self, model, size_mb):
+        self.model = model
+        self.size_mb = size_mb
+        # 同一個模型實例的推論不是 thread-safe，使用時需持有此鎖
+        self.lock = threading.Lock()
+        self.loaded_at = time.time()
+        self.uses = 0
+
+
+class WhisperModelRegistry:
+    """
+    Process 內共用的 Whisper 模型登錄表
+    - 每個模型大小在同一個 process 只載入一次
+    - 多執行緒共用同一個實例，推論時以鎖保護
+    - 總用量超過記憶體預算時，淘汰最久未使用 (LRU) 的模型
+    """
+
+    def __init__(self, memory_budget_mb=MEMORY_BUDGET_MB, loader=_load_whisper):
+        self.memory_budget_mb = memory_budget_mb
+        self.loader = loader
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        # 每個模型名稱一把載入鎖，避免多個執行緒同時載入同一個模型
+        self._load_locks = {}
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, name):
+        """取得模型 (必要時載入)，並標記為最近使用"""
+        with self._lock:
+            entry = self._models.get(name)
+            if entry:
+                self._models.move_to_end(name)
+                return entry
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        with load_lock:
+            # 等待期間可能已由其他執行緒載入完成
+            with self._lock:
+                entry = self._models.get(name)
+                if entry:
+                    self._models.move_to_end(name)
+                    return entry
+
+            print(f"正在載入 Whisper 模型: {name}...")
+            started = time.time()
+            with stage("whisper_model_load"):
+                model = self.loader(name)
+            entry = _Entry(model, _estimate_mb(name, model))
+            print(f"Whisper 模型 {name} 載入完成 ({time.time() - started:.1f}s, 約 {entry.size_mb:.0f} MB)")
+
+            with self._lock:
+                self._models[name] = entry
+                self.loads += 1
+                self._enforce_budget(keep=name)
+            return entry
+
+    @contextmanager
+    def use(self, name):
+        """以 with 區塊取得模型並獨佔使用"""
+        entry = self.get(name)
+        with entry.lock:
+            entry.uses += 1
+            yield entry.model
+
+    def warm_up(self, names=None):
+        """預先載入模型，names 未指定時使用 WHISPER_PRELOAD 設定"""
+        if names is None:
+            names = [n.strip() for n in PRELOAD_MODELS.split(",") if n.strip()]
+        for name in names:
+            self.get(name)
+
+    def evict(self, name):
+        with self._lock:
+            if self._models.pop(name, None):
+                self.evictions += 1
+        gc.collect()
+
+    def _enforce_budget(self, keep):
+        """呼叫時需持有 self._lock；淘汰 LRU 模型直到總用量低於預算 (至少保留 keep)"""
+        evicted = []
+        while self._total_mb() > self.memory_budget_mb and len(self._models) > 1:
+            name = next(iter(self._models))
+            if name == keep:
+                break
+            self._models.pop(name)
+            self.evictions += 1
+            evicted.append(name)
+        if evicted:
+            print(f"Whisper 模型超過記憶體預算 {self.memory_budget_mb} MB，已釋放: {', '.join(evicted)}")
+            gc.collect()
+
+    def _total_mb(self):
+        return sum(e.size_mb for e in self._models.values())
+
+    def stats(self):
+        with self._lock:
+            return {
+                "models": {
+                    name: {"size_mb": round(e.size_mb, 1), "uses": e.uses, "loaded_at": e.loaded_at}
+                    for name, e in self._models.items()
+                },
+                "total_mb": round(self._total_mb(), 1),
+                "memory_budget_mb": self.memory_budget_mb,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+
+
+# Process 共用的單一實例
+registry = WhisperModelRegistry()
@@ -0,0 +1,207 @@
+import argparse
+import atexit
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+# 平行轉錄的 worker 數量，預設為 CPU 核心數的一半 (每個 worker 各自持有一份模型)
+WORKERS = int(os.getenv("WHISPER_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+
+# 每段目標長度 (秒)，實際切點會落在附近最安靜的位置
+SEGMENT_SECONDS = float(os.getenv("WHISPER_SEGMENT_SECONDS", "60"))
+
+
+# --- 切割 ---
+def find_split_points(audio, sample_rate=SAMPLE_RATE, segment_seconds=SEGMENT_SECONDS,
+                      frame_ms=30, silence_ms=300):
+    """
+    在每個目標切點附近，找出能量最低 (最安靜) 的位置作為切點
+    以 frame RMS 能量的移動平均判斷，避免把一個字切成兩半
+    回傳: 樣本索引列表 (不含 0 與結尾)
+    """
+    frame = int(sample_rate * frame_ms / 1000)
+    n_frames = len(audio) // frame
+    segment_frames = int(segment_seconds * 1000 / frame_ms)
+    if n_frames <= segment_frames:
+        return []
+
+    frames = audio[: n_frames * frame].reshape(n_frames, frame)
+    rms = np.sqrt(np.mean(frames.astype(np.float64) ** 2, axis=1))
+
+    # 以 silence_ms 長度做移動平均，找的是「一段」安靜而不是單一安靜 frame
+    width = max(1, silence_ms // frame_ms)
+    smoothed = np.convolve(rms, np.ones(width) / width, mode="same")
+
+    search = segment_frames // 4
+    points = []
+    target = segment_frames
+    while target < n_frames - search:
+        lo, hi = target - search, min(target + search, n_frames)
+        cut = lo + int(np.argmin(smoothed[lo:hi]))
+        points.append(cut * frame)
+        target = cut + segment_frames
+    return points
+
+
+def split_on_silence(audio, sample_rate=SAMPLE_RATE, segment_seconds=SEGMENT_SECONDS):
+    """回傳 [(offset_seconds, samples), ...]"""
+    bounds = [0] + find_split_points(audio, sample_rate, segment_seconds) + [len(audio)]
+    return [
+        (start / sample_rate, audio[start:end])
+        for start, end in zip(bounds[:-1], bounds[1:])
+        if end > start
+    ]
+
+
+# --- Worker process ---
+_worker_model = None
+
+
+def _init_worker(model_name, threads):
+    """每個 worker process 啟動時載入一次自己的模型"""
+    global _worker_model
+    import torch
+    import whisper
+
+    # 多個 process 並行時，限制每個 process 的執行緒數避免互搶 CPU
+    torch.set_num_threads(threads)
+    _worker_model = whisper.load_model(model_name)
+
+
+def _transcribe_segment(index, offset, samples):
+    result = _worker_model.transcribe(samples, fp16=False)
+    segments = [
+        {
+            "start": round(seg["start"] + offset, 2),
+            "end": round(seg["end"] + offset, 2),
+            "text": seg["text"],
+        }
+        for seg in result.get("segments", [])
+    ]
+    return index, result["text"], segments
+
+
+# --- Pool 管理 ---
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _get_pool(model_name, workers):
+    """同一組 (模型, worker 數) 共用一個 pool，讓 worker 內的模型保持載入狀態"""
+    key = (model_name, workers)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            threads = max(1, (os.cpu_count() or workers) // workers)
+            # torch 與 fork 不相容，固定使用 spawn
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(model_name, threads),
+            )
+            _pools[key] = pool
+        return pool
+
+
+@atexit.register
+def shutdown_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        _pools.clear()
+
+
+# --- 對外介面 ---
+def transcribe_parallel(file_path, model_name="base", workers=WORKERS, segment_seconds=SEGMENT_SECONDS,
+                        audio=None, time_map=None):
+    """
+    在安靜處切割音訊後，以多個 process 平行轉錄，再依序接回
+    audio: 可選，已載入 (例如已裁切靜音) 的 16 kHz 音訊；time_map 用來將 segments 換回原始錄音時間
+    回傳: {"text", "segments", "num_segments", "workers", "elapsed"}
+    """
+    import whisper
+
+    started = time.time()
+    if audio is None:
+        audio = whisper.load_audio(file_path)
+    pieces = split_on_silence(audio, SAMPLE_RATE, segment_seconds)
+
+    pool = _get_pool(model_name, workers)
+    futures = [
+        pool.submit(_transcribe_segment, idx, offset, samples)
+        for idx, (offset, samples) in enumerate(pieces)
+    ]
+    results = sorted((f.result() for f in futures), key=lambda r: r[0])
+    segments = [seg for _, _, segs in results for seg in segs]
+    if time_map is not None:
+        segments = time_map.map_segments(segments)
+
+    return {
+        "text": "".join(text for _, text, _ in results).strip(),
+        "segments": segments,
+        "num_segments": len(pieces),
+        "workers": workers,
+        "elapsed": round(time.time() - started, 3),
+    }
+
+
+def benchmark(file_path, model_name="base", workers=WORKERS, segment_seconds=SEGMENT_SECONDS):
+    """比較原本單一 process 轉錄與平行轉錄的耗時 (兩者皆不含模型載入時間)"""
+    from app.utils.model_registry import registry
+
+    with registry.use(model_name) as model:
+        started = time.time()
+        model.transcribe(file_path, fp16=False)
+        serial = time.time() - started
+
+    # 先跑一次極短音訊讓各 worker 載入模型，避免把載入時間算進平行轉錄
+    pool = _get_pool(model_name, workers)
+    silence = np.zeros(SAMPLE_RATE, dtype=np.float32)
+    list(pool.map(_transcribe_segment, range(workers), [0.0] * workers, [silence] * workers))
+
+    parallel = transcribe_parallel(file_path, model_name, workers, segment_seconds)
+    return {
+        "file": file_path,
+        "model": model_name,
+        "workers": workers,
+        "num_segments": parallel["num_segments"],
+        "serial_seconds": round(serial, 3),
+        "parallel_seconds": parallel["elapsed"],
+        "speedup": round(serial / parallel["elapsed"], 2) if parallel["elapsed"] else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel Whisper transcription")
+    parser.add_argument("file_path", help="Path to the audio file")
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--segment_seconds", type=float, default=SEGMENT_SECONDS)
+    parser.add_argument("--benchmark", action="store_true", help="Compare with the serial path")
+    parser.add_argument("--trim", action="store_true", help="Remove long silences before transcribing")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        report = benchmark(args.file_path, args.model, args.workers, args.segment_seconds)
+    elif args.trim:
+        import whisper
+        from app.utils.vad import trim_silence
+
+        trimmed = trim_silence(whisper.load_audio(args.file_path), SAMPLE_RATE, policy="auto")
+        report = transcribe_parallel(
+            args.file_path, args.model, args.workers, args.segment_seconds,
+            audio=trimmed.audio if trimmed else None,
+            time_map=trimmed.time_map if trimmed else None,
+        )
+        report["silence_trim"] = trimmed.as_dict() if trimmed else None
+    else:
+        report = transcribe_parallel(args.file_path, args.model, args.workers, args.segment_seconds)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
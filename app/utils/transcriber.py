@@ -1,25 +1,85 @@
-import whisper
-from google import genai
-from google.genai import types
+import hashlib
 import json
 import os
-import streamlit as st
+
+from app.utils.map_reduce import split_transcript, map_chunks, merge_structured
+from app.utils.model_registry import registry
+from app.utils.gemini_client import gemini, types
+from app.utils.single_flight import SingleFlight
+from app.utils.metrics import stage, add_bytes
+from app.utils.lazy import lazy_import
+
+# 只有未傳入 api_key 時才需要讀取 st.secrets；Node 的 process_meeting.py 不必載入 streamlit
+st = lazy_import("streamlit")
+whisper = lazy_import("whisper")
 
 # 預設載入 base 模型，速度較快。若需要更高準確度可改用 "medium" 或 "large"
 MODEL_SIZE = "base"
 
-def transcribe_audio(file_path, model_name=MODEL_SIZE):
+# 設為 1 時，在安靜處切割音訊並以多個 process 平行轉錄 (worker 數見 WHISPER_WORKERS)
+PARALLEL_TRANSCRIBE = os.getenv("WHISPER_PARALLEL", "0") == "1"
+
+# whisper.load_audio 輸出的取樣率
+WHISPER_SAMPLE_RATE = 16000
+
+# 長逐字稿切割設定：超過 TRANSCRIPT_CHUNK_CHARS 的逐字稿切成重疊視窗並行分析
+TRANSCRIPT_CHUNK_CHARS = int(os.getenv("TRANSCRIPT_CHUNK_CHARS", "30000"))
+TRANSCRIPT_CHUNK_OVERLAP = int(os.getenv("TRANSCRIPT_CHUNK_OVERLAP", "1000"))
+STRUCTURE_MAX_PARALLEL = int(os.getenv("STRUCTURE_MAX_PARALLEL", "4"))
+
+# 相同逐字稿同時整理時只呼叫一次 Gemini (例如重複點擊、多個 session 分析同一份錄音)
+structure_flight = SingleFlight()
+
+def transcribe_audio(file_path, model_name=MODEL_SIZE, parallel=None, workers=None, on_event=None,
+                     with_segments=False):
     """
     使用 Whisper 將音訊檔案轉錄為文字
+    轉錄前先移除長靜音 (見 app.utils.vad)；on_event(event, data) 可選，回報靜音裁切結果
+    parallel=True 時改用多 process 平行轉錄 (適合多核心 CPU)
+    with_segments=True 時回傳 (text, segments)；兩種模式的 segments 時間皆已換回原始錄音時間
     """
-    print(f"正在載入 Whisper 模型: {model_name}...")
-    model = whisper.load_model(model_name)
-    
-    print(f"正在轉錄檔案: {file_path}...")
-    # fp16=False 是為了避免在某些 CPU 上報錯
-    result = model.transcribe(file_path, fp16=False)
-    
-    return result["text"]
+    from app.utils.vad import trim_silence, VAD_TRIM
+
+    if parallel is None:
+        parallel = PARALLEL_TRANSCRIBE
+
+    add_bytes("whisper_transcribe", os.path.getsize(file_path))
+    audio, trimmed = file_path, None
+    if VAD_TRIM != "off":
+        with stage("audio_load"):
+            audio = whisper.load_audio(file_path)
+        trimmed = trim_silence(audio, WHISPER_SAMPLE_RATE)
+        if trimmed:
+            audio = trimmed.audio
+            if on_event:
+                on_event("silence_trimmed", trimmed.as_dict())
+
+    if parallel:
+        from app.utils.parallel_transcribe import transcribe_parallel, WORKERS
+        with stage("whisper_transcribe"):
+            result = transcribe_parallel(
+                file_path, model_name, workers or WORKERS,
+                audio=None if isinstance(audio, str) else audio,
+                time_map=trimmed.time_map if trimmed else None,
+            )
+        print(f"平行轉錄完成: {result['num_segments']} 段 / {result['workers']} workers / {result['elapsed']}s")
+        return (result["text"], result["segments"]) if with_segments else result["text"]
+
+    # 模型由 registry 在 process 內共用，只有第一次使用時才會載入
+    with registry.use(model_name) as model:
+        print(f"正在轉錄檔案: {file_path}...")
+        # fp16=False 是為了避免在某些 CPU 上報錯
+        with stage("whisper_transcribe"):
+            result = model.transcribe(audio, fp16=False)
+
+    # 轉錄的是裁切後的音訊，segments 時間需換回原始錄音時間 (欄位與平行模式相同)
+    segments = [
+        {"start": round(seg["start"], 2), "end": round(seg["end"], 2), "text": seg["text"]}
+        for seg in result.get("segments", [])
+    ]
+    if trimmed:
+        segments = trimmed.time_map.map_segments(segments)
+    return (result["text"], segments) if with_segments else result["text"]
 
 def structure_meeting_notes(transcript_text, api_key=None):
     """
@@ -38,12 +98,43 @@ def structure_meeting_notes(transcript_text, api_key=None):
                 "summary": "未設定 API Key"
             }
 
-    # 初始化 Gemini Client
-    client = genai.Client(api_key=api_key)
+    key = hashlib.sha256((transcript_text or "").encode("utf-8")).hexdigest()
+    with stage("gemini_structure"):
+        return structure_flight.run(key, lambda: _structure_notes(api_key, transcript_text))
+
+def _structure_notes(api_key, transcript_text):
+    try:
+        # 長逐字稿切成重疊視窗並行分析，再合併去重 (不再截斷為前 30000 字)
+        chunks = split_transcript(transcript_text, TRANSCRIPT_CHUNK_CHARS, TRANSCRIPT_CHUNK_OVERLAP)
+        results = map_chunks(
+            chunks,
+            lambda chunk, index, total: _structure_chunk(api_key, chunk, index, total),
+            max_parallel=STRUCTURE_MAX_PARALLEL,
+        )
+        if len(results) == 1:
+            return results[0]
+        return merge_structured(results, summarize_fn=lambda summaries: _summarize(api_key, summaries))
     
+    except Exception as e:
+        print(f"Gemini API Error: {e}")
+        return {
+            "meeting_topics": [],
+            "participants": [],
+            "key_points": [{"title": "錯誤", "content": f"AI 分析發生錯誤: {str(e)}"}],
+            "next_steps": [],
+            "summary": ""
+        }
+
+def _structure_chunk(api_key, transcript_text, index=0, total=1):
+    """將單一段逐字稿整理為結構化資料"""
+    segment_note = ""
+    if total > 1:
+        segment_note = f"注意：這是一場較長會議依時間切割後的第 {index + 1}/{total} 段逐字稿，只需整理本段內容。"
+
     prompt = f"""
     你是一個專業的會議記錄秘書。你的任務是閱讀會議逐字稿，並將其整理成繁體中文的結構化 JSON 格式。
     請特別注意參與者的職責與待辦事項的負責人。
+    {segment_note}
     
     請依照以下 JSON Schema 回傳資料：
     {{
@@ -62,26 +153,31 @@ def structure_meeting_notes(transcript_text, api_key=None):
     }}
 
     以下是會議逐字稿：
-    {transcript_text[:30000]}
+    {transcript_text}
     """
 
-    try:
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json"
-            )
+    # 共用 client：限流、併發上限與 429/5xx 重試
+    response = gemini.call(api_key, lambda client: client.models.generate_content(
+        model="gemini-2.5-flash",
+        contents=prompt,
+        config=types.GenerateContentConfig(
+            response_mime_type="application/json"
         )
-        
+    ), label="structure")
+    add_bytes("gemini_structure", len(response.text.encode("utf-8")))
+    with stage("json_parse"):
         return json.loads(response.text)
-    
-    except Exception as e:
-        print(f"Gemini API Error: {e}")
-        return {
-            "meeting_topics": [],
-            "participants": [],
-            "key_points": [{"title": "錯誤", "content": f"AI 分析發生錯誤: {str(e)}"}],
-            "next_steps": [],
-            "summary": ""
-        }
+
+def _summarize(api_key, summaries):
+    """將各片段摘要整合為一段完整摘要"""
+    prompt = (
+        "以下是同一場會議依時間順序切成數段後，各段的摘要。"
+        "請整合成一段約 100-200 字的繁體中文會議總結摘要，只回傳摘要內容：\n\n"
+        + "\n".join(f"{idx}. {s}" for idx, s in enumerate(summaries, 1))
+    )
+    response = gemini.call(
+        api_key,
+        lambda client: client.models.generate_content(model="gemini-2.5-flash", contents=prompt),
+        label="summarize",
+    )
+    return response.text.strip()
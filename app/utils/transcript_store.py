@@ -0,0 +1,194 @@
+import os
+import sqlite3
+import statistics
+import threading
+import time
+import zlib
+
+from app.utils import db_pool
+
+try:
+    import zstandard
+except ImportError: # 未安裝時使用標準庫的 zlib
+    zstandard = None
+
+# 壓縮格式 (存在資料第一個 byte)
+FORMAT_RAW = 0
+FORMAT_ZLIB = 1
+FORMAT_ZSTD = 2
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+
+# 背景搬移既有逐字稿時每批處理的筆數
+MIGRATION_BATCH_SIZE = int(os.getenv("TRANSCRIPT_MIGRATION_BATCH", "200"))
+
+# 儲存報告中量測解壓縮時間的抽樣筆數
+REPORT_SAMPLE_ROWS = 50
+
+
+def encode_transcript(text):
+    """壓縮逐字稿：1 byte 格式版本 + 壓縮後的 UTF-8"""
+    raw = (text or "").encode("utf-8")
+    if zstandard is not None:
+        return bytes([FORMAT_ZSTD]) + zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return bytes([FORMAT_ZLIB]) + zlib.compress(raw, ZLIB_LEVEL)
+
+
+def decode_transcript(blob):
+    """解壓縮逐字稿 (依第一個 byte 判斷格式)"""
+    if blob is None:
+        return None
+    blob = bytes(blob)
+    version, payload = blob[0], blob[1:]
+    if version == FORMAT_ZLIB:
+        return zlib.decompress(payload).decode("utf-8")
+    if version == FORMAT_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("此逐字稿以 zstd 壓縮，請安裝 zstandard")
+        return zstandard.ZstdDecompressor().decompress(payload).decode("utf-8")
+    if version == FORMAT_RAW:
+        return payload.decode("utf-8")
+    raise ValueError(f"未知的逐字稿格式: {version}")
+
+
+def register_functions(conn):
+    """註冊 SQL 函式 transcript_text(data)，讓檢視表 / 全文索引可讀取壓縮後的逐字稿"""
+    conn.create_function("transcript_text", 1, decode_transcript, deterministic=True)
+
+
+# 連線池中的每條新連線都註冊 transcript_text()
+db_pool.register_connect_hook(register_functions)
+
+
+def init_transcript_table(conn):
+    """
+    逐字稿另存於 meeting_transcripts (壓縮)，meetings.transcription 搬移後設為 NULL
+    讀取時以 coalesce(meetings.transcription, transcript_text(data)) 相容尚未搬移的資料
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS meeting_transcripts (
+            meeting_id INTEGER PRIMARY KEY,
+            data BLOB NOT NULL,
+            raw_bytes INTEGER NOT NULL,
+            stored_bytes INTEGER NOT NULL
+        )
+    ''')
+
+
+def transcript_sql(alias="m"):
+    """SELECT 中取得逐字稿的運算式 (只有真的選取時才會解壓縮)"""
+    return (
+        f"coalesce({alias}.transcription, "
+        f"(SELECT transcript_text(t.data) FROM meeting_transcripts t WHERE t.meeting_id = {alias}.id))"
+    )
+
+
+def store_transcript(conn, meeting_id, text):
+    """
+    壓縮並寫入逐字稿，清空 meetings.transcription (由呼叫端 commit)
+    新會議建立時 transcription 直接寫入 NULL，再於同一個交易呼叫此函式，逐字稿只寫入一次
+    """
+    raw_bytes = len((text or "").encode("utf-8"))
+    data = encode_transcript(text)
+    conn.execute(
+        "INSERT OR REPLACE INTO meeting_transcripts (meeting_id, data, raw_bytes, stored_bytes) VALUES (?, ?, ?, ?)",
+        (meeting_id, data, raw_bytes, len(data)),
+    )
+    conn.execute("UPDATE meetings SET transcription = NULL WHERE id = ? AND transcription IS NOT NULL", (meeting_id,))
+
+
+def load_transcript(conn, meeting_id):
+    """讀取單一會議的逐字稿 (需要時才解壓縮)"""
+    row = conn.execute(
+        "SELECT m.transcription, t.data FROM meetings m LEFT JOIN meeting_transcripts t ON t.meeting_id = m.id WHERE m.id = ?",
+        (meeting_id,),
+    ).fetchone()
+    if not row:
+        return None
+    return row[0] if row[0] is not None else decode_transcript(row[1])
+
+
+def migrate_batch(conn, after_id=0, batch_size=MIGRATION_BATCH_SIZE):
+    """搬移一批尚未壓縮的逐字稿，回傳 (處理筆數, 最後一筆 id)"""
+    rows = conn.execute(
+        "SELECT id, transcription FROM meetings WHERE id > ? AND transcription IS NOT NULL ORDER BY id LIMIT ?",
+        (after_id, batch_size),
+    ).fetchall()
+    for meeting_id, text in rows:
+        store_transcript(conn, meeting_id, text)
+    conn.commit()
+    return len(rows), (rows[-1][0] if rows else after_id)
+
+
+def migrate(connect, batch_size=MIGRATION_BATCH_SIZE, pause=0.0):
+    """分批搬移所有未壓縮的逐字稿；每批一個交易，不會長時間鎖住資料庫"""
+    total = 0
+    after_id = 0
+    while True:
+        conn = connect()
+        try:
+            count, after_id = migrate_batch(conn, after_id, batch_size)
+            if count < batch_size:
+                # 會議已刪除的逐字稿
+                conn.execute("DELETE FROM meeting_transcripts WHERE meeting_id NOT IN (SELECT id FROM meetings)")
+                conn.commit()
+        except sqlite3.OperationalError as e:
+            print(f"⚠️ 逐字稿壓縮搬移失敗，稍後重試: {e}")
+            return total
+        finally:
+            conn.close()
+        total += count
+        if count < batch_size:
+            return total
+        if pause:
+            time.sleep(pause)
+
+
+def start_migration(connect, batch_size=MIGRATION_BATCH_SIZE):
+    """在背景執行緒搬移，不阻塞服務啟動"""
+    def run():
+        started = time.time()
+        count = migrate(connect, batch_size, pause=0.01)
+        if count:
+            print(f"🗜️ 已壓縮 {count} 筆逐字稿 ({time.time() - started:.1f}s)")
+
+    thread = threading.Thread(target=run, name="transcript-migration", daemon=True)
+    thread.start()
+    return thread
+
+
+def storage_report(conn, sample_rows=REPORT_SAMPLE_ROWS):
+    """壓縮前後大小、節省比例，以及抽樣量測的單筆解壓縮時間"""
+    stored_rows, raw_bytes, stored_bytes = conn.execute(
+        "SELECT count(*), coalesce(sum(raw_bytes), 0), coalesce(sum(stored_bytes), 0) FROM meeting_transcripts"
+    ).fetchone()
+    pending_rows, pending_bytes = conn.execute(
+        "SELECT count(*), coalesce(sum(length(CAST(transcription AS BLOB))), 0) FROM meetings WHERE transcription IS NOT NULL"
+    ).fetchone()
+
+    timings = []
+    for (data,) in conn.execute(
+        "SELECT data FROM meeting_transcripts WHERE meeting_id IN "
+        "(SELECT meeting_id FROM meeting_transcripts ORDER BY random() LIMIT ?)",
+        (sample_rows,),
+    ).fetchall():
+        started = time.perf_counter()
+        decode_transcript(data)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    return {
+        "compressed_rows": stored_rows,
+        "pending_rows": pending_rows,
+        "pending_bytes": pending_bytes,
+        "raw_bytes": raw_bytes,
+        "stored_bytes": stored_bytes,
+        "saved_bytes": raw_bytes - stored_bytes,
+        "ratio": round(stored_bytes / raw_bytes, 3) if raw_bytes else None,
+        "codec": "zstd" if zstandard is not None else "zlib",
+        "decompress_ms": {
+            "samples": len(timings),
+            "avg": round(statistics.mean(timings), 3) if timings else None,
+            "max": round(max(timings), 3) if timings else None,
+        },
+    }
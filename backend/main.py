@@ -1,10 +1,14 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
-import shutil
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse, RedirectResponse, Response
+from fastapi.concurrency import run_in_threadpool
+import asyncio
+import base64
 import os
 import json
 import sqlite3
+import time
+from datetime import date
 from contextlib import asynccontextmanager
 from pydantic import BaseModel
 from typing import List, Optional
@@ -13,23 +17,87 @@ from dotenv import load_dotenv
 # 載入服務模組
 from services.transcriber import analyze_audio_directly
 from services.doc_gen import generate_meeting_minutes
+from services.job_queue import JobQueue
+from services.analysis_cache import AnalysisCache
+from services.single_flight import SingleFlight
+from services.gemini_client import gemini
+from services.job_events import TERMINAL_EVENTS, format_sse
+from services.doc_cache import DocumentCache
+from services.detail_cache import DetailCache
+from services.db_pool import connect as db_connect
+from services.transcript_store import (
+    init_transcript_table, store_transcript, transcript_sql, start_migration, storage_report,
+)
+from services.search import search_meetings, init_search_index
+from services.normalize import ACTION_ITEM_STATUSES, init_child_tables, start_backfill
+from services.export import EXPORT_FORMATS, iter_meetings, stream_export
+from services.ingest import ingest_upload, remove_workspace, sweep_workspaces, UploadTooLarge
+from services import metrics
+from services.metrics import stage, add_bytes
 
 load_dotenv()
 
-# 設定資料庫路徑
-DB_PATH = os.path.join(os.path.dirname(__file__), "meetings.db")
-UPLOAD_DIR = os.path.join(os.path.dirname(__file__), "uploads")
-DOWNLOAD_DIR = os.path.join(os.path.dirname(__file__), "downloads")
+# 設定資料庫路徑 (可用環境變數改到其他位置，例如 benchmark 使用暫存目錄)
+DB_PATH = os.getenv("MEETINGS_DB_PATH", os.path.join(os.path.dirname(__file__), "meetings.db"))
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", os.path.join(os.path.dirname(__file__), "uploads"))
+DOWNLOAD_DIR = os.getenv("DOWNLOAD_DIR", os.path.join(os.path.dirname(__file__), "downloads"))
 
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(DOWNLOAD_DIR, exist_ok=True)
 
+# 同時處理的分析工作數量上限
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+
+# 分析結果快取上限 (筆數 / 總大小 / 保存天數)
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "500"))
+ANALYSIS_CACHE_MAX_MB = int(os.getenv("ANALYSIS_CACHE_MAX_MB", "200"))
+ANALYSIS_CACHE_MAX_AGE_DAYS = int(os.getenv("ANALYSIS_CACHE_MAX_AGE_DAYS", "30"))
+
+# 上傳檔案分段讀取大小與大小上限
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "500"))
+
+# 會議列表每頁筆數 (預設 / 上限)
+MEETINGS_PAGE_SIZE = 50
+MEETINGS_MAX_PAGE_SIZE = 200
+
+# 可透過 fields= 指定的欄位；逐字稿等大欄位只有明確指定時才讀取
+MEETING_FIELDS = (
+    "id", "filename", "created_at", "summary", "meeting_topics",
+    "participants", "key_points", "next_steps", "discussion_topics", "transcription",
+)
+LIST_DEFAULT_FIELDS = ("id", "filename", "created_at", "summary")
+DETAIL_DEFAULT_FIELDS = tuple(f for f in MEETING_FIELDS if f != "transcription")
+
+# 會議詳細資料回應快取上限 (筆數 / 總大小)
+DETAIL_CACHE_MAX_ENTRIES = int(os.getenv("DETAIL_CACHE_MAX_ENTRIES", "1000"))
+DETAIL_CACHE_MAX_MB = int(os.getenv("DETAIL_CACHE_MAX_MB", "64"))
+
+# 待辦事項 / 與會者查詢每次最多回傳筆數
+CHILD_QUERY_LIMIT = 100
+CHILD_QUERY_MAX_LIMIT = 500
+
+# SSE 連線保持 (秒)：定期送出註解行，避免 proxy 關閉閒置連線
+SSE_HEARTBEAT_SECONDS = 15
+
+# SSE 超過此秒數沒有收到事件時改查 jobs 表 (工作可能由其他 uvicorn worker 程序執行，事件不會送到本程序)
+SSE_POLL_SECONDS = float(os.getenv("SSE_POLL_SECONDS", "3"))
+
 # --- 生命週期管理 ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("🚀 系統啟動中...")
     init_db()            # 初始化資料庫
+    start_backfill(get_db_connection)  # 背景回填與會者 / 待辦事項子表
+    start_migration(get_db_connection) # 背景壓縮既有逐字稿
+    analysis_cache.init_table()
+    single_flight.init_table()
+    job_queue.start()    # 啟動背景工作佇列 (並恢復未完成的工作)
+    removed = sweep_workspaces(UPLOAD_DIR, keep=job_queue.pending_paths())
+    if removed:
+        print(f"🧹 已清除 {removed} 個遺留的上傳目錄")
     yield
+    job_queue.shutdown()
     print("🛑 系統關閉")
 
 app = FastAPI(lifespan=lifespan)
@@ -41,11 +109,50 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing"],
+)
+
+HTTP_SECONDS = metrics.registry.histogram(
+    "http_request_seconds", "API 回應時間 (秒，串流回應只計到開始送出)", ("method", "route", "status")
 )
+HTTP_IN_FLIGHT = metrics.registry.gauge("http_requests_in_flight", "處理中的 API 請求數")
+
+# 記錄每個 API 的回應時間；帶 X-Trace: 1 (或 METRICS_TRACE_ALL=1) 時以 Server-Timing 回傳各階段耗時
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    traced = metrics.METRICS_TRACE_ALL or request.headers.get("x-trace") == "1"
+    trace = metrics.Trace() if traced else None
+    token = metrics.start_trace(trace) if traced else None
+    HTTP_IN_FLIGHT.inc()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        HTTP_IN_FLIGHT.dec()
+        # 以路由樣板 (例如 /api/meetings/{meeting_id}) 分組，避免每個 id 各一組
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        HTTP_SECONDS.observe(time.perf_counter() - started, (request.method, path, str(status)))
+        if token is not None:
+            metrics.end_trace(token)
+    if trace is not None:
+        response.headers["Server-Timing"] = trace.server_timing()
+    return response
+
+# 依 Content-Length 提早拒絕過大的上傳，不必等整個檔案傳完
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    if request.method == "POST" and request.url.path == "/api/upload":
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_MB * 1024 * 1024:
+            return JSONResponse(status_code=413, content={"detail": f"檔案超過上限 {MAX_UPLOAD_MB} MB"})
+    return await call_next(request)
 
 # --- 資料庫操作 ---
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
+    conn = db_connect(DB_PATH)
     c = conn.cursor()
     c.execute('''
         CREATE TABLE IF NOT EXISTS meetings (
@@ -67,13 +174,40 @@ def init_db():
         c.execute("ALTER TABLE meetings ADD COLUMN meeting_topics TEXT")
     except:
         pass
+    # 列表依 (created_at, id) 由新到舊分頁
+    c.execute("CREATE INDEX IF NOT EXISTS idx_meetings_created ON meetings (created_at, id)")
+    init_transcript_table(conn)
+    init_version_triggers(conn)
+    init_search_index(conn)
+    init_child_tables(conn)
     conn.commit()
     conn.close()
 
+def init_version_triggers(conn):
+    """
+    meetings.version：會議內容 (含逐字稿) 變更時由 trigger 遞增，存在資料庫中
+    詳細資料快取以此判斷是否過期，多個 worker / 程序之間也一致
+    """
+    try:
+        conn.execute("ALTER TABLE meetings ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+    except sqlite3.OperationalError:
+        pass
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS meetings_version_bump
+        AFTER UPDATE OF {", ".join(MEETING_FIELDS)} ON meetings BEGIN
+            UPDATE meetings SET version = version + 1 WHERE id = new.id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS meeting_transcripts_version_bump
+        AFTER INSERT ON meeting_transcripts BEGIN
+            UPDATE meetings SET version = version + 1 WHERE id = new.meeting_id;
+        END
+    ''')
+
 def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    # 從連線池取出 (WAL 模式)，conn.close() 時歸還
+    return db_connect(DB_PATH, row_factory=sqlite3.Row)
 
 # --- API Routes ---
 
@@ -81,24 +215,71 @@ def get_db_connection():
 def read_root():
     return {"status": "ok", "message": "Meeting Tools API is running"}
 
+def select_columns(fields):
+    """SELECT 欄位清單；逐字稿只有被選取時才會讀取並解壓縮"""
+    return ", ".join(
+        f"{transcript_sql('meetings')} AS transcription" if f == "transcription" else f"meetings.{f}"
+        for f in fields
+    )
+
+def parse_fields(fields, default):
+    """解析 fields=a,b,c；一律包含 id，未知欄位回傳 400"""
+    if not fields:
+        return default
+    names = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = names - set(MEETING_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"未知的欄位: {', '.join(sorted(unknown))}")
+    names.add("id")
+    return tuple(f for f in MEETING_FIELDS if f in names)
+
+def encode_cursor(row):
+    raw = json.dumps([row["created_at"], row["id"]]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        created_at, meeting_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return str(created_at), int(meeting_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="cursor 格式錯誤")
+
 @app.get("/api/meetings")
-def get_meetings():
-    conn = get_db_connection()
-    meetings = conn.execute("SELECT id, filename, created_at, summary FROM meetings ORDER BY created_at DESC").fetchall()
-    conn.close()
-    return [dict(m) for m in meetings]
+def get_meetings(
+    response: Response,
+    limit: int = Query(MEETINGS_PAGE_SIZE, ge=1, le=MEETINGS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    """
+    會議列表 (由新到舊)，以 (created_at, id) 游標分頁
+    還有下一頁時在 X-Next-Cursor 標頭回傳游標，帶入 cursor= 取得下一頁
+    """
+    columns = parse_fields(fields, LIST_DEFAULT_FIELDS)
+    select = select_columns(dict.fromkeys(columns + ("created_at",)))
+    where, params = "", []
+    if cursor:
+        where = "WHERE (created_at, id) < (?, ?)"
+        params.extend(decode_cursor(cursor))
 
-@app.get("/api/meetings/{meeting_id}")
-def get_meeting_detail(meeting_id: int):
     conn = get_db_connection()
-    row = conn.execute("SELECT * FROM meetings WHERE id = ?", (meeting_id,)).fetchone()
+    rows = conn.execute(
+        f"SELECT {select} FROM meetings {where} ORDER BY created_at DESC, id DESC LIMIT ?",
+        (*params, limit + 1),
+    ).fetchall()
     conn.close()
-    if not row:
-        raise HTTPException(status_code=404, detail="Meeting not found")
-    
-    # 解析 JSON 字串欄位
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1])
+    return [{key: value for key, value in parse_meeting_row(row).items() if key in columns} for row in rows]
+
+def parse_meeting_row(row):
+    """資料列轉成 dict 並解析 JSON 字串欄位"""
     data = dict(row)
     for key in ['participants', 'key_points', 'next_steps', 'meeting_topics']:
+        if key not in data:
+            continue
         try:
             if data[key]:
                 data[key] = json.loads(data[key])
@@ -106,79 +287,492 @@ def get_meeting_detail(meeting_id: int):
             pass
     return data
 
-@app.post("/api/upload")
+@app.get("/api/search")
+def search(q: str, limit: int = Query(20, ge=1, le=100), offset: int = Query(0, ge=0)):
+    """全文搜尋逐字稿、摘要、議題、重點與待辦事項 (依相關度排序，附標示片段)"""
+    conn = get_db_connection()
+    try:
+        return search_meetings(conn, q.strip(), limit=limit, offset=offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        conn.close()
+
+def load_meeting(meeting_id, fields=MEETING_FIELDS):
+    """讀取單一會議 (只讀取指定欄位) 並解析 JSON 字串欄位；不存在時回傳 None"""
+    with stage("db_load_meeting"):
+        conn = get_db_connection()
+        row = conn.execute(f"SELECT {select_columns(fields)} FROM meetings WHERE id = ?", (meeting_id,)).fetchone()
+        conn.close()
+    if not row:
+        return None
+    return parse_meeting_row(row)
+
+@app.get("/api/meetings/{meeting_id}")
+def get_meeting_detail(meeting_id: int, fields: Optional[str] = None):
+    """
+    預設不含逐字稿；需要時以 fields=...,transcription 指定
+    回應 (已序列化的 JSON) 快取在記憶體中；命中時只以主鍵查 meetings.version 確認未過期
+    """
+    columns = parse_fields(fields, DETAIL_DEFAULT_FIELDS)
+    conn = get_db_connection()
+    try:
+        row = conn.execute("SELECT version FROM meetings WHERE id = ?", (meeting_id,)).fetchone()
+    finally:
+        conn.close()
+    if not row:
+        raise HTTPException(status_code=404, detail="Meeting not found")
+    body = detail_cache.get(meeting_id, columns, row["version"])
+    if body is None:
+        data = load_meeting(meeting_id, columns)
+        if not data:
+            raise HTTPException(status_code=404, detail="Meeting not found")
+        body = detail_cache.put(meeting_id, columns, data, row["version"])
+    return Response(content=body, media_type="application/json")
+
+@app.get("/api/action-items")
+def get_action_items(
+    owner: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = Query(CHILD_QUERY_LIMIT, ge=1, le=CHILD_QUERY_MAX_LIMIT),
+):
+    """待辦事項 (可依負責人 / 狀態篩選)，由新到舊"""
+    if status and status not in ACTION_ITEM_STATUSES:
+        raise HTTPException(status_code=400, detail=f"status 只支援 {', '.join(ACTION_ITEM_STATUSES)}")
+    conditions, params = [], []
+    if owner:
+        conditions.append("a.owner = ?")
+        params.append(owner.strip())
+    if status:
+        conditions.append("a.status = ?")
+        params.append(status)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    conn = get_db_connection()
+    rows = conn.execute(f'''
+        SELECT a.meeting_id, a.position, a.action, a.owner, a.status, m.filename, m.created_at
+        FROM meeting_action_items a JOIN meetings m ON m.id = a.meeting_id
+        {where}
+        ORDER BY a.meeting_id DESC, a.position
+        LIMIT ?
+    ''', (*params, limit)).fetchall()
+    conn.close()
+    return [dict(r) for r in rows]
+
+class ActionItemUpdate(BaseModel):
+    status: str
+
+@app.patch("/api/meetings/{meeting_id}/action-items/{position}")
+def update_action_item(meeting_id: int, position: int, update: ActionItemUpdate):
+    """更新待辦事項狀態 (寫回 next_steps，子表由 trigger 同步)"""
+    if update.status not in ACTION_ITEM_STATUSES:
+        raise HTTPException(status_code=400, detail=f"status 只支援 {', '.join(ACTION_ITEM_STATUSES)}")
+    conn = get_db_connection()
+    try:
+        row = conn.execute("SELECT next_steps FROM meetings WHERE id = ?", (meeting_id,)).fetchone()
+        next_steps = parse_meeting_row(row)["next_steps"] if row else None
+        if not isinstance(next_steps, list) or not 0 <= position < len(next_steps):
+            raise HTTPException(status_code=404, detail="Action item not found")
+        step = next_steps[position]
+        if not isinstance(step, dict):
+            step = {"action": step}
+        step["status"] = update.status
+        next_steps[position] = step
+        conn.execute(
+            "UPDATE meetings SET next_steps = ? WHERE id = ?",
+            (json.dumps(next_steps, ensure_ascii=False), meeting_id),
+        )
+        conn.commit()
+        detail_cache.invalidate(meeting_id)
+        return dict(conn.execute(
+            "SELECT * FROM meeting_action_items WHERE meeting_id = ? AND position = ?", (meeting_id, position)
+        ).fetchone())
+    finally:
+        conn.close()
+
+@app.get("/api/participants/{name}/meetings")
+def get_participant_meetings(name: str, limit: int = Query(CHILD_QUERY_LIMIT, ge=1, le=CHILD_QUERY_MAX_LIMIT)):
+    """某位與會者參加過的會議，由新到舊"""
+    conn = get_db_connection()
+    rows = conn.execute('''
+        SELECT m.id, m.filename, m.created_at, m.summary, p.role
+        FROM meeting_participants p JOIN meetings m ON m.id = p.meeting_id
+        WHERE p.name = ?
+        ORDER BY p.meeting_id DESC
+        LIMIT ?
+    ''', (name.strip(), limit)).fetchall()
+    conn.close()
+    return [dict(r) for r in rows]
+
+def document_url(meeting_id):
+    return f"/api/meetings/{meeting_id}/document"
+
+@app.get("/api/meetings/{meeting_id}/document")
+def get_meeting_document(meeting_id: int, request: Request):
+    """
+    依需求生成 Word (以會議內容雜湊快取於磁碟)
+    支援 ETag / If-None-Match (304) 與 Range 請求
+    """
+    data = load_meeting(meeting_id, DETAIL_DEFAULT_FIELDS)
+    if not data:
+        raise HTTPException(status_code=404, detail="Meeting not found")
+
+    path, digest = document_cache.get(meeting_id, data)
+    etag = f'"{digest}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if_none_match = request.headers.get("if-none-match", "")
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    if etag in candidates or "*" in candidates:
+        return Response(status_code=304, headers=headers)
+
+    doc_filename = f"Meeting_{os.path.splitext(data['filename'])[0]}.docx"
+    return FileResponse(
+        path,
+        filename=doc_filename,
+        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        headers=headers,
+    )
+
+def _parse_date(value, name):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} 日期格式錯誤，請使用 YYYY-MM-DD")
+
+@app.get("/api/export")
+def export_meetings(
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    format: str = "docx",
+):
+    """
+    批次匯出會議 (ZIP，邊生成邊串流)
+    from / to: 建立日期區間 (含)，format: docx 或 json
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format 只支援 {', '.join(EXPORT_FORMATS)}")
+    start = _parse_date(date_from, "from")
+    end = _parse_date(date_to, "to")
+
+    conditions = ["id > ?"]
+    params = []
+    if start:
+        conditions.append("created_at >= ?")
+        params.append(start.isoformat())
+    if end:
+        conditions.append("created_at < date(?, '+1 day')")
+        params.append(end.isoformat())
+    # Word 不含逐字稿，只有 json 格式需要解壓縮
+    columns = MEETING_FIELDS if format == "json" else DETAIL_DEFAULT_FIELDS
+    query = f"SELECT {select_columns(columns)} FROM meetings WHERE {' AND '.join(conditions)} ORDER BY id LIMIT ?"
+
+    def load_batch(after_id, limit):
+        conn = get_db_connection()
+        rows = conn.execute(query, (after_id, *params, limit)).fetchall()
+        conn.close()
+        return [parse_meeting_row(row) for row in rows]
+
+    export_name = f"meetings_{start or 'all'}_{end or 'now'}_{format}.zip"
+    return StreamingResponse(
+        stream_export(iter_meetings(load_batch), format, generate_meeting_minutes),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{export_name}"'},
+    )
+
+def save_meeting_result(filename, transcription, structured_data, report=None, emit=None):
+    """
+    存入資料庫 (Word 改為下載時才生成，不在上傳流程中)
+    回傳: {"meeting_id": ..., "doc_url": ...}
+    """
+    emit = emit or (lambda event, data=None: None)
+
+    if report:
+        report("saving")
+    meeting_id = insert_meeting(filename, transcription, structured_data)
+    emit("db_committed", {"meeting_id": meeting_id})
+    emit("document_ready", {"doc_url": document_url(meeting_id)})
+
+    return {
+        "meeting_id": meeting_id,
+        "doc_url": document_url(meeting_id),
+    }
+
+@stage("db_insert")
+def insert_meeting(filename, transcription, structured_data):
+    """
+    寫入會議與壓縮後的逐字稿 (同一個交易)，回傳 meeting_id
+    meetings.transcription 保持 NULL，逐字稿只以壓縮後的形式寫入一次
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    def to_json(obj):
+        return json.dumps(obj, ensure_ascii=False)
+
+    cursor.execute('''
+        INSERT INTO meetings (
+            filename, participants, key_points,
+            next_steps, summary, meeting_topics
+        ) VALUES (?, ?, ?, ?, ?, ?)
+    ''', (
+        filename,
+        to_json(structured_data.get('participants', [])),
+        to_json(structured_data.get('key_points', [])),
+        to_json(structured_data.get('next_steps', [])),
+        structured_data.get('summary', ''),
+        to_json(structured_data.get('meeting_topics', []))
+    ))
+
+    meeting_id = cursor.lastrowid
+    # 逐字稿壓縮後另存 (同一個交易；全文索引由 meeting_transcripts 的 trigger 補上逐字稿)
+    store_transcript(conn, meeting_id, transcription)
+    conn.commit()
+    conn.close()
+    return meeting_id
+
+def process_upload_job(job, report, emit, cancel_event=None):
+    """
+    背景工作：分析音訊 → 存入資料庫
+    由 JobQueue 的 worker thread 執行，不會阻塞 event loop；
+    cancel_event 在服務關閉時被設定 (中止等待 Gemini 處理檔案)，分析片段失敗時也會被設定
+    """
+    filename = job["filename"]
+    file_path = job["file_path"]
+    audio_hash = job.get("audio_hash")
+
+    try:
+        # 在 try 內檢查，缺少 API Key 而失敗時也會清除上傳目錄
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("Gemini API Key not configured")
+
+        # 1. 直接使用 Gemini 分析 (轉錄 + 結構化)；排隊期間可能已有相同錄音完成分析
+        # (上傳時已記錄過一次未命中，此處重新確認不再計入統計)
+        report("analyzing")
+        with stage("analysis_cache_lookup"):
+            cached = analysis_cache.get(audio_hash, record=False)
+        # 靜音裁切結果 (移除秒數、預估加速) 隨工作結果保存，供每場會議查詢
+        audio_trim = {}
+
+        def on_event(event, data=None):
+            if event == "silence_trimmed":
+                audio_trim.update(data)
+            emit(event, data)
+
+        if cached:
+            transcription, structured_data = cached
+        else:
+            def analyze():
+                result = analyze_audio_directly(file_path, api_key=api_key, on_event=on_event, cancel_event=cancel_event)
+                analysis_cache.put(audio_hash, *result)
+                return result
+
+            # 相同錄音同時上傳時 (重複點擊、多人上傳同一檔案) 只分析一次，各自建立會議記錄
+            transcription, structured_data = single_flight.run(
+                audio_hash,
+                analyze,
+                lookup=lambda: analysis_cache.get(audio_hash, record=False),
+                on_wait=lambda: emit("analysis_shared", {"audio_hash": audio_hash}),
+            )
+
+        # 2. 存入資料庫
+        result = save_meeting_result(filename, transcription, structured_data, report=report, emit=emit)
+        if audio_trim:
+            result["audio_trim"] = audio_trim
+        return result
+    finally:
+        # 不論成功或失敗都清除此工作的上傳目錄，避免磁碟持續累積；
+        # 服務關閉而中斷的工作保留上傳檔，下次啟動時重新處理
+        if not job_queue.stopping:
+            remove_workspace(file_path)
+
+analysis_cache = AnalysisCache(
+    DB_PATH,
+    max_entries=ANALYSIS_CACHE_MAX_ENTRIES,
+    max_bytes=ANALYSIS_CACHE_MAX_MB * 1024 * 1024,
+    max_age_seconds=ANALYSIS_CACHE_MAX_AGE_DAYS * 86400,
+)
+job_queue = JobQueue(DB_PATH, process_upload_job, max_workers=JOB_WORKERS)
+single_flight = SingleFlight(DB_PATH)
+document_cache = DocumentCache(DOWNLOAD_DIR, generate_meeting_minutes)
+detail_cache = DetailCache(DETAIL_CACHE_MAX_ENTRIES, DETAIL_CACHE_MAX_MB * 1024 * 1024)
+
+@app.post("/api/upload", status_code=202)
 async def upload_audio(file: UploadFile = File(...)):
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
         raise HTTPException(status_code=500, detail="Gemini API Key not configured")
 
-    # 1. 儲存上傳檔案
-    file_path = os.path.join(UPLOAD_DIR, file.filename)
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
+    # 1. 分段寫入此工作專屬的目錄，同時計算雜湊、大小與長度
     try:
-        # 2. 直接使用 Gemini 分析 (轉錄 + 結構化)
-        transcription, structured_data = analyze_audio_directly(file_path, api_key=api_key)
-        
-        # 3. 生成 Word
-        doc_io = generate_meeting_minutes({
-            "filename": file.filename,
-            "transcription": transcription,
-            **structured_data
-        })
-        
-        # 存檔 Word
-        doc_filename = f"Meeting_{os.path.splitext(file.filename)[0]}.docx"
-        doc_path = os.path.join(DOWNLOAD_DIR, doc_filename)
-        with open(doc_path, "wb") as f:
-            f.write(doc_io.getvalue())
-
-        # 5. 存入資料庫
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        def to_json(obj):
-            return json.dumps(obj, ensure_ascii=False)
-
-        cursor.execute('''
-            INSERT INTO meetings (
-                filename, transcription, participants, key_points, 
-                next_steps, summary, meeting_topics
-            ) VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            file.filename,
-            transcription,
-            to_json(structured_data.get('participants', [])),
-            to_json(structured_data.get('key_points', [])),
-            to_json(structured_data.get('next_steps', [])),
-            structured_data.get('summary', ''),
-            to_json(structured_data.get('meeting_topics', []))
-        ))
-        
-        meeting_id = cursor.lastrowid
-        conn.commit()
+        with stage("ingest"):
+            ingested = await ingest_upload(file, UPLOAD_DIR, MAX_UPLOAD_MB * 1024 * 1024, UPLOAD_CHUNK_SIZE)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    add_bytes("ingest", ingested.size_bytes)
+    filename = os.path.basename(ingested.file_path)
+
+    # 2. 相同錄音已分析過：直接沿用快取結果建立新的會議記錄
+    with stage("analysis_cache_lookup"):
+        cached = await run_in_threadpool(analysis_cache.get, ingested.sha256)
+    if cached:
+        await run_in_threadpool(remove_workspace, ingested.workspace)
+        transcription, structured_data = cached
+        result = await run_in_threadpool(save_meeting_result, filename, transcription, structured_data)
+        job_id = await run_in_threadpool(job_queue.add_completed, filename, ingested.sha256, result)
+        return await run_in_threadpool(job_queue.get, job_id)
+
+    # 3. 排入背景工作佇列，立即回應
+    job_id = await run_in_threadpool(
+        job_queue.submit,
+        filename,
+        ingested.file_path,
+        ingested.sha256,
+        ingested.size_bytes,
+        ingested.duration_seconds,
+    )
+    return await run_in_threadpool(job_queue.get, job_id)
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_job_events(job_id: int):
+    """
+    以 Server-Sent Events 推送工作進度：
+    stage / remote_upload_done / model_streaming / partial / document_ready / db_committed / done / failed
+    事件來自本程序的 JobEventBus；沒有事件時定期查 jobs 表，其他程序執行的工作也能收到階段與結果
+    """
+    job = await run_in_threadpool(job_queue.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    def row_message(job, message_id):
+        """由 jobs 表的資料列產生事件：已結束時為 done / failed，否則為 stage"""
+        if job["status"] == "done":
+            return {"id": message_id, "event": "done", "data": job["result"] or {}}
+        if job["status"] == "failed":
+            return {"id": message_id, "event": "failed", "data": {"error": job["error"]}}
+        return {"id": message_id, "event": "stage", "data": {"stage": job["stage"], "progress": job["progress"]}}
+
+    async def event_stream():
+        # 已結束且沒有事件歷史的工作 (例如快取命中或重啟前完成)：直接送出最終狀態
+        if job["status"] in TERMINAL_EVENTS and not job_queue.events.has_history(job_id):
+            yield format_sse(row_message(job, 1))
+            return
+
+        past, queue = job_queue.events.subscribe(job_id)
+        last_id, last_stage = 0, None
+        try:
+            for message in past:
+                yield format_sse(message)
+                last_id = message["id"]
+                if message["event"] == "stage":
+                    last_stage = message["data"].get("stage")
+                if message["event"] in TERMINAL_EVENTS:
+                    return
+            loop = asyncio.get_running_loop()
+            idle_since = loop.time()
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=SSE_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    # 一段時間沒有事件：改查資料庫中的工作狀態，有變化才送出
+                    current = await run_in_threadpool(job_queue.get, job_id)
+                    if current is None:
+                        return
+                    message = row_message(current, last_id + 1)
+                    if message["event"] == "stage" and current["stage"] == last_stage:
+                        if loop.time() - idle_since >= SSE_HEARTBEAT_SECONDS:
+                            idle_since = loop.time()
+                            yield ": keep-alive\n\n"
+                        continue
+                yield format_sse(message)
+                idle_since = loop.time()
+                last_id = max(last_id, message["id"])
+                if message["event"] == "stage":
+                    last_stage = message["data"].get("stage")
+                if message["event"] in TERMINAL_EVENTS:
+                    return
+        finally:
+            job_queue.events.unsubscribe(job_id, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/api/cache/stats")
+def get_cache_stats():
+    return analysis_cache.stats()
+
+@app.get("/api/cache/detail/stats")
+def get_detail_cache_stats():
+    return detail_cache.stats()
+
+@app.get("/api/storage/transcripts")
+def get_transcript_storage():
+    """逐字稿壓縮報告：節省的空間與單筆解壓縮時間"""
+    conn = get_db_connection()
+    try:
+        return storage_report(conn)
+    finally:
         conn.close()
-        
-        # 清理原始檔
-        os.remove(file_path)
-        
-        return {
-            "id": meeting_id,
-            "filename": file.filename,
-            "doc_url": f"/api/download/{doc_filename}",
-            **structured_data
-        }
-
-    except Exception as e:
-        # os.remove(file_path)
-        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/single-flight/stats")
+def get_single_flight_stats():
+    return single_flight.stats()
+
+@app.get("/api/gemini/stats")
+def get_gemini_stats():
+    return gemini.stats()
+
+CACHE_LOOKUPS = metrics.registry.counter("cache_lookups_total", "快取查詢次數", ("cache", "result"))
+SINGLE_FLIGHT_CALLS = metrics.registry.counter("single_flight_calls_total", "去重後實際計算 / 共用結果的次數", ("role",))
+
+def collect_metrics():
+    """輸出前同步各模組自行統計的數值 (不查詢資料庫)"""
+    for name, cache in (("analysis", analysis_cache), ("detail", detail_cache)):
+        CACHE_LOOKUPS.set((name, "hit"), cache.hits)
+        CACHE_LOOKUPS.set((name, "miss"), cache.misses)
+    flights = single_flight.stats()
+    for role in ("leaders", "shared", "shared_remote", "takeovers"):
+        SINGLE_FLIGHT_CALLS.set(role, flights[role])
+
+metrics.registry.register_collector(collect_metrics)
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus 文字格式的指標 (各階段耗時、進行中數量、資料量、錯誤數)"""
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/jobs")
+def list_jobs(status: Optional[str] = None, limit: int = Query(50, ge=1, le=500)):
+    return job_queue.list(status=status, limit=limit)
+
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: int):
+    job = job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 @app.get("/api/download/{filename}")
 def download_file(filename: str):
-    file_path = os.path.join(DOWNLOAD_DIR, filename)
+    file_path = os.path.join(DOWNLOAD_DIR, os.path.basename(filename))
     if os.path.exists(file_path):
         return FileResponse(file_path, filename=filename)
+
+    # 舊版下載網址 (Meeting_{檔名}.docx)：找出對應的會議，改由即時生成的端點提供
+    stem = os.path.splitext(filename)[0].removeprefix("Meeting_")
+    pattern = stem.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + ".%"
+    conn = get_db_connection()
+    row = conn.execute(
+        "SELECT id FROM meetings WHERE filename = ? OR filename LIKE ? ESCAPE '\\' ORDER BY id DESC LIMIT 1",
+        (stem, pattern),
+    ).fetchone()
+    conn.close()
+    if row:
+        return RedirectResponse(document_url(row["id"]))
     raise HTTPException(status_code=404, detail="File not found")
 
 if __name__ == "__main__":
@@ -0,0 +1,153 @@
+import json
+import threading
+import time
+
+from services.db_pool import connect as db_connect
+
+
+class AnalysisCache:
+    """
+    以音訊內容雜湊 (sha256) 為 key 的分析結果快取
+    相同錄音重複上傳時 (例如瀏覽器逾時後重傳)，直接取用先前的逐字稿與結構化資料，
+    不必再上傳 Gemini 與呼叫 generate_content。
+    淘汰策略：
+      - 超過 max_age_seconds 的項目直接刪除
+      - 筆數或總大小超過上限時，依最後使用時間 (LRU) 淘汰
+    """
+
+    def __init__(self, db_path, max_entries=500, max_bytes=200 * 1024 * 1024, max_age_seconds=30 * 86400):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _connect(self):
+        return db_connect(self.db_path)
+
+    def init_table(self):
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS analysis_cache (
+                audio_hash TEXT PRIMARY KEY,
+                transcription TEXT,
+                structured_data TEXT,
+                size_bytes INTEGER NOT NULL,
+                hit_count INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL
+            )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_cache_last_used ON analysis_cache (last_used_at)")
+        conn.commit()
+        conn.close()
+
+    def get(self, audio_hash, record=True):
+        """
+        命中時回傳 (transcription, structured_data)，否則回傳 None
+        record=False 時不計入命中統計 (例如等待其他程序完成時的輪詢)
+        """
+        if not audio_hash:
+            return None
+
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT transcription, structured_data, created_at FROM analysis_cache WHERE audio_hash = ?",
+            (audio_hash,),
+        ).fetchone()
+
+        if row and now - row[2] <= self.max_age_seconds and not record:
+            conn.close()
+            return row[0], json.loads(row[1])
+
+        if row and now - row[2] <= self.max_age_seconds:
+            conn.execute(
+                "UPDATE analysis_cache SET hit_count = hit_count + 1, last_used_at = ? WHERE audio_hash = ?",
+                (now, audio_hash),
+            )
+            conn.commit()
+            conn.close()
+            with self._lock:
+                self.hits += 1
+            return row[0], json.loads(row[1])
+
+        conn.close()
+        if record:
+            with self._lock:
+                self.misses += 1
+        return None
+
+    def put(self, audio_hash, transcription, structured_data):
+        if not audio_hash:
+            return
+
+        payload = json.dumps(structured_data, ensure_ascii=False)
+        size_bytes = len((transcription or "").encode("utf-8")) + len(payload.encode("utf-8"))
+        now = time.time()
+
+        conn = self._connect()
+        conn.execute('''
+            INSERT OR REPLACE INTO analysis_cache (
+                audio_hash, transcription, structured_data, size_bytes, hit_count, created_at, last_used_at
+            ) VALUES (?, ?, ?, ?, 0, ?, ?)
+        ''', (audio_hash, transcription, payload, size_bytes, now, now))
+        conn.commit()
+        conn.close()
+
+        self.evict()
+
+    def evict(self):
+        """刪除過期項目，並依 LRU 將筆數與總大小壓回上限內"""
+        conn = self._connect()
+        removed = conn.execute(
+            "DELETE FROM analysis_cache WHERE created_at < ?", (time.time() - self.max_age_seconds,)
+        ).rowcount
+
+        count, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM analysis_cache"
+        ).fetchone()
+
+        if count > self.max_entries or total > self.max_bytes:
+            rows = conn.execute(
+                "SELECT audio_hash, size_bytes FROM analysis_cache ORDER BY last_used_at ASC"
+            ).fetchall()
+            victims = []
+            for audio_hash, size_bytes in rows:
+                if count <= self.max_entries and total <= self.max_bytes:
+                    break
+                victims.append((audio_hash,))
+                count -= 1
+                total -= size_bytes
+            conn.executemany("DELETE FROM analysis_cache WHERE audio_hash = ?", victims)
+            removed += len(victims)
+
+        conn.commit()
+        conn.close()
+
+        if removed:
+            with self._lock:
+                self.evictions += removed
+
+    def stats(self):
+        conn = self._connect()
+        count, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM analysis_cache"
+        ).fetchone()
+        conn.close()
+
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": count,
+                "size_bytes": total,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            }
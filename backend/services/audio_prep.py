@@ -0,0 +1,169 @@
+import importlib.util
+import math
+import os
+import shutil
+import subprocess
+import time
+import wave
+
+from services.metrics import registry, stage, add_bytes
+from services.vad import decode_pcm
+from services.lazy import lazy_import
+
+# 未安裝 numpy 時只能以 ffmpeg 壓縮；實際降取樣時才載入，不拖慢啟動
+np = lazy_import("numpy") if importlib.util.find_spec("numpy") else None
+
+# 上傳前壓縮音訊：off 不處理 / auto 超過 AUDIO_PREPROCESS_MIN_MB 才處理 / always 一律處理
+AUDIO_PREPROCESS = os.getenv("AUDIO_PREPROCESS", "auto")
+AUDIO_PREPROCESS_MIN_MB = float(os.getenv("AUDIO_PREPROCESS_MIN_MB", "2"))
+
+# 語音分析只需要單聲道 16 kHz；codec 與位元率決定大小與音質
+AUDIO_SAMPLE_RATE = int(os.getenv("AUDIO_SAMPLE_RATE", "16000"))
+AUDIO_CODEC = os.getenv("AUDIO_CODEC", "opus")
+AUDIO_BITRATE = os.getenv("AUDIO_BITRATE", "24k")
+
+# 壓縮後至少要比原檔小這個比例才使用 (例如原檔已是低位元率 mp3 時直接上傳原檔，避免重複有損壓縮)
+AUDIO_MIN_SAVING = float(os.getenv("AUDIO_MIN_SAVING", "0.2"))
+
+# ffmpeg 參數與輸出副檔名 (副檔名決定上傳時的 MIME 類型)
+CODECS = {
+    "opus": (["-c:a", "libopus", "-application", "voip"], ".ogg"),
+    "aac": (["-c:a", "aac"], ".m4a"),
+    "mp3": (["-c:a", "libmp3lame"], ".mp3"),
+    "flac": (["-c:a", "flac"], ".flac"),
+}
+
+# 沒有 ffmpeg 時的 WAV 降取樣：每次處理的秒數 (記憶體用量固定)
+RESAMPLE_BLOCK_SECONDS = 10
+
+AUDIO_SAVED_BYTES = registry.counter(
+    "audio_preprocess_saved_bytes_total", "上傳前壓縮音訊省下的位元組數", ("method",)
+)
+
+
+class PreparedAudio:
+    def __init__(self, path, original_bytes, output_bytes, seconds=0.0, method=None):
+        self.path = path
+        self.original_bytes = original_bytes
+        self.output_bytes = output_bytes
+        self.seconds = seconds
+        self.method = method  # None 表示使用原檔
+
+    @property
+    def saved_bytes(self):
+        return self.original_bytes - self.output_bytes
+
+    def as_dict(self):
+        return {
+            "method": self.method,
+            "original_bytes": self.original_bytes,
+            "output_bytes": self.output_bytes,
+            "saved_bytes": self.saved_bytes,
+            "seconds": round(self.seconds, 3),
+        }
+
+
+def _encode_ffmpeg(file_path, out_dir, sample_rate, codec, bitrate):
+    args, ext = CODECS[codec]
+    out_path = os.path.join(out_dir, f"prepared{ext}")
+    command = ["ffmpeg", "-y", "-v", "error", "-i", file_path, "-vn", "-ac", "1", "-ar", str(sample_rate), *args]
+    if codec != "flac":
+        command += ["-b:a", bitrate]
+    subprocess.run(command + [out_path], check=True, capture_output=True)
+    return out_path
+
+
+def _resample_wav(file_path, out_dir, sample_rate):
+    """
+    不依賴 ffmpeg 的備援：WAV 轉為單聲道 16-bit、降取樣至 sample_rate
+    以 boxcar 低通 + 線性內插逐段處理；不是 WAV 或格式不支援時回傳 None
+    """
+    try:
+        reader = wave.open(file_path, "rb")
+    except (wave.Error, EOFError):
+        return None
+    with reader:
+        channels, width, in_rate = reader.getnchannels(), reader.getsampwidth(), reader.getframerate()
+        if width not in (1, 2, 3, 4) or in_rate < sample_rate or (channels == 1 and width == 2 and in_rate == sample_rate):
+            return None
+
+        out_path = os.path.join(out_dir, "prepared.wav")
+        ratio = in_rate / sample_rate
+        taps = max(1, int(round(ratio)))
+        kernel = np.ones(taps, dtype=np.float32) / taps
+        block = int(in_rate * RESAMPLE_BLOCK_SECONDS)
+        keep = taps + 2              # 保留上一段結尾的樣本，讓濾波與內插跨段連續
+        carry = np.zeros(0, dtype=np.float32)
+        base = 0                     # carry[0] 對應的輸入樣本位置
+        position = 0.0               # 下一個輸出樣本對應的輸入位置
+
+        with wave.open(out_path, "wb") as writer:
+            writer.setnchannels(1)
+            writer.setsampwidth(2)
+            writer.setframerate(sample_rate)
+            while True:
+                frames = reader.readframes(block)
+                final = len(frames) < block * channels * width
+                x = np.concatenate([carry, decode_pcm(frames, channels, width)]) if frames else carry
+                if len(x) == 0:
+                    break
+                smoothed = np.convolve(x, kernel, mode="same") if taps > 1 else x
+                # 非最後一段時保留結尾 (濾波視窗尚未完整) 給下一段
+                limit = base + len(x) - (1 if final else keep)
+                positions = np.arange(position, limit, ratio)
+                if len(positions):
+                    y = np.interp(positions - base, np.arange(len(x)), smoothed)
+                    writer.writeframes((np.clip(y, -1, 1) * 32767).astype("<i2").tobytes())
+                    position = positions[-1] + ratio
+                if final:
+                    break
+                drop = max(0, min(len(x) - keep, int(math.floor(position - base)) - keep))
+                carry = x[drop:]
+                base += drop
+        return out_path
+
+
+def prepare_audio(file_path, out_dir, policy=AUDIO_PREPROCESS, min_mb=AUDIO_PREPROCESS_MIN_MB,
+                  sample_rate=AUDIO_SAMPLE_RATE, codec=AUDIO_CODEC, bitrate=AUDIO_BITRATE,
+                  min_saving=AUDIO_MIN_SAVING):
+    """
+    上傳前將錄音轉為單聲道、降取樣並以語音 codec 壓縮 (輸出寫在 out_dir)
+    有 ffmpeg 時輸出 codec 指定的格式；沒有 ffmpeg 時 WAV 以 numpy 轉為 16 kHz 單聲道 WAV
+    壓縮失敗、省不到 min_saving 或不需處理時回傳原檔
+    """
+    original_bytes = os.path.getsize(file_path)
+    unchanged = PreparedAudio(file_path, original_bytes, original_bytes)
+    if policy == "off" or (policy == "auto" and original_bytes < min_mb * 1024 * 1024):
+        return unchanged
+    if codec not in CODECS:
+        raise ValueError(f"不支援的 AUDIO_CODEC: {codec} (可用: {', '.join(CODECS)})")
+
+    started = time.perf_counter()
+    out_path = None
+    method = None
+    with stage("audio_preprocess"):
+        try:
+            if shutil.which("ffmpeg"):
+                out_path, method = _encode_ffmpeg(file_path, out_dir, sample_rate, codec, bitrate), f"ffmpeg-{codec}"
+            elif np is not None:
+                out_path, method = _resample_wav(file_path, out_dir, sample_rate), "wav-resample"
+        except (subprocess.CalledProcessError, OSError, wave.Error, ValueError) as e:
+            print(f"⚠️ 音訊壓縮失敗，改為上傳原檔: {e}")
+            out_path = None
+    seconds = time.perf_counter() - started
+
+    if not out_path:
+        return unchanged
+    output_bytes = os.path.getsize(out_path)
+    if output_bytes > original_bytes * (1 - min_saving):
+        os.remove(out_path)
+        return unchanged
+
+    add_bytes("audio_preprocess_in", original_bytes)
+    add_bytes("audio_preprocess_out", output_bytes)
+    AUDIO_SAVED_BYTES.inc(method, original_bytes - output_bytes)
+    print(
+        f"🗜️ 音訊壓縮 ({method}): {original_bytes / 1048576:.1f} MB → {output_bytes / 1048576:.1f} MB "
+        f"({output_bytes / original_bytes:.0%}, {seconds:.1f}s)"
+    )
+    return PreparedAudio(out_path, original_bytes, output_bytes, seconds, method)
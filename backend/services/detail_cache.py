@@ -0,0 +1,103 @@
+import json
+import threading
+from collections import OrderedDict
+
+try:
+    import orjson
+except ImportError: # 未安裝時使用標準庫的 json
+    orjson = None
+
+
+def dumps(data):
+    """序列化成 JSON bytes (有 orjson 時使用 orjson)"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class DetailCache:
+    """
+    會議詳細資料的回應快取 (記憶體 LRU)
+    存放已序列化好的 JSON bytes，key 為 (meeting_id, 欄位組合)；
+    命中時不需讀取欄位、json.loads 或重新編碼。
+    每筆快取記錄產生時的 meetings.version (內容變更時由 trigger 遞增，存在資料庫中)：
+    呼叫端每次以主鍵查出目前版本傳入 get()，版本不同就視為未命中，
+    因此任何 worker / 程序更新會議後，其他 worker 都不會回傳舊資料。
+    讀取資料前先查版本再 put()，讀取期間被更新時快取的版本較舊，下次查詢自然失效。
+    """
+
+    def __init__(self, max_entries=1000, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # (meeting_id, fields) -> (version, bytes)
+        self._by_meeting = {}           # meeting_id -> {key, ...}
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, meeting_id, fields, version):
+        """version 為資料庫中目前的 meetings.version；與快取時的版本不同則移除並回傳 None"""
+        key = (meeting_id, fields)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] != version:
+                self._remove(key)
+                self.invalidations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, meeting_id, fields, data, version):
+        """序列化並存入快取 (version 為讀取資料前查到的版本)，回傳 JSON bytes"""
+        body = dumps(data)
+        if len(body) > self.max_bytes:
+            return body
+        key = (meeting_id, fields)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old[1])
+            self._entries[key] = (version, body)
+            self._by_meeting.setdefault(meeting_id, set()).add(key)
+            self._size += len(body)
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return body
+
+    def _remove(self, key):
+        _, body = self._entries.pop(key)
+        self._size -= len(body)
+        keys = self._by_meeting.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_meeting[key[0]]
+
+    def invalidate(self, meeting_id):
+        """立即釋放某場會議的所有快取 (不同欄位組合)；正確性由版本比對保證，此處只是提早回收記憶體"""
+        with self._lock:
+            for key in list(self._by_meeting.get(meeting_id, ())):
+                self._remove(key)
+                self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "size_bytes": self._size,
+                "serializer": "orjson" if orjson is not None else "json",
+            }
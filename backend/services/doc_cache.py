@@ -0,0 +1,78 @@
+import glob
+import hashlib
+import json
+import os
+import threading
+
+from services.metrics import stage, add_bytes
+
+# 影響 Word 內容的欄位；任何一個改變都會產生新的快取檔
+DOCUMENT_FIELDS = ("filename", "meeting_topics", "participants", "key_points", "next_steps", "summary")
+
+
+def content_hash(data):
+    """以會議內容計算雜湊，作為快取檔名與 ETag"""
+    payload = json.dumps(
+        {key: data.get(key) for key in DOCUMENT_FIELDS},
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+class DocumentCache:
+    """
+    依需求生成 Word 並快取在磁碟上
+    檔名為 meeting_{id}_{content_hash}.docx：同一場會議內容不變時直接重用，
+    內容改變時產生新檔並刪除舊版本。
+    render_fn(data) -> BytesIO
+    """
+
+    def __init__(self, cache_dir, render_fn):
+        self.cache_dir = cache_dir
+        self.render_fn = render_fn
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, meeting_id, digest):
+        return os.path.join(self.cache_dir, f"meeting_{meeting_id}_{digest}.docx")
+
+    def _lock_for(self, meeting_id):
+        with self._locks_lock:
+            return self._locks.setdefault(meeting_id, threading.Lock())
+
+    def get(self, meeting_id, data):
+        """
+        取得 (檔案路徑, content_hash)，必要時才生成
+        同一場會議同時有多個請求時只會生成一次
+        """
+        digest = content_hash(data)
+        path = self._path(meeting_id, digest)
+        if os.path.exists(path):
+            return path, digest
+
+        with self._lock_for(meeting_id):
+            if os.path.exists(path):
+                return path, digest
+
+            with stage("doc_gen"):
+                doc_io = self.render_fn(data)
+            add_bytes("doc_gen", doc_io.getbuffer().nbytes)
+            # 先寫暫存檔再 rename，避免其他請求讀到寫一半的檔案
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(doc_io.getvalue())
+            os.replace(tmp_path, path)
+
+            self.invalidate(meeting_id, keep=path)
+        return path, digest
+
+    def invalidate(self, meeting_id, keep=None):
+        """刪除此會議的快取檔 (保留 keep)"""
+        for old in glob.glob(self._path(meeting_id, "*")):
+            if old != keep:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
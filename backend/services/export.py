@@ -0,0 +1,113 @@
+import json
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from services.metrics import stage, add_bytes
+
+# 匯出時同時生成 Word 的數量
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "4"))
+
+# 每次從資料庫讀取的會議筆數
+EXPORT_BATCH_SIZE = 100
+
+EXPORT_FORMATS = ("docx", "json")
+
+
+class _ZipStream:
+    """
+    給 zipfile 寫入的不可 seek 輸出：寫入的資料暫存起來，由產生器取走後送出
+    zipfile 偵測到無法 tell/seek 時會改用 data descriptor，不需要回頭改寫檔頭
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        add_bytes("export", len(data))
+        return data
+
+
+def iter_meetings(load_batch, batch_size=EXPORT_BATCH_SIZE):
+    """
+    依 id 分批讀取會議
+    load_batch(after_id, limit) -> [meeting dict, ...]；每批各自開關連線，
+    串流回應可能在不同執行緒中繼續，不能共用同一個 sqlite 連線
+    """
+    after_id = 0
+    while True:
+        batch = load_batch(after_id, batch_size)
+        if not batch:
+            return
+        yield from batch
+        after_id = batch[-1]["id"]
+
+
+def _entry_name(meeting, ext):
+    stem = os.path.splitext(os.path.basename(meeting["filename"]))[0]
+    # 加上 id 前綴，避免同名檔案在壓縮檔內互相覆蓋
+    return f"{meeting['id']:05d}_Meeting_{stem}.{ext}"
+
+
+def _render_docx(render_fn, meeting):
+    with stage("export_render"):
+        return _entry_name(meeting, "docx"), render_fn(meeting).getvalue()
+
+
+def _render_json(meeting):
+    return _entry_name(meeting, "json"), json.dumps(meeting, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def stream_export(meetings, fmt, render_fn, workers=EXPORT_WORKERS):
+    """
+    邊生成邊輸出 ZIP 的產生器
+    Word 交給 thread pool 生成，完成一份就寫入壓縮檔並送出；
+    同時處理中的數量有上限，記憶體用量不隨會議數量增加
+    """
+    out = _ZipStream()
+    zf = zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED)
+
+    if fmt == "json":
+        for meeting in meetings:
+            zf.writestr(*_render_json(meeting))
+            yield out.drain()
+        zf.close()
+        yield out.drain()
+        return
+
+    max_pending = max(1, workers) * 2
+    pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="export")
+    pending = set()
+    try:
+        for meeting in meetings:
+            pending.add(pool.submit(_render_docx, render_fn, meeting))
+            if len(pending) < max_pending:
+                continue
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, data = future.result()
+                # docx 本身已是壓縮過的 zip，不再重複壓縮
+                zf.writestr(name, data, compress_type=zipfile.ZIP_STORED)
+            yield out.drain()
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, data = future.result()
+                zf.writestr(name, data, compress_type=zipfile.ZIP_STORED)
+            yield out.drain()
+
+        zf.close()
+        yield out.drain()
+    finally:
+        # client 中途斷線時不再生成剩下的檔案
+        pool.shutdown(wait=False, cancel_futures=True)
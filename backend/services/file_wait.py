@@ -0,0 +1,97 @@
+import asyncio
+import concurrent.futures
+import os
+import threading
+
+from services.gemini_client import gemini
+
+# 輪詢間隔：從 POLL_INITIAL 開始，每次乘以 POLL_FACTOR，最長 POLL_MAX 秒
+POLL_INITIAL = float(os.getenv("GEMINI_POLL_INITIAL", "0.25"))
+POLL_FACTOR = float(os.getenv("GEMINI_POLL_FACTOR", "2"))
+POLL_MAX = float(os.getenv("GEMINI_POLL_MAX", "5"))
+
+# 等待檔案處理完成的總時限 (秒)
+POLL_DEADLINE = float(os.getenv("GEMINI_POLL_DEADLINE", "600"))
+
+# 同步版本檢查 cancel_event 的間隔 (秒)
+CANCEL_CHECK_SECONDS = 0.2
+
+
+class WaitCancelled(Exception):
+    """等待過程被取消"""
+
+
+def poll_intervals(initial=POLL_INITIAL, factor=POLL_FACTOR, max_interval=POLL_MAX):
+    """產生指數成長、有上限的輪詢間隔"""
+    interval = initial
+    while True:
+        yield interval
+        interval = min(interval * factor, max_interval)
+
+
+def _check_state(file):
+    """回傳 True 表示已可使用；處理失敗時拋出錯誤"""
+    state = file.state.name if file.state else "ACTIVE"
+    if state == "FAILED":
+        raise ValueError("Gemini 檔案處理失敗")
+    return state != "PROCESSING"
+
+
+async def wait_for_file_active(api_key, file, initial=POLL_INITIAL, factor=POLL_FACTOR,
+                               max_interval=POLL_MAX, deadline=POLL_DEADLINE):
+    """
+    非同步等待上傳的檔案離開 PROCESSING 狀態
+    不佔用執行緒，多個上傳可在同一個 event loop 上同時等待；
+    取消方式為 task.cancel()，超過 deadline 拋出 TimeoutError
+    回傳: 最新的 File 物件
+    """
+    if _check_state(file):
+        return file
+
+    loop = asyncio.get_running_loop()
+    give_up_at = loop.time() + deadline
+    name = file.name
+
+    for interval in poll_intervals(initial, factor, max_interval):
+        remaining = give_up_at - loop.time()
+        if remaining <= 0:
+            raise TimeoutError(f"等待 Gemini 處理檔案逾時 ({deadline:g}s): {name}")
+        await asyncio.sleep(min(interval, remaining))
+        file = await gemini.acall(api_key, lambda client: client.aio.files.get(name=name), label="files.get")
+        if _check_state(file):
+            return file
+
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def wait_loop():
+    """所有檔案等待共用的 event loop (背景 daemon thread，第一次使用時建立)"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="gemini-file-wait", daemon=True).start()
+            _loop = loop
+        return _loop
+
+
+def wait_for_file_active_sync(api_key, file, initial=POLL_INITIAL, factor=POLL_FACTOR,
+                              max_interval=POLL_MAX, deadline=POLL_DEADLINE, cancel_event=None):
+    """
+    供 worker thread 使用：把 wait_for_file_active 交給共用的 event loop 執行並等待結果
+    輪詢請求與間隔都在 event loop 上進行；cancel_event 被設定時取消輪詢並拋出 WaitCancelled
+    """
+    if _check_state(file):
+        return file
+
+    future = asyncio.run_coroutine_threadsafe(
+        wait_for_file_active(api_key, file, initial, factor, max_interval, deadline), wait_loop()
+    )
+    # 逾時 (deadline) 本身也是 TimeoutError，因此以 wait() 判斷是否完成，而不是 result(timeout=...)
+    while not concurrent.futures.wait([future], timeout=CANCEL_CHECK_SECONDS).done:
+        if cancel_event is not None and cancel_event.is_set():
+            future.cancel()
+            raise WaitCancelled(f"已取消等待檔案處理: {file.name}")
+    return future.result()
@@ -0,0 +1,230 @@
+import asyncio
+import os
+import random
+import threading
+import time
+
+from services.metrics import registry
+from services.lazy import lazy_import
+
+# google.genai 載入約需 0.5 秒，第一次建立 client 時才 import
+genai = lazy_import("google.genai")
+types = lazy_import("google.genai.types")
+
+# 可重試的 HTTP 狀態碼：配額不足與暫時性的伺服器錯誤
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+
+# 同時進行中的請求上限、每秒請求數與瞬間突發量
+GEMINI_MAX_IN_FLIGHT = int(os.getenv("GEMINI_MAX_IN_FLIGHT", "4"))
+GEMINI_RATE_PER_SEC = float(os.getenv("GEMINI_RATE_PER_SEC", "2"))
+GEMINI_BURST = int(os.getenv("GEMINI_BURST", "4"))
+
+# 重試設定 (指數退避 + jitter)
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+GEMINI_BACKOFF_BASE = float(os.getenv("GEMINI_BACKOFF_BASE", "1.0"))
+GEMINI_BACKOFF_MAX = float(os.getenv("GEMINI_BACKOFF_MAX", "30.0"))
+
+# 指向本地 stub server 時使用 (例如 http://127.0.0.1:8765)
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
+
+
+GEMINI_REQUEST_SECONDS = registry.histogram(
+    "gemini_request_seconds", "Gemini 請求耗時 (秒，不含排隊)", ("label", "outcome")
+)
+GEMINI_QUEUE_SECONDS = registry.histogram(
+    "gemini_queue_wait_seconds", "Gemini 請求在限流 / 併發上限前的排隊時間 (秒)", ("label",)
+)
+GEMINI_RETRIES = registry.counter("gemini_retries_total", "Gemini 請求重試次數", ("label",))
+GEMINI_IN_FLIGHT = registry.gauge("gemini_in_flight", "進行中的 Gemini 請求數")
+
+
+class TokenBucket:
+    """簡單的 token bucket 限流器：每秒補充 rate 個 token，最多累積 capacity 個"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """取得一個 token (必要時等待)，回傳等待秒數"""
+        if self.rate <= 0:
+            return 0.0
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return now - started
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def reserve(self):
+        """預約一個 token 並回傳需要等待的秒數 (不阻塞，供 async 呼叫端使用)"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+
+def is_retryable(error):
+    """429 / 5xx 與連線層錯誤可重試，其餘 (例如 400 參數錯誤) 直接拋出"""
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if isinstance(code, int):
+        return code in RETRYABLE_CODES
+    return isinstance(error, (ConnectionError, TimeoutError)) or type(error).__name__ in (
+        "ConnectError", "ReadTimeout", "ConnectTimeout", "RemoteProtocolError",
+    )
+
+
+class GeminiClientManager:
+    """
+    Process 共用的 Gemini client 管理器
+    - 同一把 API Key 只建立一個 genai.Client，重複使用其連線
+    - token bucket 限制請求速率，semaphore 限制同時進行中的請求數
+    - 429 / 5xx 以指數退避 + jitter 重試
+    - 分別統計排隊等待時間與模型實際耗時
+    """
+
+    def __init__(self, max_in_flight=GEMINI_MAX_IN_FLIGHT, rate_per_sec=GEMINI_RATE_PER_SEC,
+                 burst=GEMINI_BURST, max_retries=GEMINI_MAX_RETRIES, backoff_base=GEMINI_BACKOFF_BASE,
+                 backoff_max=GEMINI_BACKOFF_MAX, base_url=GEMINI_BASE_URL):
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.base_url = base_url
+        self._bucket = TokenBucket(rate_per_sec, burst)
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "calls": 0,
+            "retries": 0,
+            "failures": 0,
+            "in_flight": 0,
+            "queue_wait_seconds": 0.0,
+            "model_seconds": 0.0,
+        }
+
+    def get_client(self, api_key):
+        with self._lock:
+            client = self._clients.get(api_key)
+            if client is None:
+                http_options = types.HttpOptions(base_url=self.base_url) if self.base_url else None
+                client = genai.Client(api_key=api_key, http_options=http_options)
+                self._clients[api_key] = client
+            return client
+
+    def backoff(self, attempt):
+        """第 attempt 次重試的等待秒數 (full jitter)"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def call(self, api_key, fn, label="request"):
+        """
+        以共用 client 執行 fn(client)，套用限流、併發上限與重試
+        回傳 fn 的回傳值
+        """
+        client = self.get_client(api_key)
+        attempt = 0
+        while True:
+            queued_at = time.monotonic()
+            self._bucket.acquire()
+            self._slots.acquire()
+            queue_wait = time.monotonic() - queued_at
+            self._record(in_flight=1, queue_wait_seconds=queue_wait)
+            GEMINI_QUEUE_SECONDS.observe(queue_wait, label)
+
+            started = time.monotonic()
+            try:
+                result = fn(client)
+                model_time = time.monotonic() - started
+                self._record(calls=1, model_seconds=model_time)
+                GEMINI_REQUEST_SECONDS.observe(model_time, (label, "ok"))
+                print(f"Gemini {label}: 排隊 {queue_wait:.2f}s / 模型 {model_time:.2f}s")
+                return result
+            except Exception as e:
+                elapsed = time.monotonic() - started
+                self._record(model_seconds=elapsed)
+                GEMINI_REQUEST_SECONDS.observe(elapsed, (label, "error"))
+                if attempt >= self.max_retries or not is_retryable(e):
+                    self._record(failures=1)
+                    raise
+                delay = self.backoff(attempt)
+                attempt += 1
+                self._record(retries=1)
+                GEMINI_RETRIES.inc(label)
+                print(f"Gemini {label} 暫時失敗 ({e})，{delay:.1f}s 後第 {attempt} 次重試")
+            finally:
+                self._record(in_flight=-1)
+                self._slots.release()
+            time.sleep(delay)
+
+    async def acall(self, api_key, fn, label="request"):
+        """
+        call() 的非同步版本：await fn(client)，通常搭配 client.aio 使用
+        同樣套用限流與重試，但等待時不佔用執行緒 (不計入 max_in_flight)
+        """
+        client = self.get_client(api_key)
+        attempt = 0
+        while True:
+            queue_wait = self._bucket.reserve()
+            if queue_wait:
+                await asyncio.sleep(queue_wait)
+            self._record(queue_wait_seconds=queue_wait)
+            GEMINI_QUEUE_SECONDS.observe(queue_wait, label)
+
+            started = time.monotonic()
+            try:
+                result = await fn(client)
+                elapsed = time.monotonic() - started
+                self._record(calls=1, model_seconds=elapsed)
+                GEMINI_REQUEST_SECONDS.observe(elapsed, (label, "ok"))
+                return result
+            except Exception as e:
+                elapsed = time.monotonic() - started
+                self._record(model_seconds=elapsed)
+                GEMINI_REQUEST_SECONDS.observe(elapsed, (label, "error"))
+                if attempt >= self.max_retries or not is_retryable(e):
+                    self._record(failures=1)
+                    raise
+                delay = self.backoff(attempt)
+                attempt += 1
+                self._record(retries=1)
+                GEMINI_RETRIES.inc(label)
+                print(f"Gemini {label} 暫時失敗 ({e})，{delay:.1f}s 後第 {attempt} 次重試")
+            await asyncio.sleep(delay)
+
+    def _record(self, **deltas):
+        with self._lock:
+            for key, value in deltas.items():
+                self._stats[key] += value
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        calls = stats["calls"] or 1
+        stats["avg_queue_wait_seconds"] = round(stats["queue_wait_seconds"] / calls, 4)
+        stats["avg_model_seconds"] = round(stats["model_seconds"] / calls, 4)
+        stats["max_in_flight"] = self.max_in_flight
+        return stats
+
+
+# Process 共用的單一實例
+gemini = GeminiClientManager()
+
+
+def _collect_metrics():
+    GEMINI_IN_FLIGHT.set(value=gemini.stats()["in_flight"])
+
+
+registry.register_collector(_collect_metrics)
@@ -0,0 +1,118 @@
+import hashlib
+import os
+import shutil
+import struct
+import time
+import uuid
+
+from fastapi.concurrency import run_in_threadpool
+
+from services.map_reduce import probe_duration
+
+# 工作目錄名稱前綴 (UPLOAD_DIR/job_xxxx/)
+WORKSPACE_PREFIX = "job_"
+
+# 只需要檔頭就能判斷 WAV 長度
+WAV_HEADER_BYTES = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    """上傳檔案超過大小上限"""
+
+
+class IngestResult:
+    def __init__(self, workspace, file_path, sha256, size_bytes, duration_seconds):
+        self.workspace = workspace
+        self.file_path = file_path
+        self.sha256 = sha256
+        self.size_bytes = size_bytes
+        self.duration_seconds = duration_seconds
+
+
+def create_workspace(upload_dir):
+    """為每個上傳建立獨立目錄，同名檔案不會互相覆蓋"""
+    workspace = os.path.join(upload_dir, f"{WORKSPACE_PREFIX}{uuid.uuid4().hex}")
+    os.makedirs(workspace)
+    return workspace
+
+
+def remove_workspace(path):
+    """刪除工作目錄 (可傳入目錄或目錄內的檔案路徑)"""
+    if not path:
+        return
+    workspace = path if os.path.isdir(path) else os.path.dirname(path)
+    if os.path.basename(workspace).startswith(WORKSPACE_PREFIX):
+        shutil.rmtree(workspace, ignore_errors=True)
+
+
+def sweep_workspaces(upload_dir, keep=(), max_age_seconds=0):
+    """
+    清除遺留的工作目錄 (例如程序中斷時)
+    keep: 仍在使用中的檔案或目錄路徑；max_age_seconds: 只刪除超過此時間未修改的目錄
+    """
+    keep_dirs = {p if os.path.isdir(p) else os.path.dirname(p) for p in keep if p}
+    now = time.time()
+    removed = 0
+    for name in os.listdir(upload_dir):
+        path = os.path.join(upload_dir, name)
+        if not name.startswith(WORKSPACE_PREFIX) or not os.path.isdir(path) or path in keep_dirs:
+            continue
+        if now - os.path.getmtime(path) < max_age_seconds:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        removed += 1
+    return removed
+
+
+def wav_duration(header, total_size):
+    """由 WAV 檔頭計算長度 (秒)，不是 WAV 或無法判斷時回傳 None"""
+    if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+        return None
+    pos = 12
+    byte_rate = None
+    while pos + 8 <= len(header):
+        chunk_id, chunk_size = struct.unpack("<4sI", header[pos:pos + 8])
+        if chunk_id == b"fmt " and pos + 16 <= len(header):
+            byte_rate = struct.unpack("<I", header[pos + 16:pos + 20])[0]
+        elif chunk_id == b"data":
+            if not byte_rate:
+                return None
+            data_offset = pos + 8
+            # 串流錄音的 data 大小可能未填 (0 或 0xFFFFFFFF)，改用實際檔案大小
+            data_size = chunk_size if 0 < chunk_size < 0xFFFFFFFF else total_size - data_offset
+            return round(min(data_size, total_size - data_offset) / byte_rate, 3)
+        pos += 8 + chunk_size + (chunk_size & 1)
+    return None
+
+
+async def ingest_upload(upload_file, upload_dir, max_bytes, chunk_size=1024 * 1024):
+    """
+    分段讀取上傳檔並寫入獨立工作目錄，同時計算 sha256、大小與長度
+    超過 max_bytes 時立即停止讀取、清除工作目錄並拋出 UploadTooLarge
+    """
+    workspace = await run_in_threadpool(create_workspace, upload_dir)
+    filename = os.path.basename(upload_file.filename or "upload") or "upload"
+    file_path = os.path.join(workspace, filename)
+
+    hasher = hashlib.sha256()
+    size = 0
+    header = b""
+    try:
+        with open(file_path, "wb") as buffer:
+            while chunk := await upload_file.read(chunk_size):
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise UploadTooLarge(f"檔案超過上限 {max_bytes // (1024 * 1024)} MB")
+                hasher.update(chunk)
+                if len(header) < WAV_HEADER_BYTES:
+                    header += chunk[:WAV_HEADER_BYTES - len(header)]
+                await run_in_threadpool(buffer.write, chunk)
+    except BaseException:
+        await run_in_threadpool(remove_workspace, workspace)
+        raise
+
+    duration = wav_duration(header, size)
+    if duration is None:
+        duration = await run_in_threadpool(probe_duration, file_path)
+
+    return IngestResult(workspace, file_path, hasher.hexdigest(), size, duration)
@@ -0,0 +1,68 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+
+# 結束事件：收到後 SSE 串流即關閉
+TERMINAL_EVENTS = ("done", "failed")
+
+# 最多保留多少筆工作的事件歷史 (讓較晚連上的 client 也能補收先前的事件)
+MAX_TRACKED_JOBS = 1000
+
+
+class JobEventBus:
+    """
+    工作事件的發佈 / 訂閱
+    worker thread 呼叫 publish()，SSE endpoint 在 event loop 上以 subscribe() 取得 asyncio.Queue；
+    跨執行緒的投遞透過 loop.call_soon_threadsafe 完成。
+    """
+
+    def __init__(self, max_jobs=MAX_TRACKED_JOBS):
+        self.max_jobs = max_jobs
+        self._history = OrderedDict()   # job_id -> [event, ...]
+        self._subscribers = {}          # job_id -> [(loop, queue), ...]
+        self._lock = threading.Lock()
+
+    def publish(self, job_id, event, data=None):
+        message = {"event": event, "data": data or {}, "ts": time.time()}
+        with self._lock:
+            history = self._history.setdefault(job_id, [])
+            message["id"] = len(history) + 1
+            history.append(message)
+            self._history.move_to_end(job_id)
+            while len(self._history) > self.max_jobs:
+                self._history.popitem(last=False)
+            subscribers = list(self._subscribers.get(job_id, []))
+
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, message)
+            except RuntimeError:
+                pass # event loop 已關閉
+
+    def subscribe(self, job_id):
+        """在 event loop 中呼叫；回傳 (過去的事件, queue)"""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        with self._lock:
+            past = list(self._history.get(job_id, []))
+            self._subscribers.setdefault(job_id, []).append((loop, queue))
+        return past, queue
+
+    def unsubscribe(self, job_id, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(job_id, [])
+            self._subscribers[job_id] = [(l, q) for l, q in subscribers if q is not queue]
+            if not self._subscribers[job_id]:
+                del self._subscribers[job_id]
+
+    def has_history(self, job_id):
+        with self._lock:
+            return job_id in self._history
+
+
+def format_sse(message):
+    """轉成 text/event-stream 格式"""
+    data = json.dumps(message["data"], ensure_ascii=False)
+    return f"id: {message['id']}\nevent: {message['event']}\ndata: {data}\n\n"
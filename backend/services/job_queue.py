@@ -0,0 +1,334 @@
+import sqlite3
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from services.db_pool import connect as db_connect
+from services.job_events import JobEventBus
+from services.metrics import STAGE_SECONDS, Trace, stage, start_trace, end_trace
+
+# 各階段對應的進度百分比 (供前端顯示進度條)
+STAGE_PROGRESS = {
+    "queued": 0,
+    "stored": 10,
+    "analyzing": 30,
+    "saving": 90,
+    "done": 100,
+}
+
+# 尚未完成的狀態，重新啟動時需要重新排入佇列
+PENDING_STATUSES = ("queued", "running")
+
+
+def _owner_alive(owner, current):
+    """
+    判斷 running 工作的擁有者 (host:pid:token) 是否仍在執行
+    SQLite (WAL) 只能由同一台主機的程序共用，主機名稱不同代表是舊容器留下的工作；
+    pid 與目前程序相同但 token 不同，代表是重新啟動前 (例如容器內 pid 1) 留下的工作
+    """
+    if not owner:
+        return False # 舊版資料沒有記錄擁有者
+    host, _, rest = owner.partition(":")
+    pid, _, _ = rest.partition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    if int(pid) == os.getpid():
+        return owner == current
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass # 程序存在但屬於其他使用者
+    return True
+
+
+class JobQueue:
+    """
+    以 SQLite 為底的持久化工作佇列
+    上傳 API 只負責寫入 jobs 表並立即回應，實際分析交給固定大小的 worker pool 執行，
+    避免阻塞 uvicorn 的 event loop。
+    多個程序 (uvicorn workers) 共用同一個資料庫時，worker 以條件式 UPDATE 認領 queued 的工作，
+    同一筆工作只會被執行一次。
+    handler(job, report, emit, cancel_event) 由呼叫端提供：
+      - job: jobs 表的資料列 (dict)
+      - report(stage): 回報目前階段 (更新進度並發佈 stage 事件)
+      - emit(event, data): 發佈其他事件給 SSE 訂閱者 (例如部分分析結果)
+      - cancel_event: threading.Event，服務關閉時被設定，長時間等待 (例如 Gemini 處理檔案) 應隨之中止
+      - 回傳值: dict，至少包含 meeting_id，其餘欄位存入 result
+    """
+
+    def __init__(self, db_path, handler, max_workers=2):
+        self.db_path = db_path
+        self.handler = handler
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._submitted = {}  # job_id -> 排入佇列的時間 (量測排隊時間)
+        self._cancel_events = {}  # job_id -> threading.Event (執行中的工作)
+        self._stopping = threading.Event()
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.events = JobEventBus()
+
+    def _connect(self):
+        return db_connect(self.db_path, row_factory=sqlite3.Row)
+
+    def init_table(self):
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                filename TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                audio_hash TEXT,
+                size_bytes INTEGER,
+                duration_seconds REAL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                stage TEXT NOT NULL DEFAULT 'queued',
+                progress INTEGER NOT NULL DEFAULT 0,
+                stage_timings TEXT,
+                meeting_id INTEGER,
+                result TEXT,
+                error TEXT,
+                owner TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        # 舊版資料庫沒有這些欄位
+        for column in ("audio_hash TEXT", "size_bytes INTEGER", "duration_seconds REAL", "owner TEXT"):
+            try:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column}")
+            except sqlite3.OperationalError:
+                pass # 欄位已存在
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)")
+        conn.commit()
+        conn.close()
+
+    # --- 生命週期 ---
+    def start(self):
+        """
+        建立 worker pool，並把上次未完成的工作重新排入佇列
+        running 的工作只有在擁有者程序已不存在時才改回 queued (其他 worker 仍在執行的不動)
+        """
+        self.init_table()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="job-worker"
+        )
+
+        conn = self._connect()
+        placeholders = ",".join("?" for _ in PENDING_STATUSES)
+        rows = conn.execute(
+            f"SELECT id, file_path, status, owner FROM jobs WHERE status IN ({placeholders}) ORDER BY id",
+            PENDING_STATUSES,
+        ).fetchall()
+        requeued = 0
+        for row in rows:
+            if row["status"] == "running":
+                if _owner_alive(row["owner"], self.owner):
+                    continue
+                # 擁有者已結束：只在狀態與擁有者都未變更時改回 queued
+                cursor = conn.execute(
+                    "UPDATE jobs SET status = 'queued', owner = NULL, updated_at = CURRENT_TIMESTAMP "
+                    "WHERE id = ? AND status = 'running' AND owner IS ?",
+                    (row["id"], row["owner"]),
+                )
+                conn.commit()
+                if cursor.rowcount != 1:
+                    continue
+            if os.path.exists(row["file_path"]):
+                self._update(row["id"], stage="stored", progress=STAGE_PROGRESS["stored"])
+                self._executor.submit(self._run, row["id"])
+                requeued += 1
+            else:
+                self._update(row["id"], status="failed", error="上傳檔案已遺失，無法重新處理")
+        conn.close()
+
+        if requeued:
+            print(f"♻️ 重新排入 {requeued} 筆未完成的工作")
+
+    @property
+    def stopping(self):
+        """shutdown() 已被呼叫"""
+        return self._stopping.is_set()
+
+    def shutdown(self, wait=False):
+        """停止 worker pool；執行中的工作收到 cancel_event，保持 running 狀態，下次啟動時重新排入"""
+        self._stopping.set()
+        with self._lock:
+            for event in self._cancel_events.values():
+                event.set()
+        if self._executor:
+            self._executor.shutdown(wait=wait, cancel_futures=not wait)
+            self._executor = None
+
+    # --- 佇列操作 ---
+    def submit(self, filename, file_path, audio_hash=None, size_bytes=None, duration_seconds=None):
+        """寫入一筆新工作並排入 worker pool，回傳 job_id"""
+        conn = self._connect()
+        cursor = conn.execute(
+            "INSERT INTO jobs (filename, file_path, audio_hash, size_bytes, duration_seconds, "
+            "status, stage, progress, stage_timings) VALUES (?, ?, ?, ?, ?, 'queued', 'stored', ?, '{}')",
+            (filename, file_path, audio_hash, size_bytes, duration_seconds, STAGE_PROGRESS["stored"]),
+        )
+        job_id = cursor.lastrowid
+        conn.commit()
+        conn.close()
+
+        self.events.publish(job_id, "stage", {"stage": "stored", "progress": STAGE_PROGRESS["stored"]})
+        self._submitted[job_id] = time.perf_counter()
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def add_completed(self, filename, audio_hash, result):
+        """直接寫入一筆已完成的工作 (例如命中分析快取時)，回傳 job_id"""
+        conn = self._connect()
+        cursor = conn.execute(
+            "INSERT INTO jobs (filename, file_path, audio_hash, status, stage, progress, "
+            "stage_timings, meeting_id, result) VALUES (?, '', ?, 'done', 'done', ?, '{}', ?, ?)",
+            (
+                filename,
+                audio_hash,
+                STAGE_PROGRESS["done"],
+                result.get("meeting_id"),
+                json.dumps(result, ensure_ascii=False),
+            ),
+        )
+        job_id = cursor.lastrowid
+        conn.commit()
+        conn.close()
+        return job_id
+
+    def pending_paths(self):
+        """尚未完成的工作所使用的檔案路徑 (清理工作目錄時需保留)"""
+        conn = self._connect()
+        placeholders = ",".join("?" for _ in PENDING_STATUSES)
+        rows = conn.execute(
+            f"SELECT file_path FROM jobs WHERE status IN ({placeholders})", PENDING_STATUSES
+        ).fetchall()
+        conn.close()
+        return [row["file_path"] for row in rows]
+
+    def get(self, job_id):
+        conn = self._connect()
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        conn.close()
+        return self._to_dict(row) if row else None
+
+    def list(self, status=None, limit=50):
+        conn = self._connect()
+        if status:
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY id DESC LIMIT ?", (status, limit)
+            ).fetchall()
+        else:
+            rows = conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        conn.close()
+        return [self._to_dict(r) for r in rows]
+
+    # --- 內部 ---
+    def _to_dict(self, row):
+        data = dict(row)
+        # file_path / owner 是伺服器內部資訊，不對外公開
+        data.pop("file_path", None)
+        data.pop("owner", None)
+        for key in ("stage_timings", "result"):
+            try:
+                data[key] = json.loads(data[key]) if data[key] else None
+            except (TypeError, ValueError):
+                pass
+        return data
+
+    def _update(self, job_id, **fields):
+        if not fields:
+            return
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                f"UPDATE jobs SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (*fields.values(), job_id),
+            )
+            conn.commit()
+            conn.close()
+
+    def _claim(self, job_id):
+        """以條件式 UPDATE 認領工作；已被其他 worker 認領 (或已完成) 時回傳 None"""
+        with self._lock:
+            conn = self._connect()
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, updated_at = CURRENT_TIMESTAMP "
+                "WHERE id = ? AND status = 'queued'",
+                (self.owner, job_id),
+            )
+            conn.commit()
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone() if cursor.rowcount == 1 else None
+            conn.close()
+        return row
+
+    def _run(self, job_id):
+        submitted = self._submitted.pop(job_id, None)
+        if submitted is not None:
+            STAGE_SECONDS.observe(time.perf_counter() - submitted, "job_queue_wait")
+
+        row = self._claim(job_id)
+        if not row:
+            return
+
+        job = dict(row)
+        timings = {}
+        current = {"stage": None, "started": None}
+
+        def report(stage):
+            now = time.time()
+            if current["stage"]:
+                timings[current["stage"]] = round(now - current["started"], 3)
+            current["stage"], current["started"] = stage, now
+            self._update(
+                job_id,
+                stage=stage,
+                progress=STAGE_PROGRESS.get(stage, 0),
+                stage_timings=json.dumps(timings),
+            )
+            if stage != "done":
+                self.events.publish(job_id, "stage", {"stage": stage, "progress": STAGE_PROGRESS.get(stage, 0)})
+
+        def emit(event, data=None):
+            self.events.publish(job_id, event, data)
+
+        cancel_event = threading.Event()
+        with self._lock:
+            self._cancel_events[job_id] = cancel_event
+            if self._stopping.is_set():
+                cancel_event.set()
+
+        # 此工作內各階段 (上傳、輪詢、模型、解析、寫入) 的耗時，完成時隨 done 事件送出
+        trace = Trace()
+        token = start_trace(trace)
+        try:
+            with stage("job"):
+                result = self.handler(job, report, emit, cancel_event) or {}
+            report("done")
+            self._update(
+                job_id,
+                status="done",
+                meeting_id=result.get("meeting_id"),
+                result=json.dumps(result, ensure_ascii=False),
+            )
+            emit("done", {"stage_timings": timings, "trace_ms": trace.as_dict(), **result})
+        except Exception as e:
+            if self._stopping.is_set():
+                # 服務關閉造成的中斷：保持 running，擁有者程序結束後由下次啟動重新排入
+                print(f"⏹️ Job {job_id} 因服務關閉中斷，重新啟動後會再處理: {e}")
+                return
+            print(f"❌ Job {job_id} 失敗: {e}")
+            self._update(job_id, status="failed", error=str(e))
+            emit("failed", {"error": str(e)})
+        finally:
+            end_trace(token)
+            with self._lock:
+                self._cancel_events.pop(job_id, None)
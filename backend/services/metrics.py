@@ -0,0 +1,291 @@
+import bisect
+import contextvars
+import functools
+import os
+import threading
+import time
+
+# 直方圖預設的區間上限 (秒)：涵蓋毫秒級的資料庫操作到數分鐘的模型分析
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# 設為 1 時所有請求都回傳 Server-Timing；否則只有帶 X-Trace: 1 的請求才回傳
+METRICS_TRACE_ALL = os.getenv("METRICS_TRACE_ALL", "0") == "1"
+
+# 沒有 HTTP 端點的程序 (Streamlit) 將指標寫入此檔，供 node_exporter textfile collector 讀取
+METRICS_TEXTFILE = os.getenv("METRICS_TEXTFILE")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs.extend(f'{n}="{v}"' for n, v in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if not isinstance(labels, tuple):
+            labels = (labels,)
+        return labels
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """只增不減的計數 (次數、位元組數)"""
+
+    kind = "counter"
+
+    def inc(self, labels=(), amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, labels=(), value=0):
+        """直接設定數值 (由 collector 同步其他模組自行統計的次數)"""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in items
+        ]
+
+
+class Gauge(Counter):
+    """可增可減的目前值 (例如進行中的數量)"""
+
+    kind = "gauge"
+
+    def dec(self, labels=(), amount=1):
+        self.inc(labels, -amount)
+
+
+class Histogram(_Metric):
+    """耗時分布：各區間的累計次數、總和與次數"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, labels=()):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [各區間次數 (最後一格為 +Inf), 總和, 次數]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def snapshot(self, labels=()):
+        """回傳 (次數, 總和)，供報告與測量使用"""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return (state[2], state[1]) if state else (0, 0.0)
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self._values.items())
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labels, key, (("le", _format_value(float(bound))),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """集中管理所有指標，render() 輸出 Prometheus 文字格式"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=()):
+        return self._register(Gauge(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def register_collector(self, fn):
+        """fn() 在輸出前呼叫，用來更新由其他模組統計的數值 (例如快取命中數)"""
+        with self._lock:
+            self._collectors.append(fn)
+
+    def render(self):
+        with self._lock:
+            collectors = list(self._collectors)
+            metrics = list(self._metrics.values())
+        for fn in collectors:
+            try:
+                fn()
+            except Exception as e:
+                print(f"⚠️ 指標收集失敗: {e}")
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    "meeting_stage_seconds", "各處理階段的耗時 (秒)", ("stage",)
+)
+STAGE_IN_FLIGHT = registry.gauge(
+    "meeting_stage_in_flight", "目前正在執行的各階段數量", ("stage",)
+)
+STAGE_ERRORS = registry.counter(
+    "meeting_stage_errors_total", "各階段失敗次數 (依例外類型)", ("stage", "error")
+)
+STAGE_BYTES = registry.counter(
+    "meeting_stage_bytes_total", "各階段處理的資料量 (位元組)", ("stage",)
+)
+
+
+# --- 單一請求 / 工作的追蹤 ---
+class Trace:
+    """記錄一次請求 (或一個背景工作) 內各階段的耗時，可輸出為 Server-Timing 標頭"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.spans.append((name, seconds))
+
+    def as_dict(self):
+        """同名階段 (例如多次查詢) 的耗時加總，單位毫秒"""
+        totals = {}
+        with self._lock:
+            for name, seconds in self.spans:
+                totals[name] = totals.get(name, 0.0) + seconds
+        return {name: round(seconds * 1000, 3) for name, seconds in totals.items()}
+
+    def server_timing(self):
+        parts = [f"{name};dur={ms}" for name, ms in self.as_dict().items()]
+        parts.append(f"total;dur={round((time.perf_counter() - self.started) * 1000, 3)}")
+        return ", ".join(parts)
+
+
+_current_trace = contextvars.ContextVar("metrics_trace", default=None)
+
+
+def start_trace(trace=None):
+    """開始追蹤 (設定目前 context 的 Trace)，回傳 token 供 end_trace() 還原"""
+    return _current_trace.set(trace if trace is not None else Trace())
+
+
+def end_trace(token):
+    _current_trace.reset(token)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+class stage:
+    """
+    量測一個處理階段 (context manager，也可當 decorator)：
+    耗時寫入直方圖、執行中數量寫入 gauge、例外依類型計數，
+    目前有追蹤時同時記入該請求的 Trace。
+    with stage("db_insert"): ...
+    """
+
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+        self.started = None
+
+    def __enter__(self):
+        STAGE_IN_FLIGHT.inc(self.name)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        STAGE_IN_FLIGHT.dec(self.name)
+        STAGE_SECONDS.observe(elapsed, self.name)
+        if exc_type is not None and issubclass(exc_type, Exception):
+            STAGE_ERRORS.inc((self.name, exc_type.__name__))
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(self.name, elapsed)
+        return False
+
+    def __call__(self, fn):
+        name = self.name
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+
+def add_bytes(stage_name, size):
+    """記錄某階段處理的資料量"""
+    if size:
+        STAGE_BYTES.inc(stage_name, size)
+
+
+def render():
+    return registry.render()
+
+
+def write_textfile(path):
+    """
+    將目前的指標寫入檔案 (Prometheus node_exporter textfile collector 格式)
+    供沒有 HTTP 端點的程序 (例如 Streamlit) 輸出指標
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(render())
+    os.replace(tmp_path, path)
@@ -0,0 +1,184 @@
+import sqlite3
+import threading
+import time
+
+# 回填既有會議時每批處理的筆數
+BACKFILL_BATCH_SIZE = 500
+
+# 待辦事項狀態
+ACTION_ITEM_STATUSES = ("open", "done")
+
+# 子表資料取自 meetings 的 JSON 欄位 ({m} 為資料列別名：trigger 中為 new，回填時為 m)
+_JSON_SOURCE = "json_each(CASE WHEN json_valid({m}.{column}) AND json_type({m}.{column}) = 'array' THEN {m}.{column} ELSE '[]' END) AS j"
+
+_CHILD_INSERTS = (
+    ("participants", '''
+        INSERT INTO meeting_participants (meeting_id, position, name, role)
+        SELECT {m}.id, j.key,
+               trim(CASE WHEN j.type = 'object' THEN json_extract(j.value, '$.name') ELSE j.value END),
+               CASE WHEN j.type = 'object' THEN json_extract(j.value, '$.role') END
+        FROM {source}
+    '''),
+    ("next_steps", '''
+        INSERT INTO meeting_action_items (meeting_id, position, action, owner, status)
+        SELECT {m}.id, j.key,
+               CASE WHEN j.type = 'object' THEN json_extract(j.value, '$.action') ELSE j.value END,
+               CASE WHEN j.type = 'object' THEN nullif(trim(json_extract(j.value, '$.owner')), '') END,
+               coalesce(CASE WHEN j.type = 'object' THEN json_extract(j.value, '$.status') END, 'open')
+        FROM {source}
+    '''),
+    ("key_points", '''
+        INSERT INTO meeting_key_points (meeting_id, position, title, content)
+        SELECT {m}.id, j.key,
+               CASE WHEN j.type = 'object' THEN json_extract(j.value, '$.title') END,
+               CASE WHEN j.type = 'object' THEN json_extract(j.value, '$.content') ELSE j.value END
+        FROM {source}
+    '''),
+    ("meeting_topics", '''
+        INSERT INTO meeting_topics (meeting_id, position, topic)
+        SELECT {m}.id, j.key, j.value
+        FROM {source}
+    '''),
+)
+
+_CHILD_TABLES = {
+    "participants": "meeting_participants",
+    "next_steps": "meeting_action_items",
+    "key_points": "meeting_key_points",
+    "meeting_topics": "meeting_topics",
+}
+
+
+def _insert_sql(column, insert, m, where=""):
+    source = _JSON_SOURCE.format(m=m, column=column)
+    if m != "new":
+        source = f"meetings AS {m}, {source}"
+    return insert.format(m=m, source=source) + where
+
+
+def init_child_tables(conn):
+    """
+    建立與會者 / 待辦事項 / 重點 / 議題子表與索引
+    meetings 的 JSON 欄位仍保留 (Word 與全文索引使用)，子表由 trigger 自動同步，
+    既有資料由 backfill() 分批回填。
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS meeting_participants (
+            meeting_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            name TEXT,
+            role TEXT,
+            PRIMARY KEY (meeting_id, position)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS meeting_action_items (
+            meeting_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            action TEXT,
+            owner TEXT,
+            status TEXT NOT NULL DEFAULT 'open',
+            PRIMARY KEY (meeting_id, position)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS meeting_key_points (
+            meeting_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            title TEXT,
+            content TEXT,
+            PRIMARY KEY (meeting_id, position)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS meeting_topics (
+            meeting_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            topic TEXT,
+            PRIMARY KEY (meeting_id, position)
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_participants_name ON meeting_participants (name, meeting_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_action_items_owner ON meeting_action_items (owner, status, meeting_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_action_items_status ON meeting_action_items (status, meeting_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_topics_topic ON meeting_topics (topic)")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_state (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'meetings_children_insert'"
+    ).fetchone()
+
+    inserts = "\n".join(_insert_sql(column, insert, "new") + ";" for column, insert in _CHILD_INSERTS)
+    deletes = "\n".join(f"DELETE FROM {table} WHERE meeting_id = old.id;" for table in _CHILD_TABLES.values())
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS meetings_children_insert AFTER INSERT ON meetings BEGIN {inserts} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS meetings_children_delete AFTER DELETE ON meetings BEGIN {deletes} END")
+    for column, insert in _CHILD_INSERTS:
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS meetings_children_update_{column} AFTER UPDATE OF {column} ON meetings BEGIN
+                DELETE FROM {_CHILD_TABLES[column]} WHERE meeting_id = new.id;
+                {_insert_sql(column, insert, "new")};
+            END
+        ''')
+
+    if not exists:
+        # trigger 建立之後新增的會議會自動同步，只需回填在此之前的資料
+        upto = conn.execute("SELECT coalesce(max(id), 0) FROM meetings").fetchone()[0]
+        conn.execute("INSERT OR REPLACE INTO schema_state (key, value) VALUES ('children_backfill_upto', ?)", (upto,))
+        conn.execute("INSERT OR REPLACE INTO schema_state (key, value) VALUES ('children_backfill_cursor', '0')")
+
+
+def _state(conn, key):
+    row = conn.execute("SELECT value FROM schema_state WHERE key = ?", (key,)).fetchone()
+    return int(row[0]) if row else 0
+
+
+def backfill(connect, batch_size=BACKFILL_BATCH_SIZE, pause=0.0):
+    """
+    分批把既有會議的 JSON 欄位寫入子表 (可中斷，下次從上次的位置繼續)
+    connect(): 回傳資料庫連線；每批一個交易，不會長時間鎖住資料庫
+    回傳本次處理的會議數
+    """
+    processed = 0
+    while True:
+        conn = connect()
+        try:
+            upto = _state(conn, "children_backfill_upto")
+            cursor = _state(conn, "children_backfill_cursor")
+            if cursor >= upto:
+                return processed
+            end = min(cursor + batch_size, upto)
+            where = f" WHERE m.id > {cursor} AND m.id <= {end}"
+            for table in _CHILD_TABLES.values():
+                conn.execute(f"DELETE FROM {table} WHERE meeting_id > ? AND meeting_id <= ?", (cursor, end))
+            for column, insert in _CHILD_INSERTS:
+                conn.execute(_insert_sql(column, insert, "m", where))
+            conn.execute("UPDATE schema_state SET value = ? WHERE key = 'children_backfill_cursor'", (end,))
+            conn.commit()
+            processed += conn.execute(
+                "SELECT count(*) FROM meetings WHERE id > ? AND id <= ?", (cursor, end)
+            ).fetchone()[0]
+        except sqlite3.OperationalError as e:
+            print(f"⚠️ 子表回填失敗，稍後重試: {e}")
+            return processed
+        finally:
+            conn.close()
+        if pause:
+            time.sleep(pause)
+
+
+def start_backfill(connect, batch_size=BACKFILL_BATCH_SIZE):
+    """在背景執行緒回填，不阻塞服務啟動"""
+    def run():
+        started = time.time()
+        count = backfill(connect, batch_size, pause=0.01)
+        if count:
+            print(f"🗂️ 已回填 {count} 筆會議的子表 ({time.time() - started:.1f}s)")
+
+    thread = threading.Thread(target=run, name="children-backfill", daemon=True)
+    thread.start()
+    return thread
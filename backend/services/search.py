@@ -0,0 +1,279 @@
+import html
+import os
+import re
+import sqlite3
+
+from services import db_pool
+from services.transcript_store import transcript_sql, load_transcript
+
+# 建立全文索引的欄位與 bm25 權重 (摘要、議題命中比逐字稿命中更相關)
+SEARCH_COLUMNS = (
+    ("summary", 5.0),
+    ("meeting_topics", 4.0),
+    ("key_points", 3.0),
+    ("next_steps", 2.0),
+    ("transcription", 1.0),
+)
+
+# 以 JSON 字串儲存的欄位：只索引其中的文字值，不索引 "title" / "owner" 等鍵名
+JSON_COLUMNS = ("meeting_topics", "key_points", "next_steps")
+
+# trigram 分詞至少需要 3 個字元；較短的詞 (例如兩個字的中文詞) 改查 meetings_grams 索引
+MIN_MATCH_CHARS = 3
+
+# 中日韓文字：在 meetings_grams 中展開為單字與相鄰兩字 (unigram / bigram) 詞元
+CJK_RUN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+")
+
+# 非中日韓文字的短詞 (例如 "AI") 以 unicode61 分詞，查詢時做字首比對
+WORD = re.compile(r"\w+")
+
+# snippet() / 片段標示先以控制字元標記命中位置，HTML 跳脫後再換成 <mark>
+MARK_START, MARK_END = "\x02", "\x03"
+
+SNIPPET_TOKENS = 24
+
+# 命中筆數很多時 (例如搜尋常見人名)，只對最新的這麼多筆計算 bm25 排序，避免對整個索引評分
+SEARCH_MAX_RANKED = int(os.getenv("SEARCH_MAX_RANKED", "1000"))
+
+
+def _text_expr(column, alias):
+    ref = f"{alias}.{column}"
+    if column == "transcription":
+        # 逐字稿可能已壓縮搬移到 meeting_transcripts
+        return transcript_sql(alias)
+    if column not in JSON_COLUMNS:
+        return ref
+    return (
+        f"CASE WHEN json_valid({ref}) "
+        f"THEN (SELECT group_concat(value, ' ') FROM json_tree({ref}) WHERE type = 'text') "
+        f"ELSE {ref} END"
+    )
+
+
+def search_grams(text):
+    """中日韓文字展開為單字與相鄰兩字，其餘文字不變 (由 unicode61 分詞)"""
+    if not text:
+        return text
+
+    def expand(match):
+        run = match.group(0)
+        return " " + " ".join(list(run) + [run[i:i + 2] for i in range(len(run) - 1)]) + " "
+
+    return CJK_RUN.sub(expand, text)
+
+
+def register_functions(conn):
+    """註冊 SQL 函式 search_grams(text)，供 meetings_grams 的檢視表與 trigger 使用"""
+    conn.create_function("search_grams", 1, search_grams, deterministic=True)
+
+
+# 連線池中的每條新連線都註冊 search_grams()
+db_pool.register_connect_hook(register_functions)
+
+
+def _create_index(conn, table, view, tokenize, wrap):
+    """
+    建立一個 external content 的 FTS5 索引：內容取自 view，meetings 變更時由 trigger 同步
+    wrap(expr) 決定寫入索引的文字 (例如展開為 unigram / bigram)
+    回傳索引是否為新建立 (需要回填)
+    """
+    names = [name for name, _ in SEARCH_COLUMNS]
+    column_list = ", ".join(names)
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone()
+
+    for trigger in ("insert", "delete", "update", "transcript_before", "transcript_after"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {table}_{trigger}")
+    conn.execute(f"DROP VIEW IF EXISTS {view}")
+
+    conn.execute(f'''
+        CREATE VIEW {view} AS
+        SELECT m.id AS id, {", ".join(f"{wrap(_text_expr(name, 'm'))} AS {name}" for name in names)}
+        FROM meetings m
+    ''')
+    conn.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5(
+            {column_list},
+            content = '{view}',
+            content_rowid = 'id',
+            tokenize = '{tokenize}'
+        )
+    ''')
+
+    new_values = ", ".join(wrap(_text_expr(name, "new")) for name in names)
+    old_values = ", ".join(wrap(_text_expr(name, "old")) for name in names)
+    # 逐字稿搬移到壓縮表 (transcription 改為 NULL，其他欄位不變) 時索引內容沒有改變，不需重建
+    moved_only = " AND ".join(
+        ["old.transcription IS NOT NULL", "new.transcription IS NULL"]
+        + [f"new.{name} IS old.{name}" for name in names if name != "transcription"]
+    )
+    conn.execute(f'''
+        CREATE TRIGGER {table}_insert AFTER INSERT ON meetings BEGIN
+            INSERT INTO {table} (rowid, {column_list}) VALUES (new.id, {new_values});
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER {table}_delete AFTER DELETE ON meetings BEGIN
+            INSERT INTO {table} ({table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER {table}_update AFTER UPDATE OF {column_list} ON meetings
+        WHEN NOT ({moved_only}) BEGIN
+            INSERT INTO {table} ({table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO {table} (rowid, {column_list}) VALUES (new.id, {new_values});
+        END
+    ''')
+
+    # 新會議的逐字稿直接寫入壓縮表 (meetings.transcription 一開始就是 NULL)：
+    # 寫入前以檢視表目前的內容移除舊索引，寫入後依含逐字稿的內容重新索引
+    stored_only = "EXISTS (SELECT 1 FROM meetings WHERE id = new.meeting_id AND transcription IS NULL)"
+    conn.execute(f'''
+        CREATE TRIGGER {table}_transcript_before BEFORE INSERT ON meeting_transcripts
+        WHEN {stored_only} BEGIN
+            INSERT INTO {table} ({table}, rowid, {column_list})
+            SELECT 'delete', id, {column_list} FROM {view} WHERE id = new.meeting_id;
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER {table}_transcript_after AFTER INSERT ON meeting_transcripts
+        WHEN {stored_only} BEGIN
+            INSERT INTO {table} (rowid, {column_list})
+            SELECT id, {column_list} FROM {view} WHERE id = new.meeting_id;
+        END
+    ''')
+
+    # bm25 權重寫入索引設定，查詢時 ORDER BY rank 可由 FTS5 直接處理 (只計算 LIMIT 內的資料列)
+    weights = ", ".join(str(weight) for _, weight in SEARCH_COLUMNS)
+    conn.execute(f"INSERT INTO {table} ({table}, rank) VALUES ('rank', ?)", (f"bm25({weights})",))
+
+    if not exists:
+        # 'rebuild' 指令無法讀取含 json_tree 子查詢的檢視表，直接由檢視表回填
+        conn.execute(f'''
+            INSERT INTO {table} (rowid, {column_list})
+            SELECT id, {column_list} FROM {view}
+        ''')
+    return not exists
+
+
+def init_search_index(conn):
+    """
+    建立 meetings 的 FTS5 全文索引：
+    - meetings_fts：trigram 分詞，比對 3 個字元以上的詞 (可直接搜尋中文)
+    - meetings_grams：中日韓文字展開為單字與相鄰兩字後以 unicode61 分詞，比對 1~2 個字元的短詞
+    兩者皆為 external content (不重複儲存逐字稿)，meetings 新增 / 修改 / 刪除時由 trigger 同步更新；
+    第一次建立時回填既有資料。檢視表與 trigger 每次啟動都重新建立，定義變更時不需要重建索引。
+    """
+    register_functions(conn)
+    if _create_index(conn, "meetings_fts", "meetings_search_source", "trigram", lambda expr: expr):
+        print("🔎 已建立會議全文索引")
+    if _create_index(conn, "meetings_grams", "meetings_grams_source", "unicode61", lambda expr: f"search_grams({expr})"):
+        print("🔎 已建立短詞 (單字 / 雙字) 索引")
+
+
+def _short_query(term):
+    """1~2 個字元的詞 → meetings_grams 的 MATCH 運算式 (中日韓文字比對詞元，其他文字比對字首)"""
+    parts = []
+    for match in re.finditer(f"{CJK_RUN.pattern}|{WORD.pattern}", term):
+        token = match.group(0).replace('"', '""')
+        parts.append(f'"{token}"' if CJK_RUN.fullmatch(token) else f'"{token}"*')
+    return " AND ".join(parts)
+
+
+def _split_terms(q):
+    """拆成 (meetings_fts 的 MATCH 字串, meetings_grams 的 MATCH 字串, [所有詞])；每個詞都必須出現 (AND)"""
+    match_terms, short_terms, terms = [], [], []
+    for term in q.split():
+        if len(term) >= MIN_MATCH_CHARS:
+            match_terms.append('"' + term.replace('"', '""') + '"')
+        else:
+            query = _short_query(term)
+            if not query:
+                continue
+            short_terms.append(query)
+        terms.append(term)
+    return " AND ".join(match_terms), " AND ".join(short_terms), terms
+
+
+def _escape_marked(text):
+    """HTML 跳脫後再將控制字元標記換成 <mark>，避免會議內容中的 HTML 被瀏覽器執行"""
+    return html.escape(text or "").replace(MARK_START, "<mark>").replace(MARK_END, "</mark>")
+
+
+def _highlight(text, terms, width=SNIPPET_TOKENS * 2):
+    """短詞 (meetings_grams) 命中時的片段與標示：snippet() 無法讀取展開後的內容"""
+    text = text or ""
+    pattern = re.compile("|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+    found = pattern.search(text)
+    if not found:
+        return html.escape(text[:width])
+    start = max(0, found.start() - width // 3)
+    fragment = pattern.sub(lambda m: MARK_START + m.group(0) + MARK_END, text[start:start + width])
+    return ("…" if start > 0 else "") + _escape_marked(fragment) + ("…" if start + width < len(text) else "")
+
+
+def search_meetings(conn, q, limit=20, offset=0):
+    """
+    全文搜尋會議，依 bm25 排序 (一律使用索引，不會逐筆掃描 meetings)
+    回傳 {"query", "total", "limit", "offset", "ranked_recent_only", "results": [{id, filename, created_at, summary, snippet, score}]}
+    ranked_recent_only 為 True 表示命中太多，只在最新的 SEARCH_MAX_RANKED 筆中排序
+    """
+    match, short_match, terms = _split_terms(q)
+    result = {"query": q, "total": 0, "limit": limit, "offset": offset, "ranked_recent_only": False, "results": []}
+    if not match and not short_match:
+        return result
+
+    # 有 3 字元以上的詞時以 trigram 索引排序與產生片段，短詞以 meetings_grams 篩選；只有短詞時直接查 meetings_grams
+    if match:
+        table, query = "meetings_fts", match
+        snippet = f"snippet(meetings_fts, -1, '{MARK_START}', '{MARK_END}', '…', {SNIPPET_TOKENS})"
+    else:
+        table, query = "meetings_grams", short_match
+        snippet = "m.summary"
+    conditions, params = [f"{table} MATCH ?"], [query]
+    if match and short_match:
+        # 一元 + 讓 rowid 條件不傳給 meetings_fts，避免對每個候選 rowid 重新載入 trigram 的命中清單
+        conditions.append("+f.rowid IN (SELECT rowid FROM meetings_grams WHERE meetings_grams MATCH ?)")
+        params.append(short_match)
+
+    try:
+        result["total"] = conn.execute(
+            f"SELECT count(*) FROM {table} f WHERE {' AND '.join(conditions)}", params
+        ).fetchone()[0]
+
+        if result["total"] > SEARCH_MAX_RANKED:
+            # 以 rowid 下限限制排序範圍，FTS5 可直接在索引中套用
+            floor = conn.execute(f'''
+                SELECT min(rowid) FROM (
+                    SELECT f.rowid FROM {table} f WHERE {' AND '.join(conditions)} ORDER BY f.rowid DESC LIMIT ?
+                )
+            ''', (*params, SEARCH_MAX_RANKED)).fetchone()[0]
+            conditions.append("f.rowid >= ?")
+            params.append(floor)
+            result["ranked_recent_only"] = True
+
+        rows = conn.execute(f'''
+            SELECT m.id, m.filename, m.created_at, m.summary, {snippet} AS snippet, f.rank AS score
+            FROM {table} f JOIN meetings m ON m.id = f.rowid
+            WHERE {" AND ".join(conditions)}
+            ORDER BY f.rank
+            LIMIT ? OFFSET ?
+        ''', (*params, limit, offset)).fetchall()
+    except sqlite3.OperationalError as e:
+        raise ValueError(f"無效的搜尋字串: {e}")
+
+    for row in rows:
+        item = dict(row)
+        if match:
+            item["snippet"] = _escape_marked(item["snippet"])
+        else:
+            # 摘要沒有命中時才讀取 (解壓縮) 該筆逐字稿，只處理本頁的資料列
+            text = item["snippet"] or ""
+            if not any(term.lower() in text.lower() for term in terms):
+                text = load_transcript(conn, item["id"]) or text
+            item["snippet"] = _highlight(text, terms)
+        # bm25 越小越相關，轉成越大越相關比較直覺
+        item["score"] = round(-item["score"], 4)
+        result["results"].append(item)
+    return result
@@ -0,0 +1,186 @@
+import copy
+import os
+import socket
+import threading
+import time
+import uuid
+
+from services.db_pool import connect as db_connect
+
+# 租約有效時間 (秒)：持有者每 1/3 時間續約一次，程序當掉時其他程序最多等這麼久就會接手
+LEASE_SECONDS = float(os.getenv("SINGLE_FLIGHT_LEASE_SECONDS", "30"))
+
+# 等待其他程序完成時的查詢間隔 (秒)
+LEASE_POLL_SECONDS = float(os.getenv("SINGLE_FLIGHT_POLL_SECONDS", "1.0"))
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    相同 key 的計算同時只執行一次，其他呼叫端等待並共用結果
+    - 同一程序內：以 in-flight 字典 + threading.Event 讓 worker thread 共用同一次計算
+    - 跨程序 (多個 uvicorn worker)：以 SQLite 租約列 (leases 表) 決定由誰計算；
+      沒拿到租約的程序定期以 lookup() 查詢結果 (例如分析快取)，租約釋放或過期仍無結果時自行接手
+    db_path 為 None 時只做程序內的去重。
+    """
+
+    def __init__(self, db_path=None, lease_seconds=LEASE_SECONDS, poll_seconds=LEASE_POLL_SECONDS):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.shared = 0
+        self.shared_remote = 0
+        self.takeovers = 0
+
+    def init_table(self):
+        if not self.db_path:
+            return
+        conn = db_connect(self.db_path)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS leases (
+                key TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    # --- 租約 ---
+    def _acquire(self, key):
+        """取得租約 (不存在或已過期時)；回傳是否成功"""
+        now = time.time()
+        conn = db_connect(self.db_path)
+        conn.execute('''
+            INSERT INTO leases (key, owner, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+            WHERE leases.expires_at < ?
+        ''', (key, self.owner, now + self.lease_seconds, now))
+        conn.commit()
+        row = conn.execute("SELECT owner FROM leases WHERE key = ?", (key,)).fetchone()
+        conn.close()
+        return row is not None and row[0] == self.owner
+
+    def _lease_active(self, key):
+        conn = db_connect(self.db_path)
+        row = conn.execute("SELECT expires_at FROM leases WHERE key = ?", (key,)).fetchone()
+        conn.close()
+        return row is not None and row[0] >= time.time()
+
+    def _renew(self, key):
+        conn = db_connect(self.db_path)
+        conn.execute(
+            "UPDATE leases SET expires_at = ? WHERE key = ? AND owner = ?",
+            (time.time() + self.lease_seconds, key, self.owner),
+        )
+        conn.commit()
+        conn.close()
+
+    def _release(self, key):
+        conn = db_connect(self.db_path)
+        conn.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, self.owner))
+        conn.commit()
+        conn.close()
+
+    def _compute_with_lease(self, key, compute):
+        stop = threading.Event()
+
+        def keep_alive():
+            while not stop.wait(self.lease_seconds / 3):
+                self._renew(key)
+
+        renewer = threading.Thread(target=keep_alive, name=f"lease-{key[:8]}", daemon=True)
+        renewer.start()
+        try:
+            return compute()
+        finally:
+            stop.set()
+            self._release(key)
+
+    def _run_leader(self, key, compute, lookup, on_wait):
+        if not self.db_path:
+            return compute()
+
+        waited = False
+        while True:
+            if self._acquire(key):
+                if waited:
+                    # 另一個程序的租約已釋放 / 過期，但沒有留下結果
+                    with self._lock:
+                        self.takeovers += 1
+                return self._compute_with_lease(key, compute)
+
+            if not waited:
+                waited = True
+                if on_wait:
+                    on_wait()
+            # 其他程序正在計算：等它完成後取用結果
+            while self._lease_active(key):
+                result = lookup() if lookup else None
+                if result is not None:
+                    with self._lock:
+                        self.shared_remote += 1
+                    return result
+                time.sleep(self.poll_seconds)
+            result = lookup() if lookup else None
+            if result is not None:
+                with self._lock:
+                    self.shared_remote += 1
+                return result
+
+    def run(self, key, compute, lookup=None, on_wait=None):
+        """
+        compute(): 實際計算；lookup(): 查詢其他程序完成後留下的結果 (沒有時回傳 None)
+        on_wait(): 開始等待別人的計算時呼叫一次 (例如通知前端)
+        """
+        if not key:
+            return compute()
+
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+                self.leaders += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            if on_wait:
+                on_wait()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            # 各呼叫端各自使用一份，避免互相修改
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = self._run_leader(key, compute, lookup, on_wait)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._inflight),
+                "leaders": self.leaders,
+                "shared": self.shared,
+                "shared_remote": self.shared_remote,
+                "takeovers": self.takeovers,
+            }
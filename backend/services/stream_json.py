@@ -0,0 +1,89 @@
+import json
+
+
+class IncrementalJSONParser:
+    """
+    串流 JSON 物件的增量解析器
+    依序餵入模型串流回來的文字片段，每當最外層物件的某個欄位值完整出現時就回傳該欄位，
+    不必等整份 JSON 結束才能使用已產生的內容。
+    只處理最外層為物件 ({...}) 的情況，這也是我們要求 Gemini 回傳的格式。
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0            # 已掃描到的位置
+        self._depth = 0          # 目前巢狀深度 (最外層物件內為 1)
+        self._in_string = False
+        self._escape = False
+        self._key = None         # 目前最外層欄位的 key
+        self._key_start = None
+        self._value_start = None
+        self._expect = "key"     # 最外層下一個預期的語法單位：key / colon / value
+
+    def feed(self, text):
+        """餵入新片段，回傳本次新完成的 [(key, value), ...]"""
+        self.buffer += text
+        completed = []
+        buf = self.buffer
+        i = self._pos
+        while i < len(buf):
+            ch = buf[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._expect == "key":
+                        self._key = json.loads(buf[self._key_start:i + 1])
+                        self._expect = "colon"
+                    elif self._depth == 1 and self._value_start is not None:
+                        completed.append(self._finish(buf, i + 1))
+                i += 1
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                if self._depth == 1 and self._expect == "key":
+                    self._key_start = i
+                elif self._depth == 1 and self._expect == "value":
+                    self._value_start = i
+                    self._expect = "in_value"
+            elif ch in "{[":
+                if self._depth == 1 and self._expect == "value":
+                    self._value_start = i
+                    self._expect = "in_value"
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._value_start is not None:
+                    completed.append(self._finish(buf, i + 1))
+                elif self._depth == 0 and self._value_start is not None:
+                    # 最外層結束，最後一個欄位是數字 / true / false / null
+                    completed.append(self._finish(buf, i))
+            elif self._depth == 1:
+                if ch == ":" and self._expect == "colon":
+                    self._expect = "value"
+                elif ch == "," and self._value_start is not None:
+                    completed.append(self._finish(buf, i))
+                elif not ch.isspace() and self._expect == "value":
+                    self._value_start = i
+                    self._expect = "in_value"
+            i += 1
+
+        self._pos = i
+        return [item for item in completed if item is not None]
+
+    def _finish(self, buf, end):
+        key = self._key
+        raw = buf[self._value_start:end].strip()
+        self._key = None
+        self._key_start = None
+        self._value_start = None
+        self._expect = "key"
+        try:
+            return key, json.loads(raw)
+        except ValueError:
+            return None
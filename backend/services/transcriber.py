@@ -1,18 +1,93 @@
-from google import genai
-from google.genai import types
 import json
 import os
-import time
+import shutil
+import tempfile
+import threading
 
-def analyze_audio_directly(file_path, api_key=None):
+from services.audio_prep import prepare_audio
+from services.vad import trim_silence_file
+from services.map_reduce import split_audio, map_chunks, merge_structured, merge_transcripts
+from services.gemini_client import gemini, types
+from services.file_wait import wait_for_file_active_sync
+from services.stream_json import IncrementalJSONParser
+from services.metrics import stage, add_bytes
+
+# 長錄音切割設定：超過 CHUNK_SECONDS 的音訊切成重疊片段並行分析
+CHUNK_SECONDS = int(os.getenv("GEMINI_CHUNK_SECONDS", "1200"))
+CHUNK_OVERLAP_SECONDS = int(os.getenv("GEMINI_CHUNK_OVERLAP_SECONDS", "15"))
+MAX_PARALLEL = int(os.getenv("GEMINI_MAX_PARALLEL", "4"))
+
+def analyze_audio_directly(file_path, api_key=None, on_event=None, cancel_event=None):
     """
     直接上傳音訊給 Gemini 進行分析 (不透過本地 Whisper)
+    上傳前先移除長靜音 (見 services.vad)，再轉為單聲道 16 kHz 並以語音 codec 壓縮 (見 services.audio_prep)
+    長錄音會切成重疊片段並行分析，再合併去重 (map-reduce)
+    on_event(event, data): 可選，回報靜音裁切與音訊壓縮結果、遠端上傳完成、模型串流中與部分解析出的欄位
+    cancel_event: 可選 (threading.Event)，被設定時停止等待 Gemini 處理檔案；任一片段失敗時也會設定，讓其他片段不再空等
     回傳: (transcription_text, structured_data_dict)
     """
     if not api_key:
         raise ValueError("API Key is required")
 
-    client = genai.Client(api_key=api_key)
+    cancel_event = cancel_event or threading.Event()
+    work_dir = tempfile.mkdtemp(prefix="gemini_chunks_")
+    try:
+        source = file_path
+        trimmed = trim_silence_file(file_path, work_dir)
+        if trimmed:
+            source = trimmed.path
+            if on_event:
+                on_event("silence_trimmed", trimmed.as_dict())
+        prepared = prepare_audio(source, work_dir)
+        if prepared.method and on_event:
+            on_event("audio_compressed", prepared.as_dict())
+        with stage("split_audio"):
+            chunks = split_audio(prepared.path, work_dir, CHUNK_SECONDS, CHUNK_OVERLAP_SECONDS)
+        if len(chunks) > 1:
+            print(f"錄音較長，切割為 {len(chunks)} 段並行分析 (最多 {MAX_PARALLEL} 段同時進行)")
+
+        def analyze_chunk(chunk, index, total):
+            chunk_path, start, end = chunk
+            try:
+                return _analyze_single(api_key, chunk_path, index, total, on_event, cancel_event)
+            except Exception:
+                cancel_event.set()
+                raise
+
+        results = map_chunks(chunks, analyze_chunk, max_parallel=MAX_PARALLEL)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if len(results) == 1:
+        return results[0]
+
+    with stage("merge_chunks"):
+        transcription = merge_transcripts([t for t, _ in results])
+        structured_data = merge_structured(
+            [d for _, d in results],
+            summarize_fn=lambda summaries: _summarize(api_key, summaries),
+        )
+    return transcription, structured_data
+
+
+def _summarize(api_key, summaries):
+    """將各片段摘要整合為一段完整摘要 (純文字請求，成本低)"""
+    prompt = (
+        "以下是同一場會議依時間順序切成數段後，各段的摘要。"
+        "請整合成一段約 100-200 字的繁體中文會議總結摘要，只回傳摘要內容：\n\n"
+        + "\n".join(f"{idx}. {s}" for idx, s in enumerate(summaries, 1))
+    )
+    response = gemini.call(
+        api_key,
+        lambda client: client.models.generate_content(model="gemini-1.5-flash", contents=prompt),
+        label="summarize",
+    )
+    return response.text.strip()
+
+
+def _analyze_single(api_key, file_path, index=0, total=1, on_event=None, cancel_event=None):
+    """上傳單一音訊檔並請 Gemini 回傳逐字稿 + 結構化資料"""
+    emit = on_event or (lambda event, data=None: None)
 
     # 1. 上傳檔案
     print(f"正在上傳檔案至 Gemini: {file_path}...")
@@ -20,30 +95,29 @@ def analyze_audio_directly(file_path, api_key=None):
     
     # 使用新的 SDK 上傳方式
     # 注意：google-genai SDK 的 upload_file 用法
-    upload_result = client.files.upload(file=file_path)
+    with stage("gemini_upload"):
+        upload_result = gemini.call(api_key, lambda client: client.files.upload(file=file_path), label="upload")
+    add_bytes("gemini_upload", file_size)
     print(f"檔案上傳成功: {upload_result.name}")
 
-    # 等待檔案處理完成 (如果是影片或大檔可能需要，音訊通常很快)
-    while upload_result.state.name == "PROCESSING":
-        print("等待 Gemini 處理檔案中...")
-        time.sleep(2)
-        upload_result = client.files.get(name=upload_result.name)
-
-    if upload_result.state.name == "FAILED":
-        raise ValueError("Gemini 檔案處理失敗")
+    # 等待檔案處理完成 (短間隔起跳、指數拉長，小檔不再有固定 2 秒的延遲)
+    # 輪詢在共用的 event loop 上進行，工作失敗或服務關閉時可取消
+    with stage("gemini_processing"):
+        upload_result = wait_for_file_active_sync(api_key, upload_result, cancel_event=cancel_event)
+    emit("remote_upload_done", {"chunk": index + 1, "total": total})
 
     # 2. 發送請求 (同時要求逐字稿 + 結構化資料)
     # 為了確保 JSON 格式正確，我們使用單一 Prompt 同時要求兩者，或者分兩階段?
     # 為了省錢且效率高，我們一次請求完成：讓 JSON 中包含一個 "transcription" 欄位
+    # 結構化欄位放在前面、逐字稿放最後，串流時可以先把摘要等內容推給前端
     
     prompt = """
     你是一個專業的會議記錄秘書。請聆聽這段會議錄音，並完成以下兩項任務：
-    1. 產出完整的繁體中文逐字稿（Transcripts）。
-    2. 將會議內容整理成結構化記錄。
+    1. 將會議內容整理成結構化記錄。
+    2. 產出完整的繁體中文逐字稿（Transcripts）。
 
-    請依照以下 JSON Schema 回傳資料，不要包含 markdown 標記，直接回傳 JSON：
+    請依照以下 JSON Schema (欄位順序相同) 回傳資料，不要包含 markdown 標記，直接回傳 JSON：
     {
-        "transcription": "完整的會議逐字稿內容...",
         "meeting_topics": ["主題1", "主題2"],
         "participants": [
             {"name": "姓名", "role": "職稱或在會議中的職責描述"}
@@ -54,13 +128,18 @@ def analyze_audio_directly(file_path, api_key=None):
         "next_steps": [
             {"action": "具體行動項目", "owner": "負責人或協調人"}
         ],
-        "summary": "一段約 100-200 字的會議總結摘要"
+        "summary": "一段約 100-200 字的會議總結摘要",
+        "transcription": "完整的會議逐字稿內容..."
     }
     """
+    if total > 1:
+        prompt += f"\n注意：這是一場較長會議依時間切割後的第 {index + 1}/{total} 段錄音，只需整理本段內容。\n"
 
-    print("正在發送分析請求給 Gemini...")
-    try:
-        response = client.models.generate_content(
+    def stream_analysis(client):
+        # 以串流方式接收回應，邊接收邊解析出已完整的欄位
+        parser = IncrementalJSONParser()
+        parts = []
+        stream = client.models.generate_content_stream(
             model="gemini-1.5-flash", # 1.5 Flash 對多模態支援較好且快速
             contents=[
                 types.Content(
@@ -78,8 +157,26 @@ def analyze_audio_directly(file_path, api_key=None):
                 response_mime_type="application/json"
             )
         )
-        
-        result_json = json.loads(response.text)
+        for chunk in stream:
+            text = chunk.text or ""
+            if not parts:
+                emit("model_streaming", {"chunk": index + 1, "total": total})
+            parts.append(text)
+            # 多段分析時各段的部分結果會互相覆蓋，只在單段時推送
+            if total == 1:
+                for key, value in parser.feed(text):
+                    if key != "transcription":
+                        emit("partial", {"field": key, "value": value})
+        return "".join(parts)
+
+    print("正在發送分析請求給 Gemini...")
+    try:
+        with stage("generate_content"):
+            response_text = gemini.call(api_key, stream_analysis, label="generate_content_stream")
+        add_bytes("generate_content", len(response_text.encode("utf-8")))
+
+        with stage("json_parse"):
+            result_json = json.loads(response_text)
         
         # 提取逐字稿與結構化資料
         transcription = result_json.get("transcription", "")
@@ -0,0 +1,284 @@
+import bisect
+import importlib.util
+import os
+import shutil
+import subprocess
+import time
+import wave
+
+from services.metrics import registry, stage
+from services.lazy import lazy_import
+
+# 未安裝 numpy 時不做靜音裁切；實際裁切時才載入，不拖慢啟動
+np = lazy_import("numpy") if importlib.util.find_spec("numpy") else None
+
+# 靜音裁切：off 不處理 / auto 可省下至少 VAD_MIN_TRIM 比例的長度才使用裁切後的音訊
+VAD_TRIM = os.getenv("VAD_TRIM", "auto")
+VAD_MIN_TRIM = float(os.getenv("VAD_MIN_TRIM", "0.1"))
+
+# 能量門檻：背景噪音 (第 VAD_NOISE_PERCENTILE 百分位) 再高 VAD_MARGIN_DB 才算語音，
+# 但不低於 VAD_FLOOR_DB (數位靜音)，也不高於音量較大處 (第 95 百分位) 減 VAD_DYNAMIC_DB
+VAD_FRAME_MS = int(os.getenv("VAD_FRAME_MS", "30"))
+VAD_NOISE_PERCENTILE = float(os.getenv("VAD_NOISE_PERCENTILE", "10"))
+VAD_MARGIN_DB = float(os.getenv("VAD_MARGIN_DB", "10"))
+VAD_FLOOR_DB = float(os.getenv("VAD_FLOOR_DB", "-55"))
+VAD_DYNAMIC_DB = float(os.getenv("VAD_DYNAMIC_DB", "15"))
+
+# 語音前後各保留 VAD_PAD_MS；只移除比 VAD_MIN_SILENCE_SECONDS 長的靜音，短於 VAD_MIN_SPEECH_MS 的突波視為雜音
+VAD_PAD_MS = int(os.getenv("VAD_PAD_MS", "250"))
+VAD_MIN_SILENCE_SECONDS = float(os.getenv("VAD_MIN_SILENCE_SECONDS", "1.5"))
+VAD_MIN_SPEECH_MS = int(os.getenv("VAD_MIN_SPEECH_MS", "150"))
+
+# 每次讀取的 frame 數 (WAV 檔逐段計算能量，記憶體用量固定)
+READ_BLOCK_FRAMES = 1000
+
+# 接合處淡入淡出長度 (秒)，避免爆音
+FADE_SECONDS = 0.01
+
+AUDIO_TRIMMED_SECONDS = registry.counter(
+    "audio_trimmed_seconds_total", "靜音裁切移除的錄音長度 (秒)"
+)
+
+
+def decode_pcm(frames, channels, width):
+    """PCM bytes → 單聲道 float32 (-1 ~ 1)"""
+    if width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
+        samples = (raw[:, 0].astype(np.int32) | (raw[:, 1].astype(np.int32) << 8) | (raw[:, 2].astype(np.int32) << 16))
+        samples = np.where(samples >= 1 << 23, samples - (1 << 24), samples).astype(np.float32) / (1 << 23)
+    elif width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) / 128
+    else:
+        dtype = {2: np.int16, 4: np.int32}[width]
+        samples = np.frombuffer(frames, dtype=dtype).astype(np.float32) / (1 << (8 * width - 1))
+    return samples.reshape(-1, channels).mean(axis=1)
+
+
+def frame_energy_db(samples, frame):
+    """每 frame 個樣本的平均能量 (dBFS)；結尾不足一個 frame 的樣本忽略"""
+    n_frames = len(samples) // frame
+    frames = samples[: n_frames * frame].reshape(n_frames, frame)
+    # einsum 直接在原陣列上計算平方和，不另外建立整段錄音大小的暫存陣列
+    power = np.einsum("ij,ij->i", frames, frames).astype(np.float64) / frame
+    return 10 * np.log10(power + 1e-12)
+
+
+def _runs(mask):
+    """布林陣列中連續 True 的區段 → (starts, ends)，ends 不含"""
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.astype(np.int8), [0]))))
+    return edges[0::2], edges[1::2]
+
+
+def speech_regions(energy_db, frame_seconds, duration=None, margin_db=VAD_MARGIN_DB,
+                   pad_ms=VAD_PAD_MS, min_silence_seconds=VAD_MIN_SILENCE_SECONDS,
+                   min_speech_ms=VAD_MIN_SPEECH_MS):
+    """
+    依每 frame 能量找出語音區段
+    回傳: [(start_sec, end_sec), ...] (原始錄音時間，已含前後保留的靜音)；沒有語音時回傳 []
+    """
+    if len(energy_db) == 0:
+        return []
+    noise = np.percentile(energy_db, VAD_NOISE_PERCENTILE)
+    loud = np.percentile(energy_db, 95)
+    threshold = min(max(noise + margin_db, VAD_FLOOR_DB), loud - VAD_DYNAMIC_DB)
+
+    starts, ends = _runs(energy_db > threshold)
+    keep = (ends - starts) * frame_seconds * 1000 >= min_speech_ms
+    starts, ends = starts[keep], ends[keep]
+    if len(starts) == 0:
+        return []
+
+    # 前後加上保留的靜音，再合併間隔不夠長的區段
+    pad = int(round(pad_ms / 1000 / frame_seconds))
+    starts = np.maximum(starts - pad, 0)
+    ends = np.minimum(ends + pad, len(energy_db))
+    breaks = np.flatnonzero(starts[1:] - ends[:-1] >= min_silence_seconds / frame_seconds)
+    starts = np.concatenate((starts[:1], starts[breaks + 1]))
+    ends = np.concatenate((ends[breaks], ends[-1:]))
+
+    start_seconds = starts * frame_seconds
+    end_seconds = ends * frame_seconds
+    if duration is not None:
+        # 最後一個區段延伸到結尾時包含不足一個 frame 的尾端
+        end_seconds = np.where(ends == len(energy_db), duration, np.minimum(end_seconds, duration))
+    return [(round(float(s), 3), round(float(e), 3)) for s, e in zip(start_seconds, end_seconds)]
+
+
+class TimeMap:
+    """裁切後音訊的時間 → 原始錄音時間"""
+
+    def __init__(self, regions):
+        self.regions = list(regions)
+        self.offsets = []    # 各區段在裁切後音訊中的起點
+        total = 0.0
+        for start, end in self.regions:
+            self.offsets.append(total)
+            total += end - start
+        self.kept_seconds = total
+
+    def to_original(self, t):
+        if not self.regions:
+            return t
+        index = max(0, bisect.bisect_right(self.offsets, t) - 1)
+        start, end = self.regions[index]
+        return min(start + t - self.offsets[index], end)
+
+    def map_segments(self, segments):
+        """將 Whisper segments 的 start / end 換回原始錄音時間"""
+        return [
+            {**seg, "start": round(self.to_original(seg["start"]), 2), "end": round(self.to_original(seg["end"]), 2)}
+            for seg in segments
+        ]
+
+
+class TrimResult:
+    """
+    靜音裁切結果：path (檔案版) 或 audio (陣列版) 為裁切後的音訊
+    speedup 為依長度估算的加速比 (轉錄與上傳耗時大致與音訊長度成正比)
+    """
+
+    def __init__(self, time_map, original_seconds, seconds=0.0, path=None, audio=None):
+        self.time_map = time_map
+        self.original_seconds = original_seconds
+        self.seconds = seconds
+        self.path = path
+        self.audio = audio
+
+    @property
+    def kept_seconds(self):
+        return self.time_map.kept_seconds
+
+    @property
+    def trimmed_seconds(self):
+        return self.original_seconds - self.kept_seconds
+
+    @property
+    def speedup(self):
+        return self.original_seconds / self.kept_seconds if self.kept_seconds else None
+
+    def as_dict(self):
+        return {
+            "original_seconds": round(self.original_seconds, 2),
+            "kept_seconds": round(self.kept_seconds, 2),
+            "trimmed_seconds": round(self.trimmed_seconds, 2),
+            "speedup": round(self.speedup, 2) if self.speedup else None,
+            "regions": [list(r) for r in self.time_map.regions],
+            "seconds": round(self.seconds, 3),
+        }
+
+
+def _accept(regions, original_seconds, min_trim):
+    """有語音且能省下至少 min_trim 比例時才值得使用裁切結果"""
+    if not regions or original_seconds <= 0:
+        return None
+    time_map = TimeMap(regions)
+    if original_seconds - time_map.kept_seconds < original_seconds * min_trim:
+        return None
+    return time_map
+
+
+def _report(result):
+    AUDIO_TRIMMED_SECONDS.inc((), result.trimmed_seconds)
+    print(
+        f"✂️ 靜音裁切: {result.original_seconds:.0f}s → {result.kept_seconds:.0f}s "
+        f"({len(result.time_map.regions)} 段語音, 預估加速 {result.speedup:.1f}x, {result.seconds:.2f}s)"
+    )
+
+
+def trim_silence(audio, sample_rate, policy=VAD_TRIM, min_trim=VAD_MIN_TRIM):
+    """
+    陣列版 (例如 whisper.load_audio 的結果)：移除長靜音後接合各語音區段
+    不需裁切時回傳 None
+    """
+    if policy == "off" or np is None or len(audio) == 0:
+        return None
+    started = time.perf_counter()
+    with stage("silence_trim"):
+        frame = max(1, int(sample_rate * VAD_FRAME_MS / 1000))
+        original_seconds = len(audio) / sample_rate
+        regions = speech_regions(frame_energy_db(audio, frame), frame / sample_rate, original_seconds)
+        time_map = _accept(regions, original_seconds, min_trim)
+        if time_map is None:
+            return None
+
+        fade = int(sample_rate * FADE_SECONDS)
+        ramp = np.linspace(0, 1, fade, dtype=np.float32)
+        pieces = []
+        for start, end in time_map.regions:
+            piece = audio[int(start * sample_rate): int(end * sample_rate)].astype(np.float32)
+            if len(piece) > 2 * fade:
+                piece[:fade] *= ramp
+                piece[-fade:] *= ramp[::-1]
+            pieces.append(piece)
+        result = TrimResult(time_map, original_seconds, audio=np.concatenate(pieces))
+    result.seconds = time.perf_counter() - started
+    _report(result)
+    return result
+
+
+def _decode_to_wav(file_path, out_dir):
+    """非 WAV 檔以 ffmpeg 轉為 16 kHz 單聲道 WAV；沒有 ffmpeg 時回傳 None"""
+    if not shutil.which("ffmpeg"):
+        return None
+    out_path = os.path.join(out_dir, "decoded.wav")
+    subprocess.run(
+        ["ffmpeg", "-y", "-v", "error", "-i", file_path, "-vn", "-ac", "1", "-ar", "16000", "-c:a", "pcm_s16le", out_path],
+        check=True, capture_output=True,
+    )
+    return out_path
+
+
+def trim_silence_file(file_path, out_dir, policy=VAD_TRIM, min_trim=VAD_MIN_TRIM):
+    """
+    檔案版：逐段計算能量找出語音區段，直接複製這些區段的 PCM 寫成 out_dir/trimmed.wav (不重新編碼)
+    不是 WAV 時先以 ffmpeg 解碼；不需裁切或無法處理時回傳 None
+    """
+    if policy == "off" or np is None:
+        return None
+    started = time.perf_counter()
+    try:
+        with stage("silence_trim"):
+            try:
+                reader = wave.open(file_path, "rb")
+            except (wave.Error, EOFError):
+                wav_path = _decode_to_wav(file_path, out_dir)
+                if wav_path is None:
+                    return None
+                reader = wave.open(wav_path, "rb")
+
+            with reader:
+                channels, width, rate = reader.getnchannels(), reader.getsampwidth(), reader.getframerate()
+                if width not in (1, 2, 3, 4):
+                    return None
+                frame = max(1, int(rate * VAD_FRAME_MS / 1000))
+                energies = []
+                while True:
+                    frames = reader.readframes(frame * READ_BLOCK_FRAMES)
+                    if not frames:
+                        break
+                    energies.append(frame_energy_db(decode_pcm(frames, channels, width), frame))
+                original_seconds = reader.getnframes() / rate
+                energy_db = np.concatenate(energies) if energies else np.zeros(0)
+                time_map = _accept(speech_regions(energy_db, frame / rate, original_seconds), original_seconds, min_trim)
+                if time_map is None:
+                    return None
+
+                out_path = os.path.join(out_dir, "trimmed.wav")
+                with wave.open(out_path, "wb") as writer:
+                    writer.setnchannels(channels)
+                    writer.setsampwidth(width)
+                    writer.setframerate(rate)
+                    for start, end in time_map.regions:
+                        position, stop = int(start * rate), int(end * rate)
+                        reader.setpos(position)
+                        while position < stop:
+                            count = min(frame * READ_BLOCK_FRAMES, stop - position)
+                            writer.writeframes(reader.readframes(count))
+                            position += count
+    except (subprocess.CalledProcessError, OSError, wave.Error) as e:
+        print(f"⚠️ 靜音裁切失敗，改用原檔: {e}")
+        return None
+
+    result = TrimResult(time_map, original_seconds, time.perf_counter() - started, path=out_path)
+    _report(result)
+    return result
@@ -0,0 +1,125 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+# 使用後端的 db_pool (與 backend/main.py 相同的匯入方式)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from services.db_pool import ConnectionPool
+
+SCHEMA = '''
+    CREATE TABLE meetings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        filename TEXT NOT NULL,
+        transcription TEXT,
+        summary TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+def legacy_connect(db_path):
+    """原本的寫法：每次呼叫都開新連線 (rollback journal)"""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def prepare(db_path, rows):
+    conn = sqlite3.connect(db_path)
+    conn.execute(SCHEMA)
+    conn.executemany(
+        "INSERT INTO meetings (filename, transcription, summary) VALUES (?, ?, ?)",
+        [(f"meeting_{i}.wav", "逐字稿內容 " * 200, "摘要") for i in range(rows)],
+    )
+    conn.commit()
+    conn.close()
+
+def run(connect, db_path, readers, writers, seconds, rows):
+    """readers / writers 條執行緒同時存取，回傳每秒操作數與 locked 錯誤次數"""
+    counts = {"reads": 0, "writes": 0, "locked": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def reader(n):
+        done = locked = 0
+        while time.perf_counter() < deadline:
+            try:
+                conn = connect(db_path)
+                conn.execute("SELECT id, filename, created_at, summary FROM meetings ORDER BY id DESC LIMIT 20").fetchall()
+                conn.execute("SELECT * FROM meetings WHERE id = ?", ((done * 7 + n) % rows + 1,)).fetchone()
+                conn.close()
+                done += 1
+            except sqlite3.OperationalError:
+                locked += 1
+        with lock:
+            counts["reads"] += done
+            counts["locked"] += locked
+
+    def writer(n):
+        done = locked = 0
+        while time.perf_counter() < deadline:
+            try:
+                conn = connect(db_path)
+                conn.execute(
+                    "INSERT INTO meetings (filename, transcription, summary) VALUES (?, ?, ?)",
+                    (f"writer_{n}_{done}.wav", "逐字稿內容 " * 200, "摘要"),
+                )
+                conn.commit()
+                conn.close()
+                done += 1
+            except sqlite3.OperationalError:
+                locked += 1
+        with lock:
+            counts["writes"] += done
+            counts["locked"] += locked
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    return {
+        "reads_per_sec": round(counts["reads"] / seconds, 1),
+        "writes_per_sec": round(counts["writes"] / seconds, 1),
+        "locked_errors": counts["locked"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark pooled WAL connections against per-call connects')
+    parser.add_argument('--readers', type=int, default=8, help='Reader threads')
+    parser.add_argument('--writers', type=int, default=2, help='Writer threads')
+    parser.add_argument('--rows', type=int, default=2000, help='Rows to preload')
+    parser.add_argument('--seconds', type=float, default=5.0, help='Time budget per measurement')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # WAL 是寫在資料庫檔上的設定，兩種模式各用一個新檔
+        legacy_db = os.path.join(tmp, "legacy.db")
+        pooled_db = os.path.join(tmp, "pooled.db")
+        prepare(legacy_db, args.rows)
+        prepare(pooled_db, args.rows)
+
+        legacy = run(legacy_connect, legacy_db, args.readers, args.writers, args.seconds, args.rows)
+        print(json.dumps({"legacy": legacy}), file=sys.stderr)
+
+        pool = ConnectionPool(pooled_db, size=args.readers + args.writers, row_factory=sqlite3.Row)
+        pooled = run(lambda _: pool.connect(), pooled_db, args.readers, args.writers, args.seconds, args.rows)
+        pool.close_all()
+
+    total = lambda r: r["reads_per_sec"] + r["writes_per_sec"]
+    print(json.dumps({
+        "readers": args.readers,
+        "writers": args.writers,
+        "legacy": legacy,
+        "pooled_wal": pooled,
+        "speedup": round(total(pooled) / max(total(legacy), 0.1), 2),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+# 使用後端的 doc_gen (與 backend/main.py 相同的匯入方式)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from services.doc_gen import generate_meeting_minutes, generate_meeting_minutes_docx
+
+def make_meeting(key_points, action_items):
+    """產生一份有大量重點與行動項目的假會議資料"""
+    return {
+        "filename": "board_meeting.wav",
+        "meeting_topics": [f"議題 {i}" for i in range(20)],
+        "participants": [{"name": f"與會者 {i}", "role": "董事"} for i in range(30)],
+        "key_points": [
+            {"title": f"重點 {i}", "content": f"第 {i} 項重點的詳細說明，包含背景與決議內容。" * 3}
+            for i in range(key_points)
+        ],
+        "next_steps": [{"action": f"行動項目 {i}", "owner": f"負責人 {i % 7}"} for i in range(action_items)],
+        "summary": "本次會議討論多項議題並作成決議。" * 10,
+    }
+
+def measure(fn, data, seconds):
+    """在 seconds 秒內重複生成，回傳 docs/sec 與平均耗時"""
+    fn(data)  # 暖機 (範本引擎第一次呼叫會建立範本)
+    count = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        fn(data)
+        count += 1
+    elapsed = time.perf_counter() - started
+    return {"docs_per_sec": round(count / elapsed, 2), "avg_ms": round(elapsed / count * 1000, 2)}
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Word generation')
+    parser.add_argument('--sizes', default="10,100,300,1000", help='Comma separated key point / action item counts')
+    parser.add_argument('--seconds', type=float, default=3.0, help='Time budget per measurement')
+    args = parser.parse_args()
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        data = make_meeting(size, size)
+        legacy = measure(generate_meeting_minutes_docx, data, args.seconds)
+        template = measure(generate_meeting_minutes, data, args.seconds)
+        results.append({
+            "key_points": size,
+            "action_items": size,
+            "python_docx": legacy,
+            "template": template,
+            "speedup": round(template["docs_per_sec"] / legacy["docs_per_sec"], 2),
+        })
+        print(json.dumps(results[-1], ensure_ascii=False), file=sys.stderr)
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
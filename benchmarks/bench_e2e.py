@@ -0,0 +1,373 @@
+import argparse
+import array
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from fake_gemini import FakeGemini, FakeGeminiConfig
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+SAMPLE_RATE = 16000
+
+# 影響後端吞吐量的設定，一併寫入結果以便跨 commit 比較
+SERVER_ENV_PREFIXES = ("GEMINI_", "JOB_", "DB_", "ANALYSIS_CACHE_", "DETAIL_CACHE_", "EXPORT_")
+
+
+# --- 合成音訊 ---
+def _speech_block(rng, seconds=1.0):
+    """類似語音的一秒：數個諧波、音量起伏加上雜訊"""
+    base = rng.uniform(110, 260)
+    samples = array.array("h")
+    for n in range(int(SAMPLE_RATE * seconds)):
+        t = n / SAMPLE_RATE
+        envelope = 0.5 + 0.5 * math.sin(2 * math.pi * 4 * t)
+        value = sum(math.sin(2 * math.pi * base * k * t) / k for k in (1, 2, 3))
+        samples.append(int(max(-1.0, min(1.0, 0.3 * envelope * value + rng.gauss(0, 0.02))) * 32767))
+    return samples.tobytes()
+
+
+def _silence_block(rng, seconds=1.0):
+    return array.array("h", (int(rng.gauss(0, 60)) for _ in range(int(SAMPLE_RATE * seconds)))).tobytes()
+
+
+class WavFactory:
+    """預先產生少量語音 / 靜音片段，再依 seed 組合成指定長度的 WAV (每個檔案內容不同)"""
+
+    def __init__(self, seed=0, variants=6):
+        rng = random.Random(seed)
+        self.speech = [_speech_block(rng) for _ in range(variants)]
+        self.silence = [_silence_block(rng) for _ in range(2)]
+
+    def write(self, path, seconds, seed, speech_ratio=0.8):
+        rng = random.Random(seed)
+        with wave.open(path, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(SAMPLE_RATE)
+            # 第一秒包含 seed，確保雜湊不同 (不會命中分析快取)
+            w.writeframes(_silence_block(rng))
+            for _ in range(max(0, int(seconds) - 1)):
+                blocks = self.speech if rng.random() < speech_ratio else self.silence
+                w.writeframes(rng.choice(blocks))
+        return path
+
+
+# --- 統計 ---
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self._lock = threading.Lock()
+        self.started = None
+        self.finished = None
+
+    def add(self, seconds, ok=True):
+        with self._lock:
+            if ok:
+                self.latencies.append(seconds)
+            else:
+                self.errors += 1
+
+    def summary(self):
+        values = sorted(self.latencies)
+        elapsed = (self.finished or time.perf_counter()) - (self.started or time.perf_counter())
+
+        def ms(value):
+            return round(value * 1000, 2) if value is not None else None
+
+        return {
+            "count": len(values),
+            "errors": self.errors,
+            "rps": round(len(values) / elapsed, 2) if elapsed > 0 else None,
+            "p50_ms": ms(percentile(values, 50)),
+            "p95_ms": ms(percentile(values, 95)),
+            "p99_ms": ms(percentile(values, 99)),
+            "max_ms": ms(values[-1] if values else None),
+        }
+
+
+def run_phase(name, tasks, concurrency, fn):
+    """以 concurrency 個執行緒執行 fn(task)，fn 回傳 [(recorder 名稱, 秒數, 是否成功), ...]"""
+    recorders = {}
+    lock = threading.Lock()
+
+    def worker(task):
+        for key, seconds, ok in fn(task):
+            with lock:
+                recorder = recorders.setdefault(key, Recorder())
+                if recorder.started is None:
+                    recorder.started = phase_started
+            recorder.add(seconds, ok)
+
+    phase_started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, tasks))
+    finished = time.perf_counter()
+
+    results = {}
+    for key, recorder in recorders.items():
+        recorder.finished = finished
+        results[key] = recorder.summary()
+        print(f"{name}/{key}: {json.dumps(results[key])}", file=sys.stderr)
+    return results
+
+
+def timed(client, method, url, **kwargs):
+    started = time.perf_counter()
+    try:
+        response = client.request(method, url, **kwargs)
+        response.read()
+        return response, time.perf_counter() - started, response.status_code < 400
+    except httpx.HTTPError:
+        return None, time.perf_counter() - started, False
+
+
+# --- 後端程序 ---
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, work_dir, gemini_url):
+    env = dict(os.environ)
+    env.update({
+        "GEMINI_API_KEY": "bench-key",
+        "GEMINI_BASE_URL": gemini_url,
+        "MEETINGS_DB_PATH": os.path.join(work_dir, "meetings.db"),
+        "UPLOAD_DIR": os.path.join(work_dir, "uploads"),
+        "DOWNLOAD_DIR": os.path.join(work_dir, "downloads"),
+    })
+    log = open(os.path.join(work_dir, "server.log"), "w")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"後端啟動失敗，請查看 {log.name}")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("後端啟動逾時")
+
+
+def peak_rss_mb(pid):
+    """程序目前為止的最大 RSS (Linux 的 VmHWM)；無法取得時回傳 None"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# --- 測試流程 ---
+def upload_and_wait(base, path, timeout):
+    """上傳並以 SSE 等待工作完成；回傳 (接受上傳耗時, 完成耗時, 是否成功, meeting_id)"""
+    with httpx.Client(base_url=base, timeout=timeout) as client:
+        started = time.perf_counter()
+        with open(path, "rb") as f:
+            response, accept_seconds, ok = timed(
+                client, "POST", "/api/upload", files={"file": (os.path.basename(path), f, "audio/wav")}
+            )
+        if not ok:
+            return accept_seconds, None, False, None
+        job = response.json()
+        if job["status"] == "done":
+            return accept_seconds, time.perf_counter() - started, True, job.get("meeting_id")
+
+        event = None
+        with client.stream("GET", f"/api/jobs/{job['id']}/events") as stream:
+            for line in stream.iter_lines():
+                if line.startswith("event:"):
+                    event = line.split(":", 1)[1].strip()
+                elif line.startswith("data:") and event in ("done", "failed"):
+                    data = json.loads(line.split(":", 1)[1])
+                    return accept_seconds, time.perf_counter() - started, event == "done", data.get("meeting_id")
+        return accept_seconds, time.perf_counter() - started, False, None
+
+
+def run_benchmark(args):
+    work_dir = tempfile.mkdtemp(prefix="bench_e2e_")
+    config = FakeGeminiConfig(
+        upload_ms=args.upload_ms, processing_ms=args.processing_ms, ttfb_ms=args.ttfb_ms,
+        stream_ms=args.stream_ms, response_kb=args.response_kb,
+    )
+    fake = FakeGemini(config).start()
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    proc = None
+    try:
+        # 1. 合成錄音
+        durations = [int(d) for d in args.durations.split(",")]
+        factory = WavFactory(seed=args.seed)
+        audio_dir = os.path.join(work_dir, "audio")
+        os.makedirs(audio_dir)
+        files = [
+            factory.write(os.path.join(audio_dir, f"meeting_{i:03d}_{durations[i % len(durations)]}s.wav"),
+                          durations[i % len(durations)], seed=args.seed * 100000 + i)
+            for i in range(args.uploads)
+        ]
+        audio_mb = sum(os.path.getsize(p) for p in files) / (1024 * 1024)
+        print(f"已產生 {len(files)} 個錄音 ({audio_mb:.1f} MB)", file=sys.stderr)
+
+        proc = start_server(port, work_dir, fake.base_url)
+        idle_rss = peak_rss_mb(proc.pid)
+        results = {}
+        meeting_ids = []
+
+        # 2. 上傳 → 等待分析完成
+        def upload_task(path):
+            accept, total, ok, meeting_id = upload_and_wait(base, path, args.timeout)
+            if meeting_id:
+                meeting_ids.append(meeting_id)
+            return [("accept", accept, ok), ("end_to_end", total or 0, ok)]
+
+        results["upload"] = run_phase("upload", files, args.concurrency, upload_task)
+        if not meeting_ids:
+            raise RuntimeError(f"沒有任何上傳成功，請查看 {os.path.join(work_dir, 'server.log')}")
+
+        client = httpx.Client(base_url=base, timeout=args.timeout,
+                              limits=httpx.Limits(max_connections=args.concurrency * 2))
+
+        # 3. 會議列表 / 詳細資料
+        def meetings_task(i):
+            if i % 2 == 0:
+                _, seconds, ok = timed(client, "GET", "/api/meetings", params={"limit": 20})
+                return [("list", seconds, ok)]
+            _, seconds, ok = timed(client, "GET", f"/api/meetings/{meeting_ids[i % len(meeting_ids)]}")
+            return [("detail", seconds, ok)]
+
+        results["meetings"] = run_phase("meetings", range(args.requests), args.concurrency, meetings_task)
+
+        # 4. 下載 Word：第一次需生成 (cold)，之後使用磁碟快取 / 304 (warm)
+        def download_task(meeting_id):
+            _, seconds, ok = timed(client, "GET", f"/api/meetings/{meeting_id}/document")
+            return [("document", seconds, ok)]
+
+        results["download_cold"] = run_phase("download_cold", list(meeting_ids), args.concurrency, download_task)
+        warm = [meeting_ids[i % len(meeting_ids)] for i in range(args.requests)]
+        results["download_warm"] = run_phase("download_warm", warm, args.concurrency, download_task)
+        client.close()
+
+        return {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "config": {
+                "uploads": args.uploads,
+                "durations": durations,
+                "audio_mb": round(audio_mb, 1),
+                "concurrency": args.concurrency,
+                "requests": args.requests,
+                "fake_gemini": config.as_dict(),
+                "server_env": {k: v for k, v in os.environ.items() if k.startswith(SERVER_ENV_PREFIXES)},
+            },
+            "results": results,
+            "gemini_requests": dict(fake.requests),
+            "server": {"idle_rss_mb": idle_rss, "peak_rss_mb": peak_rss_mb(proc.pid)},
+        }
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        fake.stop()
+        if args.keep:
+            print(f"保留暫存目錄: {work_dir}", file=sys.stderr)
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def compare(current, baseline_path):
+    """與先前的結果比較 p95 與 rps，回傳最大的退步比例 (%)"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    worst = 0.0
+    print(f"\n比較基準: {baseline.get('commit')} → {current.get('commit')}", file=sys.stderr)
+    for phase, metrics in current["results"].items():
+        for key, summary in metrics.items():
+            old = baseline.get("results", {}).get(phase, {}).get(key)
+            if not old or not old.get("p95_ms") or not summary.get("p95_ms"):
+                continue
+            p95_change = (summary["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100
+            rps_change = ((summary["rps"] or 0) - (old["rps"] or 0)) / (old["rps"] or 1) * 100
+            worst = max(worst, p95_change, -rps_change)
+            print(f"  {phase}/{key}: p95 {old['p95_ms']} → {summary['p95_ms']} ms ({p95_change:+.1f}%), "
+                  f"rps {old['rps']} → {summary['rps']} ({rps_change:+.1f}%)", file=sys.stderr)
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline end-to-end benchmark with a fake Gemini backend')
+    parser.add_argument('--uploads', type=int, default=8, help='Number of synthetic recordings to upload')
+    parser.add_argument('--durations', default="30,120,600", help='Comma separated recording lengths (seconds)')
+    parser.add_argument('--concurrency', type=int, default=4, help='Concurrent clients')
+    parser.add_argument('--requests', type=int, default=400, help='Requests per read phase (meetings / download)')
+    parser.add_argument('--timeout', type=float, default=600, help='Per request / job timeout (seconds)')
+    parser.add_argument('--upload-ms', type=float, default=200, help='Fake Gemini file upload latency')
+    parser.add_argument('--processing-ms', type=float, default=500, help='Fake Gemini PROCESSING duration')
+    parser.add_argument('--ttfb-ms', type=float, default=800, help='Fake Gemini time to first streamed chunk')
+    parser.add_argument('--stream-ms', type=float, default=1500, help='Fake Gemini streaming duration')
+    parser.add_argument('--response-kb', type=int, default=0, help='Transcript size; 0 = proportional to audio length')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help='Write JSON results to this file')
+    parser.add_argument('--compare', help='Previous results JSON to compare against')
+    parser.add_argument('--max-regression', type=float, help='Exit 1 if p95 / rps regress by more than this percent')
+    parser.add_argument('--keep', action='store_true', help='Keep the temporary work directory (DB, server log)')
+    args = parser.parse_args()
+
+    result = run_benchmark(args)
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+    if args.compare:
+        worst = compare(result, args.compare)
+        if args.max_regression is not None and worst > args.max_regression:
+            print(f"❌ 效能退步 {worst:.1f}% (上限 {args.max_regression}%)", file=sys.stderr)
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+import argparse
+import itertools
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+# 假逐字稿的句子 (重複組合成指定長度)
+SENTENCES = (
+    "主席：我們先確認上次會議的待辦事項進度。",
+    "王經理：系統上線時程預計延後一週，主要是測試環境尚未準備完成。",
+    "李工程師：資料庫遷移已完成八成，剩下的部分本週可以處理完。",
+    "主席：請大家在下週三前回報各自負責項目的狀態。",
+)
+
+
+class FakeGeminiConfig:
+    """
+    假 Gemini 服務的延遲與回應大小設定 (毫秒 / 位元組)
+    - upload_ms + 檔案大小 / upload_mbps：上傳檔案的耗時
+    - processing_ms：上傳完成後檔案維持 PROCESSING 狀態的時間
+    - ttfb_ms：送出第一個串流片段前的等待；stream_ms 平均分配在 stream_chunks 個片段之間
+    - response_kb：逐字稿大小；0 表示依錄音長度 (chars_per_second) 推算
+    """
+
+    def __init__(self, upload_ms=200, upload_mbps=50.0, processing_ms=500, ttfb_ms=800,
+                 stream_ms=1500, stream_chunks=20, response_kb=0, chars_per_second=6):
+        self.upload_ms = upload_ms
+        self.upload_mbps = upload_mbps
+        self.processing_ms = processing_ms
+        self.ttfb_ms = ttfb_ms
+        self.stream_ms = stream_ms
+        self.stream_chunks = stream_chunks
+        self.response_kb = response_kb
+        self.chars_per_second = chars_per_second
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+def fake_transcript(chars):
+    parts = []
+    size = 0
+    for sentence in itertools.cycle(SENTENCES):
+        if size >= chars:
+            break
+        parts.append(sentence)
+        size += len(sentence)
+    return "\n".join(parts)
+
+
+def fake_analysis(audio_bytes, config):
+    """產生與正式 prompt 相同 schema 的回應 JSON (逐字稿放最後)"""
+    if config.response_kb:
+        # 中文每字 3 bytes (UTF-8)
+        chars = config.response_kb * 1024 // 3
+    else:
+        # 假設為 16kHz / 16-bit 單聲道 WAV
+        chars = int(audio_bytes / 32000 * config.chars_per_second)
+    return json.dumps({
+        "meeting_topics": ["系統上線時程", "資料庫遷移"],
+        "participants": [{"name": "王經理", "role": "專案負責人"}, {"name": "李工程師", "role": "後端開發"}],
+        "key_points": [{"title": "上線延後", "content": "測試環境尚未準備完成，上線延後一週。"}],
+        "next_steps": [{"action": "完成資料庫遷移", "owner": "李工程師"}],
+        "summary": "會議確認系統上線延後一週，資料庫遷移本週完成。",
+        "transcription": fake_transcript(max(chars, 1)),
+    }, ensure_ascii=False)
+
+
+class FakeGemini:
+    """
+    本地的 Gemini API 替身 (google-genai SDK 以 GEMINI_BASE_URL 指向此服務)
+    支援 files.upload (resumable)、files.get、generateContent 與 streamGenerateContent (SSE)
+    """
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.config = config or FakeGeminiConfig()
+        self._files = {}         # name -> {"size": ..., "ready_at": ...}
+        self._uploads = {}       # upload_id -> {"received": 已收到的位元組數, "mime_type": ...}
+        self._lock = threading.Lock()
+        self.requests = {}       # 各 API 的呼叫次數
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-gemini", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _count(self, name):
+        with self._lock:
+            self.requests[name] = self.requests.get(name, 0) + 1
+
+    def _file_json(self, name):
+        info = self._files[name]
+        state = "ACTIVE" if time.monotonic() >= info["ready_at"] else "PROCESSING"
+        return {
+            "name": name,
+            "uri": f"{self.base_url}/v1beta/{name}",
+            "mimeType": info["mime_type"],
+            "sizeBytes": str(info["size"]),
+            "state": state,
+        }
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _read_body(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                return self.rfile.read(length) if length else b""
+
+            def _send_json(self, data, headers=None, status=200):
+                body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=UTF-8")
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                path = urlparse(self.path).path
+                name = path.split("/v1beta/", 1)[-1]
+                if name in fake._files:
+                    fake._count("files.get")
+                    return self._send_json(fake._file_json(name))
+                self._send_json({"error": {"code": 404, "message": "not found"}}, status=404)
+
+            def do_POST(self):
+                parsed = urlparse(self.path)
+                command = self.headers.get("X-Goog-Upload-Command", "")
+                if parsed.path.endswith("/files") and command == "start":
+                    return self._start_upload()
+                if "upload_id=" in parsed.query:
+                    return self._upload_chunk(parsed.query.split("upload_id=", 1)[1].split("&")[0], command)
+                if parsed.path.endswith(":streamGenerateContent"):
+                    return self._generate(stream=True)
+                if parsed.path.endswith(":generateContent"):
+                    return self._generate(stream=False)
+                self._send_json({"error": {"code": 404, "message": f"unknown path {parsed.path}"}}, status=404)
+
+            def _start_upload(self):
+                body = json.loads(self._read_body() or b"{}")
+                upload_id = uuid.uuid4().hex
+                with fake._lock:
+                    fake._uploads[upload_id] = {"received": 0, "mime_type": body.get("file", {}).get("mimeType", "audio/wav")}
+                self._send_json({}, headers={
+                    "X-Goog-Upload-URL": f"{fake.base_url}/upload/v1beta/files?upload_id={upload_id}",
+                    "X-Goog-Upload-Status": "active",
+                })
+
+            def _upload_chunk(self, upload_id, command):
+                chunk = self._read_body()
+                with fake._lock:
+                    upload = fake._uploads[upload_id]
+                    upload["received"] += len(chunk)
+                if "finalize" not in command:
+                    return self._send_json({}, headers={"X-Goog-Upload-Status": "active"})
+
+                config = fake.config
+                size = upload["received"]
+                time.sleep(config.upload_ms / 1000 + size / (config.upload_mbps * 1024 * 1024))
+                name = f"files/{upload_id[:12]}"
+                with fake._lock:
+                    fake._uploads.pop(upload_id, None)
+                    fake._files[name] = {
+                        "size": size,
+                        "mime_type": upload["mime_type"],
+                        "ready_at": time.monotonic() + config.processing_ms / 1000,
+                    }
+                fake._count("files.upload")
+                self._send_json({"file": fake._file_json(name)}, headers={"X-Goog-Upload-Status": "final"})
+
+            def _generate(self, stream):
+                body = json.loads(self._read_body() or b"{}")
+                # 由請求中的檔案 URI 找到音訊大小，決定逐字稿長度
+                audio_bytes = 0
+                for content in body.get("contents", []):
+                    for part in content.get("parts", []):
+                        file_data = part.get("fileData") or part.get("file_data") or {}
+                        uri = file_data.get("fileUri") or file_data.get("file_uri") or ""
+                        name = uri.split("/v1beta/", 1)[-1]
+                        if name in fake._files:
+                            audio_bytes = fake._files[name]["size"]
+
+                config = fake.config
+                if audio_bytes:
+                    text = fake_analysis(audio_bytes, config)
+                else:
+                    # 純文字請求 (例如多段摘要整合)
+                    text = "整合後的會議摘要。"
+                time.sleep(config.ttfb_ms / 1000)
+
+                if not stream:
+                    fake._count("generateContent")
+                    return self._send_json(self._candidate(text))
+
+                fake._count("streamGenerateContent")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                pieces = max(1, config.stream_chunks)
+                step = -(-len(text) // pieces)
+                for start in range(0, len(text), step):
+                    event = "data: " + json.dumps(self._candidate(text[start:start + step]), ensure_ascii=False) + "\r\n\r\n"
+                    self._write_chunk(event.encode("utf-8"))
+                    time.sleep(config.stream_ms / 1000 / pieces)
+                self._write_chunk(b"")
+
+            def _write_chunk(self, data):
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            def _candidate(self, text):
+                return {
+                    "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}],
+                    "modelVersion": "fake-gemini",
+                }
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the Gemini API")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--upload-ms", type=float, default=200)
+    parser.add_argument("--processing-ms", type=float, default=500)
+    parser.add_argument("--ttfb-ms", type=float, default=800)
+    parser.add_argument("--stream-ms", type=float, default=1500)
+    parser.add_argument("--response-kb", type=int, default=0, help="Transcript size; 0 = proportional to audio length")
+    args = parser.parse_args()
+
+    config = FakeGeminiConfig(
+        upload_ms=args.upload_ms, processing_ms=args.processing_ms, ttfb_ms=args.ttfb_ms,
+        stream_ms=args.stream_ms, response_kb=args.response_kb,
+    )
+    fake = FakeGemini(config, port=args.port).start()
+    print(f"Fake Gemini listening on {fake.base_url} (set GEMINI_BASE_URL to this address)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
+
+if __name__ == "__main__":
+    main()
@@ -18,14 +18,19 @@ document.addEventListener('DOMContentLoaded', function() {
     uploadForm.addEventListener('submit', handleUpload);
 });
 
-async function loadHistory() {
+async function loadHistory(cursor = null) {
     try {
-        const response = await fetch(`${API_BASE}/meetings`);
+        const url = cursor ? `${API_BASE}/meetings?cursor=${encodeURIComponent(cursor)}` : `${API_BASE}/meetings`;
+        const response = await fetch(url);
         const meetings = await response.json();
+        const nextCursor = response.headers.get('X-Next-Cursor');
         const list = document.getElementById('history-list');
-        list.innerHTML = '';
+        if (!cursor) {
+            list.innerHTML = '';
+        }
+        document.getElementById('history-more')?.remove();
 
-        if (meetings.length === 0) {
+        if (!cursor && meetings.length === 0) {
             list.innerHTML = '<div class="text-center py-3 text-muted small">無記錄</div>';
             return;
         }
@@ -52,6 +57,20 @@ async function loadHistory() {
             `;
             list.appendChild(item);
         });
+
+        // 還有更多記錄時顯示「載入更多」
+        if (nextCursor) {
+            const more = document.createElement('a');
+            more.id = 'history-more';
+            more.className = 'list-group-item list-group-item-action text-center small text-primary';
+            more.href = '#';
+            more.innerText = '載入更多';
+            more.onclick = (e) => {
+                e.preventDefault();
+                loadHistory(nextCursor);
+            };
+            list.appendChild(more);
+        }
     } catch (err) {
         console.error("Failed to load history:", err);
     }
@@ -136,15 +155,8 @@ async function loadMeetingDetails(id) {
             nsTableBody.innerHTML = '<tr><td colspan="2" class="text-center text-muted">無待辦事項</td></tr>';
         }
 
-        // Download Link
-        if (data.doc_url) {
-            // 如果 API 直接回傳了下載網址 (例如上傳成功時)
-             document.getElementById('download-btn').href = `http://localhost:8000${data.doc_url}`;
-        } else {
-            // 否則組裝下載網址
-            const filenameNoExt = data.filename.replace(/\.[^/.]+$/, "");
-            document.getElementById('download-btn').href = `http://localhost:8000/api/download/Meeting_${filenameNoExt}.docx`;
-        }
+        // Download Link (Word 於下載時即時生成並快取)
+        document.getElementById('download-btn').href = `${API_BASE}/meetings/${data.id}/document`;
 
     } catch (err) {
         console.error(err);
@@ -164,34 +176,20 @@ async function handleUpload(e) {
     statusText.innerText = '正在上傳檔案...';
     progressBar.style.width = '10%';
 
-    let interval;
-
     try {
-        // 模擬進度條
-        let progress = 10;
-        interval = setInterval(() => {
-            if (progress < 90) {
-                progress += 5;
-                progressBar.style.width = `${progress}%`;
-                if (progress > 30) statusText.innerText = '正在進行語音轉錄 (Whisper)...';
-                if (progress > 60) statusText.innerText = '正在進行 AI 結構化分析 (Gemini)...';
-            }
-        }, 2000);
-
-        // 注意：改成呼叫 FastAPI
+        // 注意：改成呼叫 FastAPI (上傳後立即回傳 job，再輪詢處理進度)
         const response = await fetch(`${API_BASE}/upload`, {
             method: 'POST',
             body: formData
         });
-
-        clearInterval(interval);
         
         if (!response.ok) {
             const errData = await response.json();
             throw new Error(errData.detail || 'Upload failed');
         }
 
-        const result = await response.json();
+        const job = await response.json();
+        const result = await waitForJob(job.id, progressBar, statusText);
         progressBar.style.width = '100%';
         progressBar.classList.remove('progress-bar-animated');
         progressBar.classList.add('bg-success');
@@ -208,14 +206,91 @@ async function handleUpload(e) {
             submitBtn.disabled = false;
             
             loadHistory();
-            loadMeetingDetails(result.id);
+            loadMeetingDetails(result.meeting_id);
         }, 1000);
 
     } catch (err) {
-        clearInterval(interval); // 確保清除 timer
         statusText.innerText = `錯誤: ${err.message}`;
         statusText.classList.add('text-danger');
         progressBar.classList.add('bg-danger');
         submitBtn.disabled = false;
     }
 }
+
+// 各階段的顯示文字
+const STAGE_LABELS = {
+    queued: '排隊等待處理中...',
+    stored: '檔案已儲存...',
+    analyzing: '正在進行 AI 語音分析 (Gemini)...',
+    saving: '正在儲存資料...',
+    done: '處理完成！'
+};
+
+// 以 SSE 接收背景工作進度 (含 AI 串流中的部分結果)；不支援或連線中斷時改為輪詢
+function waitForJob(jobId, progressBar, statusText) {
+    if (!window.EventSource) {
+        return pollJob(jobId, progressBar, statusText);
+    }
+
+    return new Promise((resolve, reject) => {
+        const source = new EventSource(`${API_BASE}/jobs/${jobId}/events`);
+
+        source.addEventListener('stage', (e) => {
+            const data = JSON.parse(e.data);
+            progressBar.style.width = `${Math.max(data.progress, 10)}%`;
+            statusText.innerText = STAGE_LABELS[data.stage] || data.stage;
+        });
+        source.addEventListener('analysis_shared', () => {
+            statusText.innerText = '相同錄音正在分析中，完成後將共用結果...';
+        });
+        source.addEventListener('silence_trimmed', (e) => {
+            const data = JSON.parse(e.data);
+            statusText.innerText = `已移除 ${Math.round(data.trimmed_seconds)} 秒靜音 (預估加速 ${data.speedup}x)...`;
+        });
+        source.addEventListener('audio_compressed', (e) => {
+            const data = JSON.parse(e.data);
+            const mb = (bytes) => (bytes / 1048576).toFixed(1);
+            statusText.innerText = `音訊已壓縮 ${mb(data.original_bytes)} MB → ${mb(data.output_bytes)} MB，正在上傳...`;
+        });
+        source.addEventListener('model_streaming', () => {
+            statusText.innerText = 'AI 正在產生分析結果...';
+        });
+        source.addEventListener('partial', (e) => {
+            const data = JSON.parse(e.data);
+            if (data.field === 'summary' && data.value) {
+                statusText.innerText = `摘要：${data.value.substring(0, 60)}...`;
+            }
+        });
+        source.addEventListener('done', (e) => {
+            source.close();
+            resolve(JSON.parse(e.data));
+        });
+        source.addEventListener('failed', (e) => {
+            source.close();
+            reject(new Error(JSON.parse(e.data).error || 'Processing failed'));
+        });
+        source.onerror = () => {
+            source.close();
+            pollJob(jobId, progressBar, statusText).then(resolve, reject);
+        };
+    });
+}
+
+// 輪詢背景工作狀態，直到完成或失敗
+async function pollJob(jobId, progressBar, statusText) {
+    while (true) {
+        const response = await fetch(`${API_BASE}/jobs/${jobId}`);
+        if (!response.ok) {
+            throw new Error('無法取得處理進度');
+        }
+        const job = await response.json();
+
+        progressBar.style.width = `${Math.max(job.progress, 10)}%`;
+        statusText.innerText = STAGE_LABELS[job.stage] || job.stage;
+
+        if (job.status === 'done') return job;
+        if (job.status === 'failed') throw new Error(job.error || 'Processing failed');
+
+        await new Promise(resolve => setTimeout(resolve, 2000));
+    }
+}
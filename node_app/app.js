@@ -2,6 +2,7 @@ const express = require('express');
 const multer = require('multer');
 const path = require('path');
 const { spawn } = require('child_process');
+const readline = require('readline');
 const db = require('./database');
 const fs = require('fs');
 require('dotenv').config();
@@ -21,6 +22,119 @@ app.use('/uploads', express.static(path.join(__dirname, 'uploads')));
 // 設定上傳
 const upload = multer({ dest: 'node_app/uploads/' });
 
+// --- 常駐 Python worker ---
+// process_meeting.py 以 --serve 模式常駐，模型與套件只載入一次；
+// 以換行分隔的 JSON 溝通，每筆請求帶 id 以對應回應
+
+// 單筆請求的逾時 (長錄音的轉錄可能需要數分鐘)
+const WORKER_REQUEST_TIMEOUT_MS = parseInt(process.env.WORKER_REQUEST_TIMEOUT_MS || '1800000', 10);
+// worker 結束後重新啟動的等待時間：由 1 秒起每次加倍，最多 60 秒；穩定執行超過 60 秒後重設
+const WORKER_RESTART_MIN_MS = 1000;
+const WORKER_RESTART_MAX_MS = 60000;
+const WORKER_STABLE_MS = 60000;
+// worker 重新啟動期間最多排隊的請求數，超過時直接回報失敗
+const WORKER_MAX_QUEUED = parseInt(process.env.WORKER_MAX_QUEUED || '100', 10);
+
+const pythonWorker = {
+    proc: null,
+    nextId: 1,
+    pending: new Map(),   // 已送給目前 worker 的請求: id -> { line, callback, timer }
+    queued: new Map(),    // worker 重新啟動期間收到的請求，啟動後依序送出
+    restartDelay: WORKER_RESTART_MIN_MS,
+    startedAt: 0,
+
+    start() {
+        const proc = spawn('python3', [
+            path.join(__dirname, 'python_scripts', 'process_meeting.py'),
+            '--serve'
+        ]);
+        this.proc = proc;
+        this.startedAt = Date.now();
+
+        readline.createInterface({ input: proc.stdout }).on('line', (line) => {
+            let response;
+            try {
+                response = JSON.parse(line);
+            } catch (e) {
+                console.error("Invalid worker output:", line);
+                return;
+            }
+            const entry = this.pending.get(response.id);
+            if (entry) {
+                this.pending.delete(response.id);
+                clearTimeout(entry.timer);
+                entry.callback(null, response);
+            }
+        });
+
+        proc.stderr.on('data', (data) => {
+            console.error(`Python Stderr: ${data}`);
+        });
+
+        // worker 結束後寫入 stdin 會產生 EPIPE；沒有 error listener 時會讓整個 Node 程序崩潰
+        proc.stdin.on('error', (err) => {
+            console.error(`Python worker stdin error: ${err.message}`);
+        });
+        proc.on('error', (err) => this.handleExit(proc, `failed: ${err.message}`));
+        proc.on('close', (code) => this.handleExit(proc, `exited with code ${code}`));
+
+        for (const [id, entry] of this.queued) {
+            this.send(id, entry);
+        }
+        this.queued.clear();
+    },
+
+    handleExit(proc, reason) {
+        // 同一個 process 的 error 與 close 只處理一次
+        if (this.proc !== proc) {
+            return;
+        }
+        this.proc = null;
+
+        // 未完成的請求一律回報失敗；之後收到的請求排隊等待新的 worker
+        const error = new Error(`Python worker ${reason}`);
+        for (const entry of this.pending.values()) {
+            clearTimeout(entry.timer);
+            entry.callback(error);
+        }
+        this.pending.clear();
+
+        // 啟動後很快就結束 (例如缺少套件) 時逐次拉長重啟間隔，避免不斷重啟
+        if (Date.now() - this.startedAt > WORKER_STABLE_MS) {
+            this.restartDelay = WORKER_RESTART_MIN_MS;
+        }
+        console.error(`Python worker ${reason}, restarting in ${this.restartDelay} ms...`);
+        setTimeout(() => this.start(), this.restartDelay);
+        this.restartDelay = Math.min(this.restartDelay * 2, WORKER_RESTART_MAX_MS);
+    },
+
+    send(id, entry) {
+        this.pending.set(id, entry);
+        this.proc.stdin.write(entry.line);
+    },
+
+    request(payload, callback) {
+        const id = this.nextId++;
+        const entry = { line: JSON.stringify({ id, ...payload }) + '\n', callback, timer: null };
+        entry.timer = setTimeout(() => {
+            if (this.pending.delete(id) || this.queued.delete(id)) {
+                callback(new Error(`Python worker request timed out after ${WORKER_REQUEST_TIMEOUT_MS} ms`));
+            }
+        }, WORKER_REQUEST_TIMEOUT_MS);
+
+        if (this.proc) {
+            this.send(id, entry);
+        } else if (this.queued.size < WORKER_MAX_QUEUED) {
+            this.queued.set(id, entry);
+        } else {
+            clearTimeout(entry.timer);
+            callback(new Error('Python worker is restarting and the request queue is full'));
+        }
+    }
+};
+
+pythonWorker.start();
+
 // 首頁
 app.get('/', (req, res) => {
     res.render('index');
@@ -75,42 +189,27 @@ app.post('/api/upload', upload.single('audio'), (req, res) => {
         return res.status(500).json({ error: 'Gemini API Key not configured' });
     }
 
-    // 呼叫 Python 腳本
-    const pythonProcess = spawn('python3', [
-        path.join(__dirname, 'python_scripts', 'process_meeting.py'),
-        filePath,
-        '--api_key', apiKey,
-        '--output_dir', path.join(__dirname, 'public', 'downloads') // Word 檔存到這裡供下載
-    ]);
-
     // 確保下載目錄存在
     const downloadDir = path.join(__dirname, 'public', 'downloads');
     if (!fs.existsSync(downloadDir)){
         fs.mkdirSync(downloadDir, { recursive: true });
     }
 
-    let dataString = '';
-    let errorString = '';
-
-    pythonProcess.stdout.on('data', (data) => {
-        dataString += data.toString();
-    });
-
-    pythonProcess.stderr.on('data', (data) => {
-        errorString += data.toString();
-        console.error(`Python Stderr: ${data}`);
-    });
-
-    pythonProcess.on('close', (code) => {
+    // 交給常駐 Python worker 處理
+    pythonWorker.request({
+        op: 'process',
+        file_path: filePath,
+        api_key: apiKey,
+        output_dir: downloadDir // Word 檔存到這裡供下載
+    }, (err, result) => {
         // 刪除上傳的暫存音訊檔
         fs.unlink(filePath, (err) => { if (err) console.error("Failed to delete temp file:", err); });
 
-        if (code !== 0) {
-            return res.status(500).json({ error: `Process failed with code ${code}`, details: errorString });
+        if (err) {
+            return res.status(500).json({ error: err.message });
         }
 
         try {
-            const result = JSON.parse(dataString);
             if (!result.success) {
                 return res.status(500).json(result);
             }
@@ -146,7 +245,7 @@ app.post('/api/upload', upload.single('audio'), (req, res) => {
             stmt.finalize();
 
         } catch (e) {
-            res.status(500).json({ error: "Failed to parse Python output", raw: dataString });
+            res.status(500).json({ error: e.message });
         }
     });
 });
@@ -2,64 +2,183 @@ import sys
 import os
 import json
 import argparse
-from transcriber import transcribe_audio, structure_meeting_notes
-from doc_gen import generate_meeting_minutes
+import socketserver
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# 將專案根目錄加入 sys.path，共用 app/utils 的轉錄與 Word 生成模組
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.utils.transcriber import transcribe_audio, structure_meeting_notes, MODEL_SIZE
+from app.utils.doc_gen import generate_meeting_minutes
+from app.utils.model_registry import registry
 
 # 設定 stdout 編碼為 utf-8，避免中文輸出亂碼
 sys.stdout.reconfigure(encoding='utf-8')
 
+# 協定輸出使用原本的 stdout；其餘 print (處理進度等) 一律導向 stderr，避免混入 JSON
+PROTOCOL_OUT = sys.stdout
+sys.stdout = sys.stderr
+
+# server 模式下同時處理的工作數量
+SERVER_WORKERS = int(os.getenv("MEETING_WORKER_CONCURRENCY", "2"))
+
+def process_file(file_path, api_key, output_dir):
+    """轉錄 → AI 分析 → 生成 Word，回傳結果 dict"""
+    filename = os.path.basename(file_path)
+
+    # 1. 轉錄 (先移除長靜音，裁切結果隨回傳結果一併送回)
+    audio_trim = {}
+    transcription, segments = transcribe_audio(
+        file_path,
+        on_event=lambda event, data: audio_trim.update(data) if event == "silence_trimmed" else None,
+        with_segments=True,
+    )
+
+    # 2. AI 分析
+    structured_data = structure_meeting_notes(transcription, api_key=api_key)
+
+    # 3. 生成 Word
+    doc_stream = generate_meeting_minutes({
+        "filename": filename,
+        "transcription": transcription,
+        **structured_data
+    })
+
+    # 儲存 Word 檔
+    doc_filename = f"Meeting_Minutes_{os.path.splitext(filename)[0]}.docx"
+    doc_path = os.path.join(output_dir, doc_filename)
+
+    with open(doc_path, "wb") as f:
+        f.write(doc_stream.getvalue())
+
+    return {
+        "success": True,
+        "filename": filename,
+        "transcription": transcription,
+        "segments": segments,  # 時間為原始錄音時間 (已扣回裁掉的靜音)
+        "structured_data": structured_data,
+        "doc_path": doc_path,
+        "audio_trim": audio_trim or None
+    }
+
+def handle_request(request):
+    """
+    處理一筆 JSON 請求
+    {"id": ..., "op": "process", "file_path": ..., "api_key": ..., "output_dir": ...}
+    {"id": ..., "op": "ping"}
+    """
+    request_id = request.get("id")
+    op = request.get("op", "process")
+    try:
+        if op == "ping":
+            result = {"success": True, "pong": True, "models": registry.stats()}
+        elif op == "process":
+            result = process_file(request["file_path"], request["api_key"], request["output_dir"])
+        else:
+            result = {"success": False, "error": f"Unknown op: {op}"}
+    except Exception as e:
+        result = {"success": False, "error": str(e)}
+    return {"id": request_id, **result}
+
+def parse_line(line):
+    try:
+        return json.loads(line), None
+    except ValueError as e:
+        return None, {"id": None, "success": False, "error": f"Invalid JSON: {e}"}
+
+def serve_stdio(pool):
+    """以 stdin/stdout 交換換行分隔的 JSON；回應順序依完成先後，以 id 對應請求"""
+    write_lock = threading.Lock()
+
+    def respond(response):
+        with write_lock:
+            PROTOCOL_OUT.write(json.dumps(response, ensure_ascii=False) + "\n")
+            PROTOCOL_OUT.flush()
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request, error = parse_line(line)
+        if error:
+            respond(error)
+            continue
+        future = pool.submit(handle_request, request)
+        future.add_done_callback(lambda f: respond(f.result()))
+
+def serve_socket(pool, socket_path):
+    """以 Unix socket 提供相同協定，每個連線可送出多筆請求"""
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            write_lock = threading.Lock()
+
+            def respond(response):
+                with write_lock:
+                    self.wfile.write((json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8"))
+                    self.wfile.flush()
+
+            futures = []
+            for raw in self.rfile:
+                line = raw.decode("utf-8")
+                if not line.strip():
+                    continue
+                request, error = parse_line(line)
+                if error:
+                    respond(error)
+                    continue
+                future = pool.submit(handle_request, request)
+                future.add_done_callback(lambda f: respond(f.result()))
+                futures.append(future)
+            # 連線關閉前等待此連線的工作完成
+            for future in futures:
+                future.result()
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = socketserver.ThreadingUnixStreamServer(socket_path, Handler)
+    print(f"Meeting worker listening on {socket_path}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.remove(socket_path)
+
+def serve(socket_path=None, workers=SERVER_WORKERS):
+    # 常駐模式：模型與 client 只載入一次，之後的請求直接使用
+    registry.warm_up(None if os.getenv("WHISPER_PRELOAD") else [MODEL_SIZE])
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        if socket_path:
+            serve_socket(pool, socket_path)
+        else:
+            serve_stdio(pool)
+
 def main():
     parser = argparse.ArgumentParser(description='Process meeting audio')
-    parser.add_argument('file_path', help='Path to the audio file')
-    parser.add_argument('--api_key', help='Gemini API Key', required=True)
-    parser.add_argument('--output_dir', help='Directory to save generated files', required=True)
-    
+    parser.add_argument('file_path', nargs='?', help='Path to the audio file')
+    parser.add_argument('--api_key', help='Gemini API Key')
+    parser.add_argument('--output_dir', help='Directory to save generated files')
+    parser.add_argument('--serve', action='store_true', help='Run as a long-lived worker (newline-delimited JSON)')
+    parser.add_argument('--socket', help='Listen on this Unix socket instead of stdin/stdout (with --serve)')
+    parser.add_argument('--workers', type=int, default=SERVER_WORKERS, help='Concurrent jobs in --serve mode')
+
     args = parser.parse_args()
-    
-    file_path = args.file_path
-    filename = os.path.basename(file_path)
-    
+
+    if args.serve:
+        serve(args.socket, args.workers)
+        return
+
+    if not (args.file_path and args.api_key and args.output_dir):
+        parser.error("file_path, --api_key and --output_dir are required unless --serve is given")
+
     try:
-        # 1. 轉錄
-        # print(f"Step 1/3: Transcribing {filename}...", file=sys.stderr)
-        transcription = transcribe_audio(file_path)
-        
-        # 2. AI 分析
-        # print(f"Step 2/3: Analyzing with Gemini...", file=sys.stderr)
-        structured_data = structure_meeting_notes(transcription, api_key=args.api_key)
-        
-        # 3. 生成 Word
-        # print(f"Step 3/3: Generating Word document...", file=sys.stderr)
-        doc_stream = generate_meeting_minutes({
-            "filename": filename,
-            "transcription": transcription,
-            **structured_data
-        })
-        
-        # 儲存 Word 檔
-        doc_filename = f"Meeting_Minutes_{os.path.splitext(filename)[0]}.docx"
-        doc_path = os.path.join(args.output_dir, doc_filename)
-        
-        with open(doc_path, "wb") as f:
-            f.write(doc_stream.getvalue())
-            
-        # 輸出最終結果 JSON 給 Node.js
-        result = {
-            "success": True,
-            "filename": filename,
-            "transcription": transcription,
-            "structured_data": structured_data,
-            "doc_path": doc_path
-        }
-        print(json.dumps(result, ensure_ascii=False))
-        
+        result = process_file(args.file_path, args.api_key, args.output_dir)
     except Exception as e:
-        error_result = {
+        result = {
             "success": False,
             "error": str(e)
         }
-        print(json.dumps(error_result, ensure_ascii=False))
+    # 輸出最終結果 JSON 給 Node.js
+    PROTOCOL_OUT.write(json.dumps(result, ensure_ascii=False) + "\n")
 
 if __name__ == "__main__":
     main()
-
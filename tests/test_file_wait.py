@@ -0,0 +1,62 @@
+import os
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+sys.path.append(os.path.join(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")), "backend"))
+
+from services import file_wait
+
+
+def make_file(state):
+    return types.SimpleNamespace(name="files/test", state=types.SimpleNamespace(name=state))
+
+
+@pytest.fixture
+def polls(monkeypatch):
+    """以假的 acall 取代 Gemini：依序回傳 states 中的狀態，之後一律 PROCESSING"""
+    calls = {"count": 0, "states": []}
+
+    async def acall(api_key, fn, label="request"):
+        calls["count"] += 1
+        return make_file(calls["states"].pop(0) if calls["states"] else "PROCESSING")
+
+    monkeypatch.setattr(file_wait.gemini, "acall", acall)
+    return calls
+
+
+def test_returns_when_file_becomes_active(polls):
+    polls["states"] = ["PROCESSING", "ACTIVE"]
+    file = file_wait.wait_for_file_active_sync("key", make_file("PROCESSING"), initial=0.01)
+    assert file.state.name == "ACTIVE"
+    assert polls["count"] == 2
+
+
+def test_deadline_raises_timeout(polls):
+    with pytest.raises(TimeoutError):
+        file_wait.wait_for_file_active_sync("key", make_file("PROCESSING"), initial=0.01, deadline=0.1)
+
+
+def test_cancel_event_stops_polling(polls):
+    cancel_event = threading.Event()
+    threading.Timer(0.1, cancel_event.set).start()
+    started = time.monotonic()
+    with pytest.raises(file_wait.WaitCancelled):
+        file_wait.wait_for_file_active_sync(
+            "key", make_file("PROCESSING"), initial=0.01, max_interval=0.01, cancel_event=cancel_event
+        )
+    assert time.monotonic() - started < 1
+
+    # 取消後 event loop 上的輪詢也已停止
+    count = polls["count"]
+    time.sleep(0.1)
+    assert polls["count"] == count
+
+
+def test_failed_file_raises(polls):
+    polls["states"] = ["FAILED"]
+    with pytest.raises(ValueError):
+        file_wait.wait_for_file_active_sync("key", make_file("PROCESSING"), initial=0.01)
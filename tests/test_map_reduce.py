@@ -0,0 +1,113 @@
+import json
+import os
+import sys
+import time
+
+import pytest
+
+# backend 以 services.x 匯入 (與 backend/main.py 相同)，app 以 app.utils.x 匯入
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "backend"))
+
+from app.utils import map_reduce as app_map_reduce
+from services import map_reduce as backend_map_reduce
+
+
+class FakeLLMBackend:
+    """
+    本地假 LLM：不呼叫任何外部服務，依輸入內容產生固定格式的結構化資料
+    用於測試切割/合併流程 (latency 模擬單次請求耗時)
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def analyze(self, chunk, index=0, total=1):
+        self.calls += 1
+        text = chunk if isinstance(chunk, str) else json.dumps(chunk, ensure_ascii=False)
+        time.sleep(self.latency)
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        return {
+            "meeting_topics": [f"片段 {index + 1} 主題"],
+            "participants": [{"name": "主席", "role": "主持會議"}],
+            "key_points": [{"title": line[:20], "content": line} for line in lines[:3]],
+            "next_steps": [{"action": f"追蹤片段 {index + 1} 事項", "owner": "主席"}],
+            "summary": f"第 {index + 1}/{total} 段摘要",
+        }
+
+
+def make_transcript(sentences=200):
+    return "".join(f"第{i}句：討論專案進度與第{i}項待辦。" for i in range(sentences))
+
+
+@pytest.fixture(params=[backend_map_reduce, app_map_reduce], ids=["backend", "app"])
+def mr(request):
+    return request.param
+
+
+def test_split_transcript_boundaries(mr):
+    text = make_transcript()
+    chunks = mr.split_transcript(text, window_chars=500, overlap_chars=50)
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 500 for chunk in chunks)
+    # 除最後一段外都在句號斷開，相鄰片段重疊 overlap_chars 字
+    assert all(chunk.endswith("。") for chunk in chunks[:-1])
+    for prev, nxt in zip(chunks, chunks[1:]):
+        assert nxt.startswith(prev[-50:])
+    assert chunks[0].startswith(text[:100]) and chunks[-1].endswith(text[-100:])
+
+
+def test_split_transcript_short_text(mr):
+    assert mr.split_transcript("") == [""]
+    assert mr.split_transcript("短逐字稿。", window_chars=100) == ["短逐字稿。"]
+    with pytest.raises(ValueError):
+        mr.split_transcript(make_transcript(), window_chars=100, overlap_chars=100)
+
+
+def test_merge_transcripts_exact_overlap(mr):
+    text = make_transcript()
+    chunks = mr.split_transcript(text, window_chars=500, overlap_chars=50)
+    assert mr.merge_transcripts(chunks) == text
+
+
+def test_merge_transcripts_fuzzy_overlap(mr):
+    # 重疊區兩次轉錄的標點與個別字不同
+    first = "大家好，今天討論上線時程。第一項是資料庫遷移，預計下週完成，由小王負責。"
+    second = "資料庫遷移、預計下周完成，由小王負責。第二項是客戶驗收，安排在月底。"
+    merged = mr.merge_transcripts([first, second])
+
+    assert merged.count("由小王負責") == 1
+    assert merged.startswith(first[:20])
+    assert merged.endswith("第二項是客戶驗收，安排在月底。")
+
+
+def test_merge_transcripts_without_overlap(mr):
+    first = "上午的會議確認了預算，下午再討論人力配置。" * 3
+    second = "完全不同的內容：新的供應商報價已經送達。"
+    assert mr.merge_transcripts([first, second]) == first + "\n" + second
+
+
+def test_merge_transcripts_ignores_incidental_repeat(mr):
+    # 後段開頭的句子只與前段中間偶然相同，不可截掉前段後面的內容
+    first = "好的，我們開始吧。" + "今天主要確認測試環境與部署流程的細節。" * 5 + "最後一項是文件更新。"
+    second = "好的，我們開始吧。接下來由業務報告本季營收與客戶回饋。"
+    merged = mr.merge_transcripts([first, second])
+    assert merged == first + "\n" + second
+
+
+def test_map_reduce_with_fake_backend(mr):
+    text = make_transcript()
+    chunks = mr.split_transcript(text, window_chars=500, overlap_chars=50)
+    backend = FakeLLMBackend(latency=0.01)
+
+    results = mr.map_chunks(chunks, backend.analyze, max_parallel=4)
+    merged = mr.merge_structured(results)
+
+    assert backend.calls == len(chunks)
+    # 結果順序與輸入相同，相同的與會者合併成一筆
+    assert merged["meeting_topics"] == [f"片段 {i + 1} 主題" for i in range(len(chunks))]
+    assert merged["participants"] == [{"name": "主席", "role": "主持會議"}]
+    assert merged["summary"].splitlines() == [f"第 {i + 1}/{len(chunks)} 段摘要" for i in range(len(chunks))]
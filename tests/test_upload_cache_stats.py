@@ -0,0 +1,65 @@
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+
+# 使用暫存目錄的資料庫與上傳目錄 (需在匯入 main 之前設定)
+WORK_DIR = tempfile.mkdtemp(prefix="meeting_tools_test_")
+os.environ["MEETINGS_DB_PATH"] = os.path.join(WORK_DIR, "meetings.db")
+os.environ["UPLOAD_DIR"] = os.path.join(WORK_DIR, "uploads")
+os.environ["DOWNLOAD_DIR"] = os.path.join(WORK_DIR, "downloads")
+sys.path.append(os.path.join(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")), "backend"))
+
+from fastapi.testclient import TestClient
+
+import main
+
+FAKE_RESULT = (
+    "逐字稿內容",
+    {
+        "meeting_topics": ["測試"],
+        "participants": [{"name": "主席", "role": "主持"}],
+        "key_points": [],
+        "next_steps": [],
+        "summary": "測試摘要",
+    },
+)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(main, "analyze_audio_directly", lambda *args, **kwargs: FAKE_RESULT)
+    with TestClient(main.app) as client:
+        yield client
+
+
+def upload(client, content):
+    response = client.post("/api/upload", files={"file": ("meeting.wav", content, "audio/wav")})
+    assert response.status_code == 202
+    job = response.json()
+    deadline = time.monotonic() + 10
+    while job["status"] not in ("done", "failed") and time.monotonic() < deadline:
+        time.sleep(0.05)
+        job = client.get(f"/api/jobs/{job['id']}").json()
+    assert job["status"] == "done", job
+    return job
+
+
+def test_one_miss_per_fresh_upload(client):
+    before = client.get("/api/cache/stats").json()
+
+    upload(client, b"fresh recording one")
+    stats = client.get("/api/cache/stats").json()
+    assert (stats["hits"] - before["hits"], stats["misses"] - before["misses"]) == (0, 1)
+
+    # 相同錄音再次上傳：命中快取，不再增加未命中
+    upload(client, b"fresh recording one")
+    stats = client.get("/api/cache/stats").json()
+    assert (stats["hits"] - before["hits"], stats["misses"] - before["misses"]) == (1, 1)
+
+    upload(client, b"fresh recording two")
+    stats = client.get("/api/cache/stats").json()
+    assert (stats["hits"] - before["hits"], stats["misses"] - before["misses"]) == (1, 2)
@@ -1,8 +1,8 @@
 import sys
 import os
-import streamlit as st
 
 # 模擬環境變數載入 (因為此腳本不透過 streamlit run 執行，需手動讀取 secrets)
+# 訊息輸出到 stderr，--startup 的 JSON 輸出可直接導向檔案
 try:
     import toml
     secrets_path = os.path.join(os.path.dirname(__file__), '.streamlit/secrets.toml')
@@ -10,14 +10,35 @@ try:
         with open(secrets_path, 'r') as f:
             secrets = toml.load(f)
             os.environ['GEMINI_API_KEY'] = secrets.get('GEMINI_API_KEY', '')
-            print("✅ 成功讀取 secrets.toml")
+            print("✅ 成功讀取 secrets.toml", file=sys.stderr)
     else:
-        print("⚠️ 警告: 找不到 .streamlit/secrets.toml")
+        print("⚠️ 警告: 找不到 .streamlit/secrets.toml", file=sys.stderr)
 except Exception as e:
-    print(f"⚠️ 讀取 secrets 失敗: {e}")
+    print(f"⚠️ 讀取 secrets 失敗: {e}", file=sys.stderr)
 
 # 加入路徑
-sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+ROOT_DIR = os.path.abspath(os.path.dirname(__file__))
+sys.path.append(ROOT_DIR)
+
+# 啟動時間報告的進入點：(名稱, 執行目錄, 模組)
+STARTUP_TARGETS = (
+    ("FastAPI 後端", "backend", "main"),
+    ("Streamlit 資料庫", ".", "app.database"),
+    ("轉錄 / 分析", ".", "app.utils.transcriber"),
+    ("Word 生成", ".", "app.utils.doc_gen"),
+)
+
+# 應該延遲到第一次使用才載入的大型套件
+HEAVY_MODULES = ("google.genai", "docx", "lxml.etree", "pandas", "streamlit", "whisper", "torch", "numpy")
+
+# 在全新的 process 中 import，回報 RSS 與已載入的大型套件
+_STARTUP_PROBE = """
+import json, resource, sys
+import {module}
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+rss_mb = rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+print(json.dumps({{"rss_mb": round(rss_mb, 1), "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
 
 def verify_imports():
     print("\n--- 1. 驗證模組引用 ---")
@@ -79,13 +100,73 @@ def verify_whisper():
         print("❌ Whisper 套件未安裝")
         return False
 
+def parse_importtime(stderr, top=5):
+    """解析 python -X importtime 的輸出，回傳 (總耗時 ms, 最耗時的頂層 import 列表)"""
+    entries = []
+    for line in stderr.splitlines():
+        fields = line[len("import time:"):].split("|")
+        if not line.startswith("import time:") or len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        # 名稱前的縮排代表層級 (每層 2 格)；只統計頂層，間接 import 已包含在其累計時間內
+        raw = fields[2]
+        level = (len(raw) - len(raw.lstrip()) - 1) // 2
+        if level == 1:
+            entries.append((raw.strip(), int(fields[1]) / 1000))
+    total = sum(ms for _, ms in entries)
+    heaviest = sorted(entries, key=lambda e: e[1], reverse=True)[:top]
+    return round(total, 1), [{"module": name, "ms": round(ms, 1)} for name, ms in heaviest]
+
+def startup_report():
+    """各進入點的冷啟動 import 時間 (python -X importtime) 與 baseline RSS"""
+    import json
+    import subprocess
+
+    report = []
+    for label, cwd, module in STARTUP_TARGETS:
+        probe = _STARTUP_PROBE.format(module=module, heavy=HEAVY_MODULES)
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", probe],
+            cwd=os.path.join(ROOT_DIR, cwd), capture_output=True, text=True,
+        )
+        entry = {"target": label, "module": module}
+        if result.returncode != 0:
+            entry["error"] = (result.stderr.strip().splitlines() or ["unknown error"])[-1]
+        else:
+            total_ms, heaviest = parse_importtime(result.stderr)
+            entry.update(json.loads(result.stdout.strip().splitlines()[-1]))
+            entry["import_ms"] = total_ms
+            entry["heaviest"] = heaviest
+        report.append(entry)
+    return report
+
+def verify_startup():
+    print("\n--- 5. 啟動時間 (import time / RSS) ---")
+    ok = True
+    for entry in startup_report():
+        if "error" in entry:
+            print(f"❌ {entry['target']} ({entry['module']}) 無法載入: {entry['error']}")
+            ok = False
+            continue
+        heaviest = ", ".join(f"{h['module']} {h['ms']:.0f}ms" for h in entry["heaviest"][:3])
+        print(f"⏱️ {entry['target']}: {entry['import_ms']:.0f} ms / RSS {entry['rss_mb']:.0f} MB (最耗時: {heaviest})")
+        if entry["heavy"]:
+            print(f"   ⚠️ 啟動時已載入大型套件: {', '.join(entry['heavy'])}")
+    return ok
+
 if __name__ == "__main__":
+    # 只輸出啟動時間報告 (JSON)，方便跨 commit 比較
+    if "--startup" in sys.argv:
+        import json
+        print(json.dumps(startup_report(), ensure_ascii=False, indent=2))
+        sys.exit(0)
+
     print("開始自我驗證程序...")
     
     checks = [
         verify_imports(),
         verify_database(),
         verify_whisper(),
+        verify_startup(),
         verify_gemini_api()
     ]
     